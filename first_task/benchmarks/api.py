@@ -0,0 +1,362 @@
+"""
+Load and latency benchmark of the contacts API.
+
+The application is started in-process against local stand-ins: a SQLite
+database (or the database given with --database-url) and fakeredis (or the
+Redis server given with --redis-host, which spares installing fakeredis).
+The database is seeded with a number of users owning a number of contacts
+each, and a fixed number of concurrent clients then drive a mix of logins,
+listings, searches, birthday lookups, creations and updates for a fixed
+duration. Rate limits are disabled, as
+they would otherwise cap every route at a few requests per minute.
+
+Usage (from the first_task directory):
+    python -m benchmarks.api [--users 5] [--contacts 500] [--concurrency 8]
+                             [--duration 10] [--output report.json]
+                             [--baseline baseline.json] [--threshold 0.2]
+
+The script prints a JSON report with the throughput and the p50, p95 and
+p99 latencies of every route. With --baseline, it compares the report with
+a previous one and exits with status 1 if the latency of a route grew by
+more than --threshold.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import date, timedelta
+
+import httpx
+
+from benchmarks.load_shedding import percentile
+
+FIRST_NAMES = (
+    "Olivia", "Liam", "Emma", "Noah", "Amelia", "Oliver", "Sophia", "Elijah",
+    "Mia", "James", "Harper", "Lucas", "Evelyn", "Mateo", "Luna", "Levi",
+)
+LAST_NAMES = (
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller",
+    "Davis", "Rodriguez", "Martinez", "Wilson", "Anderson", "Taylor",
+)
+PASSWORD = "benchmark"
+# Relative weights of the operations run by the clients.
+DEFAULT_MIX = "login=2,list=30,search=25,birthdays=15,create=10,update=18"
+
+
+def configure(args) -> None:
+    """
+    Point the settings at the stand-ins.
+
+    Must run before any module of the application is imported, as the
+    settings, the database engine and the Redis clients are created at
+    import time.
+    """
+    for name, value in {
+        "POSTGRES_DB": "benchmark",
+        "POSTGRES_USER": "benchmark",
+        "POSTGRES_PASSWORD": "benchmark",
+        "SECRET_KEY": "benchmark",
+        "ALGORITHM": "HS256",
+        "MAIL_USERNAME": "benchmark",
+        "MAIL_PASSWORD": "benchmark",
+        "MAIL_FROM": "benchmark@example.com",
+        "MAIL_PORT": "465",
+        "MAIL_SERVER": "localhost",
+    }.items():
+        os.environ.setdefault(name, value)
+    os.environ["SQLALCHEMY_DATABASE_URL"] = args.database_url or (
+        f"sqlite:///{tempfile.mkdtemp()}/benchmark.db"
+    )
+    # The load-shedding limits must not be what is being measured.
+    os.environ["MAX_CONCURRENT_REQUESTS"] = str(args.concurrency * 2)
+    if args.redis_host:
+        os.environ["REDIS_HOST"] = args.redis_host
+        os.environ["REDIS_PORT"] = str(args.redis_port)
+        return
+
+    import fakeredis
+    import redis
+    import redis.asyncio
+
+    server = fakeredis.FakeServer()
+
+    class FakeRedis(fakeredis.FakeRedis):
+        def __init__(self, *args, host=None, port=None, **kwargs):
+            super().__init__(*args, server=server, **kwargs)
+
+    class FakeAsyncRedis(fakeredis.FakeAsyncRedis):
+        def __init__(self, *args, host=None, port=None, **kwargs):
+            super().__init__(*args, server=server, **kwargs)
+
+    redis.Redis = FakeRedis
+    redis.asyncio.Redis = FakeAsyncRedis
+
+
+def disable_rate_limits(app) -> None:
+    """Override every RateLimiter dependency of the application."""
+    from fastapi_limiter.depends import RateLimiter
+
+    async def unlimited():
+        pass
+
+    for route in app.routes:
+        for dependency in getattr(route, "dependencies", ()):
+            if isinstance(dependency.dependency, RateLimiter):
+                app.dependency_overrides[dependency.dependency] = unlimited
+
+
+def random_contact(rng: random.Random, run_id: str) -> dict:
+    """Build the fields of a random contact with a unique email."""
+    first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    birthday = date(1950, 1, 1) + timedelta(days=rng.randrange(365 * 55))
+    return {
+        "first_name": first_name,
+        "last_name": last_name,
+        "email": f"{first_name}.{uuid.uuid4().hex[:12]}@{run_id}.test",
+        "phone_number": f"+1{rng.randrange(10 ** 9, 10 ** 10)}",
+        "birthday": birthday,
+        "additional_info": None,
+    }
+
+
+def seed(users: int, contacts: int, rng: random.Random) -> list[dict]:
+    """
+    Create confirmed users and their contacts.
+
+    Returns:
+        list[dict]: The email of every user and the IDs of its contacts.
+    """
+    from src.database.db import SessionLocal, engine
+    from src.database.models import Base, Contact, User
+    from src.services.auth import auth_service
+
+    Base.metadata.create_all(engine)
+    run_id = uuid.uuid4().hex[:8]
+    password = auth_service.get_password_hash(PASSWORD)
+    seeded = []
+    db = SessionLocal()
+    try:
+        for number in range(users):
+            user = User(
+                username=f"bench{number}",
+                email=f"bench{number}@{run_id}.test",
+                password=password,
+                confirmed=True,
+            )
+            db.add(user)
+            db.flush()
+            rows = [
+                Contact(user_id=user.id, **random_contact(rng, run_id))
+                for _ in range(contacts)
+            ]
+            db.add_all(rows)
+            db.flush()
+            seeded.append({
+                "email": user.email,
+                "run_id": run_id,
+                "contact_ids": [row.id for row in rows],
+            })
+        db.commit()
+    finally:
+        db.close()
+    return seeded
+
+
+class Client:
+    """A simulated user running operations against the API."""
+
+    def __init__(self, http: httpx.AsyncClient, user: dict, rng):
+        self.http = http
+        self.user = user
+        self.rng = rng
+        self.headers = {}
+
+    async def login(self):
+        response = await self.http.post("/api/auth/login", data={
+            "username": self.user["email"], "password": PASSWORD
+        })
+        if response.status_code == 200:
+            token = response.json()["access_token"]
+            self.headers = {"Authorization": f"Bearer {token}"}
+        return "POST /api/auth/login", response
+
+    async def list(self):
+        response = await self.http.get(
+            "/api/contacts/", params={"limit": 50}, headers=self.headers
+        )
+        return "GET /api/contacts/", response
+
+    async def search(self):
+        term = self.rng.choice((FIRST_NAMES, LAST_NAMES))
+        response = await self.http.get(
+            "/api/contacts/",
+            params={"search": self.rng.choice(term)[:4], "limit": 50},
+            headers=self.headers,
+        )
+        return "GET /api/contacts/?search", response
+
+    async def birthdays(self):
+        response = await self.http.get(
+            "/api/contacts/birthdays", headers=self.headers
+        )
+        return "GET /api/contacts/birthdays", response
+
+    async def create(self):
+        contact = random_contact(self.rng, self.user["run_id"])
+        contact["birthday"] = contact["birthday"].isoformat()
+        response = await self.http.post(
+            "/api/contacts/", json=contact, headers=self.headers
+        )
+        if response.status_code == 201:
+            self.user["contact_ids"].append(response.json()["id"])
+        return "POST /api/contacts/", response
+
+    async def update(self):
+        contact_id = self.rng.choice(self.user["contact_ids"])
+        response = await self.http.patch(
+            f"/api/contacts/{contact_id}",
+            json={"additional_info": uuid.uuid4().hex},
+            headers=self.headers,
+        )
+        return "PATCH /api/contacts/{contact_id}", response
+
+
+def parse_mix(mix: str) -> dict[str, int]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if not hasattr(Client, name.strip()):
+            raise SystemExit(f"Unknown operation in mix: {name}")
+        weights[name.strip()] = int(weight)
+    return weights
+
+
+async def run(app, seeded: list[dict], args) -> dict:
+    """Drive the application at a fixed concurrency for a fixed duration."""
+    mix = parse_mix(args.mix)
+    operations, weights = list(mix), list(mix.values())
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app), httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as http:
+        clients = [
+            Client(http, seeded[number % len(seeded)],
+                   random.Random(args.seed + number))
+            for number in range(args.concurrency)
+        ]
+        for client in clients:
+            await client.login()
+
+        async def work(client: Client, deadline: float):
+            while time.perf_counter() < deadline:
+                operation = client.rng.choices(operations, weights)[0]
+                started = time.perf_counter()
+                route, response = await getattr(client, operation)()
+                latency = time.perf_counter() - started
+                results.setdefault(route, []).append(
+                    (response.status_code, latency)
+                )
+
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            work(client, started + args.duration) for client in clients
+        ))
+        elapsed = time.perf_counter() - started
+
+    def summary(samples):
+        latencies = [latency for _, latency in samples]
+        return {
+            "requests": len(samples),
+            "errors": sum(1 for status, _ in samples if status >= 400),
+            "throughput": round(len(samples) / elapsed, 2),
+            **{
+                name: round(percentile(latencies, q) * 1000, 2)
+                for name, q in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99))
+            },
+        }
+
+    return {
+        "config": {
+            "users": args.users,
+            "contacts": args.contacts,
+            "concurrency": args.concurrency,
+            "duration": args.duration,
+            "mix": mix,
+        },
+        "total": summary([s for samples in results.values() for s in samples]),
+        "routes": {
+            route: summary(samples)
+            for route, samples in sorted(results.items())
+        },
+    }
+
+
+def compare(report: dict, baseline: dict, metric: str,
+            threshold: float) -> list[str]:
+    """List the routes whose latency regressed beyond the threshold."""
+    regressions = []
+    for route, current in report["routes"].items():
+        previous = baseline.get("routes", {}).get(route)
+        if previous is None:
+            continue
+        limit = previous[metric] * (1 + threshold)
+        if current[metric] > limit:
+            regressions.append(
+                f"{route}: {metric} {current[metric]}ms exceeds "
+                f"{limit:.2f}ms (baseline {previous[metric]}ms)"
+            )
+    return regressions
+
+
+def main(args) -> int:
+    configure(args)
+    import main as application
+
+    rng = random.Random(args.seed)
+    seeded = seed(args.users, args.contacts, rng)
+    disable_rate_limits(application.app)
+    report = asyncio.run(run(application.app, seeded, args))
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["regressions"] = compare(
+            report, baseline, args.metric, args.threshold
+        )
+        for regression in report["regressions"]:
+            print(regression, file=sys.stderr)
+        status = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=5)
+    parser.add_argument("--contacts", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--mix", default=DEFAULT_MIX)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--database-url")
+    parser.add_argument("--redis-host")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline")
+    parser.add_argument("--metric", choices=("p50", "p95", "p99"),
+                        default="p95")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    sys.exit(main(parser.parse_args()))
@@ -0,0 +1,172 @@
+"""
+Benchmark of the online backfill runner against a plain UPDATE.
+
+A local database (a throwaway SQLite file, or the database given with
+--database-url) is seeded with a contacts table of --rows rows, and the
+`contacts_phone_digits` backfill is run twice: once as the single UPDATE a
+plain migration would issue, and once with `run_backfill`. Meanwhile a
+writer thread keeps updating single contacts, as the application would,
+and records how long each write waited. A single UPDATE blocks writers for
+its whole duration; batches only ever block them for one batch.
+
+Usage (from the first_task directory):
+    python -m benchmarks.backfill [--rows 1000000] [--batch-size 5000]
+                                  [--pause 0.01]
+
+The script prints a JSON report and exits with status 1 if the longest
+write stall during the batched backfill exceeds --max-stall seconds.
+"""
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, text
+
+from benchmarks.load_shedding import percentile
+from src.database.backfill import BACKFILLS, checkpoints, run_backfill
+
+SEED_BATCH_SIZE = 50000
+PHONE_FORMATS = ("+1 ({}) {}-{}", "{}-{}-{}", "{}.{}.{}", "+1{}{}{}")
+
+
+def seed(engine, rows: int) -> None:
+    """Create a bare contacts table holding `rows` contacts."""
+    rng = random.Random(0)
+    with engine.begin() as connection:
+        connection.execute(text("DROP TABLE IF EXISTS contacts"))
+        connection.execute(text(
+            "CREATE TABLE contacts ("
+            "id INTEGER PRIMARY KEY, phone_number VARCHAR(20), "
+            "phone_digits VARCHAR(15), additional_info TEXT)"
+        ))
+        checkpoints.drop(connection, checkfirst=True)
+    insert = text(
+        "INSERT INTO contacts (id, phone_number) VALUES (:id, :phone_number)"
+    )
+    for start in range(1, rows + 1, SEED_BATCH_SIZE):
+        batch = [
+            {
+                "id": i,
+                "phone_number": rng.choice(PHONE_FORMATS).format(
+                    rng.randrange(100, 1000), rng.randrange(100, 1000),
+                    rng.randrange(1000, 10000)
+                ),
+            }
+            for i in range(start, min(start + SEED_BATCH_SIZE, rows + 1))
+        ]
+        with engine.begin() as connection:
+            connection.execute(insert, batch)
+
+
+def reset(engine) -> None:
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE contacts SET phone_digits = NULL"))
+        checkpoints.drop(connection, checkfirst=True)
+
+
+class Writer(threading.Thread):
+    """Updates random contacts one at a time and records the latencies."""
+
+    def __init__(self, engine, rows: int, interval: float = 0.01):
+        super().__init__(daemon=True)
+        self.engine = engine
+        self.rows = rows
+        self.interval = interval
+        self.latencies = []
+        self.stopped = threading.Event()
+
+    def run(self):
+        rng = random.Random(1)
+        update = text(
+            "UPDATE contacts SET additional_info = :info WHERE id = :id"
+        )
+        while not self.stopped.is_set():
+            started = time.perf_counter()
+            with self.engine.begin() as connection:
+                connection.execute(
+                    update, {"info": str(started),
+                             "id": rng.randrange(1, self.rows + 1)}
+                )
+            self.latencies.append(time.perf_counter() - started)
+            time.sleep(self.interval)
+
+
+def measure(engine, rows: int, backfill) -> dict:
+    """Run a backfill while the writer runs, and report both."""
+    writer = Writer(engine, rows)
+    writer.start()
+    time.sleep(0.2)
+    started = time.perf_counter()
+    updated = backfill()
+    elapsed = time.perf_counter() - started
+    writer.stopped.set()
+    writer.join()
+    with engine.connect() as connection:
+        missing = connection.execute(text(
+            "SELECT count(*) FROM contacts WHERE phone_digits IS NULL"
+        )).scalar()
+    return {
+        "rows_updated": updated,
+        "rows_missed": missing,
+        "seconds": round(elapsed, 2),
+        "rows_per_second": round(updated / elapsed),
+        "writes": len(writer.latencies),
+        "write_p50_ms": round(percentile(writer.latencies, 0.50) * 1000, 1),
+        "write_p99_ms": round(percentile(writer.latencies, 0.99) * 1000, 1),
+        "write_max_stall_ms": round(max(writer.latencies) * 1000, 1),
+    }
+
+
+def main(args) -> int:
+    url = args.database_url or (
+        f"sqlite:///{tempfile.mkdtemp()}/backfill.db"
+    )
+    # Writers wait for locks instead of failing while the UPDATE runs.
+    connect_args = {"timeout": 600} if url.startswith("sqlite") else {}
+    engine = create_engine(url, connect_args=connect_args)
+    backfill = BACKFILLS["contacts_phone_digits"]
+
+    started = time.perf_counter()
+    seed(engine, args.rows)
+    report = {"rows": args.rows, "seed_seconds": round(
+        time.perf_counter() - started, 1
+    )}
+
+    def single_update():
+        statement = backfill.update_statement(engine.dialect.name)
+        with engine.begin() as connection:
+            backfill.register_functions(connection)
+            return connection.execute(
+                statement, {"lower": 0, "upper": args.rows}
+            ).rowcount
+
+    report["single_update"] = measure(engine, args.rows, single_update)
+    reset(engine)
+    report["batched"] = measure(engine, args.rows, lambda: run_backfill(
+        engine, backfill, batch_size=args.batch_size, pause=args.pause,
+        report=lambda message: print(message, file=sys.stderr)
+    ))
+    report["batched"]["batch_size"] = args.batch_size
+    print(json.dumps(report, indent=2))
+
+    stall = report["batched"]["write_max_stall_ms"] / 1000
+    if stall > args.max_stall:
+        print(f"Writes stalled for {stall:.2f}s, over the budget of "
+              f"{args.max_stall}s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--pause", type=float, default=0.01)
+    parser.add_argument("--max-stall", type=float, default=0.5)
+    parser.add_argument("--database-url")
+    sys.exit(main(parser.parse_args()))
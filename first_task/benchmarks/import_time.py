@@ -0,0 +1,107 @@
+"""
+Cold-start check of the application import.
+
+Imports `main` in fresh interpreters with `-X importtime`, keeps the fastest
+of several runs to filter out noise, and reports the total import time
+together with the slowest modules. Workers pay this cost on every boot, so
+heavy integrations are expected to be imported on first use instead.
+
+Usage (from the first_task directory):
+    python -m benchmarks.import_time [--runs 5] [--budget 1000] [--top 15]
+
+The script prints a JSON report and exits with status 1 if the import takes
+longer than --budget milliseconds, or if one of the --deferred modules is
+imported eagerly.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Placeholders for the settings without defaults; importing the
+# application does not connect to any of these services.
+PLACEHOLDER_ENV = {
+    "POSTGRES_DB": "benchmark",
+    "POSTGRES_USER": "benchmark",
+    "POSTGRES_PASSWORD": "benchmark",
+    "SQLALCHEMY_DATABASE_URL": "sqlite://",
+    "SECRET_KEY": "benchmark",
+    "ALGORITHM": "HS256",
+    "MAIL_USERNAME": "benchmark",
+    "MAIL_PASSWORD": "benchmark",
+    "MAIL_FROM": "benchmark@example.com",
+    "MAIL_PORT": "465",
+    "MAIL_SERVER": "localhost",
+}
+DEFERRED_MODULES = (
+    "cloudinary", "fastapi_mail", "passlib", "libgravatar", "PIL",
+    "pyinstrument",
+)
+
+
+def measure() -> dict[str, tuple[int, int]]:
+    """
+    Import the application in a fresh interpreter.
+
+    Returns:
+        dict[str, tuple[int, int]]: The self and cumulative import time of
+                                    every module, in microseconds.
+    """
+    env = {**PLACEHOLDER_ENV, **os.environ}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        env=env, capture_output=True, text=True, check=True
+    )
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        timings, cumulative, name = line[len("import time:"):].split("|")
+        if timings.strip().isdigit():
+            modules[name.strip()] = (int(timings), int(cumulative))
+    return modules
+
+
+def main(args) -> int:
+    runs = [measure() for _ in range(args.runs)]
+    fastest = min(runs, key=lambda modules: modules["main"][1])
+    total = fastest["main"][1] / 1000
+    slowest = sorted(
+        fastest.items(), key=lambda item: item[1][0], reverse=True
+    )[:args.top]
+    eager = sorted({
+        name.split(".")[0] for name in fastest
+        if name.split(".")[0] in args.deferred
+    })
+    report = {
+        "runs": [round(modules["main"][1] / 1000, 1) for modules in runs],
+        "import_ms": round(total, 1),
+        "budget_ms": args.budget,
+        "slowest_self_ms": {
+            name: round(self_time / 1000, 1)
+            for name, (self_time, _) in slowest
+        },
+        "eager_deferred_modules": eager,
+    }
+    print(json.dumps(report, indent=2))
+
+    status = 0
+    if total > args.budget:
+        print(f"Importing main took {total:.1f}ms, over the budget of "
+              f"{args.budget}ms", file=sys.stderr)
+        status = 1
+    if eager:
+        print(f"Imported at startup: {', '.join(eager)}", file=sys.stderr)
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=1000.0)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--deferred", nargs="*", default=DEFERRED_MODULES)
+    sys.exit(main(parser.parse_args()))
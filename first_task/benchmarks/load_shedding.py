@@ -0,0 +1,142 @@
+"""
+Load test for the load-shedding middleware.
+
+A stand-in API whose handlers hold one of a fixed number of "database
+connections" for a fixed service time is driven by an open-loop client at
+twice its capacity, once without and once with the middleware. Without
+admission control the backlog, and with it the latency of every request,
+grows for as long as the overload lasts. With the middleware, excess
+requests are shed quickly and the p99 latency of served requests stays
+bounded by the queue timeout plus the service time.
+
+Usage (from the first_task directory):
+    python -m benchmarks.load_shedding [--duration 5] [--max-p99 0.75]
+
+The script prints a JSON report and exits with status 1 if the p99 latency
+with load shedding exceeds --max-p99 seconds.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from src.middleware.load_shedding import (
+    ConcurrencyLimiter,
+    LoadSheddingMiddleware,
+)
+
+ROUTES = ("/api/auth/refresh_token", "/api/contacts", "/api/contacts/1")
+
+
+def build_app(capacity: int,
+              service_time: float,
+              limiter: ConcurrencyLimiter | None) -> FastAPI:
+    """Build a stand-in API limited by a pool of `capacity` connections."""
+    app = FastAPI()
+    pool = asyncio.Semaphore(capacity)
+
+    async def handler():
+        async with pool:
+            await asyncio.sleep(service_time)
+        return {"ok": True}
+
+    for route in ROUTES:
+        app.add_api_route(route, handler, methods=["GET"])
+    if limiter is not None:
+        app.add_middleware(LoadSheddingMiddleware, limiter=limiter)
+    return app
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def drive(app: FastAPI, rate: float, duration: float) -> dict:
+    """Send requests at a fixed rate, regardless of how fast they complete."""
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+
+        async def one(route):
+            started = time.perf_counter()
+            response = await client.get(route)
+            results.append(
+                (route, response.status_code, time.perf_counter() - started)
+            )
+
+        tasks = []
+        started = time.perf_counter()
+        for i in range(int(rate * duration)):
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(one(random.choice(ROUTES))))
+        await asyncio.gather(*tasks)
+
+    served = [latency for _, status, latency in results if status == 200]
+    shed = [latency for _, status, latency in results if status == 503]
+    return {
+        "requests": len(results),
+        "served": len(served),
+        "shed": len(shed),
+        "served_p50": percentile(served, 0.50),
+        "served_p99": percentile(served, 0.99),
+        "shed_p99": percentile(shed, 0.99),
+        "shed_by_route": {
+            route: sum(1 for r, s, _ in results if r == route and s == 503)
+            for route in ROUTES
+        },
+    }
+
+
+async def main(args) -> int:
+    capacity_rps = args.capacity / args.service_time
+    rate = capacity_rps * args.overload
+    report = {
+        "capacity_rps": capacity_rps,
+        "offered_rps": rate,
+        "without_shedding": await drive(
+            build_app(args.capacity, args.service_time, None),
+            rate, args.duration
+        ),
+    }
+    limiter = ConcurrencyLimiter(
+        max_concurrency=args.capacity,
+        max_queue=args.capacity * 2,
+        queue_timeout=args.queue_timeout,
+    )
+    report["with_shedding"] = await drive(
+        build_app(args.capacity, args.service_time, limiter),
+        rate, args.duration
+    )
+    report["with_shedding"]["limiter"] = limiter.stats()
+    print(json.dumps(report, indent=2))
+
+    p99 = report["with_shedding"]["served_p99"]
+    if p99 is None or p99 > args.max_p99:
+        print(f"p99 {p99} exceeds the budget of {args.max_p99}s",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--capacity", type=int, default=15)
+    parser.add_argument("--service-time", type=float, default=0.05)
+    parser.add_argument("--overload", type=float, default=2.0)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--queue-timeout", type=float, default=0.5)
+    parser.add_argument("--max-p99", type=float, default=0.75)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -1,12 +1,71 @@
-import redis.asyncio as redis
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi_limiter import FastAPILimiter
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.staticfiles import StaticFiles
 
-from src.routes import contacts, auth, users
+from src.routes import contacts, auth, users, admin, calendar
 from src.conf.config import settings
+from src.database.cache import close_redis, get_async_redis
+from src.middleware.idempotency import IdempotencyMiddleware
+from src.middleware.load_shedding import (
+    ConcurrencyLimiter,
+    LoadSheddingMiddleware,
+)
+from src.middleware.profiling import ProfilingMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Set up the shared clients on startup and close them on shutdown."""
+    await FastAPILimiter.init(get_async_redis())
+    yield
+    await close_redis()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+
+concurrency_limiter = ConcurrencyLimiter(
+    max_concurrency=settings.max_concurrent_requests,
+    max_queue=settings.max_queued_requests,
+    queue_timeout=settings.queue_timeout,
+    retry_after=settings.retry_after,
+)
+
+# Profiling is only wired in when enabled, so it costs nothing otherwise.
+# Added first so that only admitted requests are profiled.
+profiling_enabled = bool(
+    settings.profiling_token or settings.profiling_sample_rate
+)
+if profiling_enabled:
+    app.add_middleware(
+        ProfilingMiddleware,
+        directory=settings.profiling_dir,
+        max_files=settings.profiling_max_files,
+        token=settings.profiling_token,
+        sample_rate=settings.profiling_sample_rate,
+    )
+
+# Added before CORS so that CORS headers are also set on shed responses.
+app.add_middleware(
+    LoadSheddingMiddleware,
+    limiter=concurrency_limiter,
+    exempt=("/", "/api/metrics/load"),
+)
+
+# Retries are answered before admission control and the rate limiters,
+# so they cost neither a concurrency slot nor a rate-limit hit.
+app.add_middleware(
+    IdempotencyMiddleware,
+    redis=get_async_redis,
+    secret_key=settings.secret_key,
+    algorithm=settings.algorithm,
+    prefixes=("/api/contacts",),
+    ttl=settings.idempotency_ttl,
+    lock_ttl=settings.idempotency_lock_ttl,
+    wait_timeout=settings.idempotency_wait_timeout,
+)
 
 origins = [
     "http://localhost:3000"
@@ -18,23 +77,22 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count", "X-Total-Count-Estimated"],
 )
 
 app.include_router(auth.router, prefix='/api')
 app.include_router(contacts.router, prefix='/api')
 app.include_router(users.router, prefix='/api')
+app.include_router(calendar.router, prefix='/api')
+if profiling_enabled:
+    app.include_router(admin.router, prefix='/api')
 
-
-@app.on_event("startup")
-async def startup():
-    r = await redis.Redis(
-        host=settings.redis_host,
-        port=settings.redis_port,
-        db=0,
-        encoding="utf-8",
-        decode_responses=True
+if settings.avatar_storage == 'local':
+    app.mount(
+        settings.avatar_base_url,
+        StaticFiles(directory=settings.avatar_local_dir, check_dir=False),
+        name="avatars"
     )
-    await FastAPILimiter.init(r)
 
 
 @app.get("/")
@@ -44,3 +102,12 @@ def read_root():
         "next_steps": "Please visit the /docs endpoint for detailed API "
         "documentation and interactive exploration of endpoints."
     }
+
+
+@app.get("/api/metrics/load")
+def read_load_metrics():
+    """
+    Report the number of requests in flight and waiting for a slot,
+    together with the admitted and shed request counts per route class.
+    """
+    return concurrency_limiter.stats()
@@ -26,6 +26,12 @@ target_metadata = Base.metadata
 
 config.set_main_option("sqlalchemy.url", SQLALCHEMY_DATABASE_URL)
 
+
+def include_object(object, name, type_, reflected, compare_to):
+    """Leave the checkpoints of src.database.backfill to autogenerate."""
+    return not (type_ == "table" and name == "backfill_checkpoints")
+
+
 # other values from the config, defined by the needs of env.py,
 # can be acquired:
 # my_important_option = config.get_main_option("my_important_option")
@@ -48,6 +54,7 @@ def run_migrations_offline() -> None:
     context.configure(
         url=url,
         target_metadata=target_metadata,
+        include_object=include_object,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
     )
@@ -71,7 +78,9 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection,
+            target_metadata=target_metadata,
+            include_object=include_object,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,45 @@
+"""Add normalized phone digits to contacts
+
+Revision ID: 5c2f8a9d3e71
+Revises: 1b478e2a1d4b
+Create Date: 2026-10-19 16:05:12.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from src.database.backfill import BACKFILLS, forget_backfill, run_backfill
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5c2f8a9d3e71'
+down_revision: Union[str, None] = '1b478e2a1d4b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # The column is committed before the backfill runs, so an upgrade
+    # interrupted during the backfill resumes it when run again.
+    columns = sa.inspect(op.get_bind()).get_columns('contacts')
+    if 'phone_digits' not in {column['name'] for column in columns}:
+        op.add_column(
+            'contacts',
+            sa.Column('phone_digits', sa.String(length=15), nullable=True)
+        )
+    # Filled in batches outside the migration transaction, so that the
+    # contacts table is not locked while every row is rewritten.
+    with op.get_context().autocommit_block():
+        run_backfill(op.get_bind(), BACKFILLS['contacts_phone_digits'])
+    op.create_index(
+        'ix_contacts_user_id_phone_digits', 'contacts',
+        ['user_id', 'phone_digits'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_contacts_user_id_phone_digits', table_name='contacts')
+    op.drop_column('contacts', 'phone_digits')
+    forget_backfill(op.get_bind(), BACKFILLS['contacts_phone_digits'])
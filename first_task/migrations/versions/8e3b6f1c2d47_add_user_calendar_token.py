@@ -0,0 +1,32 @@
+"""Add birthday calendar feed tokens to users
+
+Revision ID: 8e3b6f1c2d47
+Revises: 5c2f8a9d3e71
+Create Date: 2026-10-19 16:32:40.902114
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8e3b6f1c2d47'
+down_revision: Union[str, None] = '5c2f8a9d3e71'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'users', sa.Column('calendar_token', sa.String(length=64), nullable=True)
+    )
+    op.create_unique_constraint(
+        'users_calendar_token_key', 'users', ['calendar_token']
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('users_calendar_token_key', 'users', type_='unique')
+    op.drop_column('users', 'calendar_token')
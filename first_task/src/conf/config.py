@@ -18,9 +18,30 @@ class Settings(BaseSettings):
     mail_server: str
     redis_host: str = 'localhost'
     redis_port: int = 6379
-    cloudinary_name: str
-    cloudinary_api_key: str
-    cloudinary_api_secret: str
+    cloudinary_name: str = ''
+    cloudinary_api_key: str = ''
+    cloudinary_api_secret: str = ''
+    # Avatar storage backend: 'cloudinary' or 'local'.
+    avatar_storage: str = 'cloudinary'
+    avatar_local_dir: str = 'media/avatars'
+    avatar_base_url: str = '/media/avatars'
+    avatar_workers: int = 2
+    # Load shedding: the default in-flight limit matches the database
+    # connection pool (5 connections plus an overflow of 10).
+    max_concurrent_requests: int = 15
+    max_queued_requests: int = 30
+    queue_timeout: float = 0.5
+    retry_after: int = 1
+    # Responses to writes sent with an Idempotency-Key are kept this long.
+    idempotency_ttl: int = 3600
+    idempotency_lock_ttl: int = 60
+    idempotency_wait_timeout: float = 10.0
+    # Per-request profiling is disabled unless a token or a sampling
+    # rate is set.
+    profiling_token: str = ''
+    profiling_sample_rate: float = 0.0
+    profiling_dir: str = 'profiles'
+    profiling_max_files: int = 50
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,291 @@
+"""
+This module runs online backfills: updates of every row of a large table,
+e.g. to fill a new derived column, that never lock the table for long.
+
+Rows are updated in batches of consecutive primary keys (keyset ranges, so
+every batch is an index range scan), each batch in its own short
+transaction, with an optional pause between batches that leaves room for
+regular traffic. The last key processed is checkpointed in the
+`backfill_checkpoints` table after every batch, so an interrupted backfill
+resumes where it stopped. As the last batch may run again after a crash,
+the update of a backfill must be idempotent.
+
+Backfills are registered in BACKFILLS. From a migration, run them outside
+the migration transaction:
+
+    with op.get_context().autocommit_block():
+        run_backfill(op.get_bind(), BACKFILLS['contacts_phone_digits'])
+
+or from the command line (from the first_task directory):
+
+    python -m src.database.backfill --list
+    python -m src.database.backfill contacts_phone_digits \\
+        [--batch-size 5000] [--pause 0.1] [--restart]
+
+A migration running a backfill forgets its checkpoint on downgrade with
+forget_backfill(), so that upgrading again fills the column again.
+"""
+
+import argparse
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Callable
+
+from sqlalchemy import (
+    BigInteger, Column, DateTime, MetaData, String, Table, inspect, text
+)
+from sqlalchemy.engine import Connection, Engine
+
+from src.services.normalize import normalize_phone
+
+# Kept out of the application metadata: the table is created on demand
+# and is ignored by alembic autogenerate (see migrations/env.py).
+metadata = MetaData()
+checkpoints = Table(
+    'backfill_checkpoints', metadata,
+    Column('name', String(100), primary_key=True),
+    Column('last_key', BigInteger, nullable=False),
+    Column('rows', BigInteger, nullable=False),
+    Column('updated_at', DateTime, nullable=False),
+    Column('completed_at', DateTime, nullable=True),
+)
+
+
+class Backfill:
+    """
+    A batched update of one table.
+
+    Args:
+        name (str): Unique name, used for checkpoints and on the CLI.
+        table (str): The table to update.
+        set_clause (str | dict[str, str]): The SQL SET clause, or one
+            clause per dialect name when no portable SQL exists.
+        where (str | None): SQL condition selecting the rows to update
+                            within each batch.
+        key (str): An integer primary key column ordering the batches.
+        sqlite_functions (dict[str, Callable] | None): Python functions of
+            one argument that the SQLite clause calls by name, for SQL
+            functions SQLite lacks, e.g. regexp_replace.
+    """
+
+    def __init__(self,
+                 name: str,
+                 table: str,
+                 set_clause: str | dict[str, str],
+                 where: str | None = None,
+                 key: str = 'id',
+                 sqlite_functions: dict[str, Callable] | None = None):
+        self.name = name
+        self.table = table
+        self.set_clause = set_clause
+        self.where = where
+        self.key = key
+        self.sqlite_functions = sqlite_functions or {}
+
+    def register_functions(self, connection: Connection) -> None:
+        """Make the SQLite functions available on a connection."""
+        if connection.dialect.name != 'sqlite':
+            return
+        dbapi_connection = connection.connection.driver_connection
+        for name, function in self.sqlite_functions.items():
+            dbapi_connection.create_function(
+                name, 1, function, deterministic=True
+            )
+
+    def update_statement(self, dialect: str):
+        """Build the UPDATE of the rows of one keyset range."""
+        set_clause = self.set_clause
+        if isinstance(set_clause, dict):
+            if dialect not in set_clause:
+                raise ValueError(
+                    f"Backfill {self.name} does not support {dialect}"
+                )
+            set_clause = set_clause[dialect]
+        where = f" AND ({self.where})" if self.where else ""
+        return text(
+            f"UPDATE {self.table} SET {set_clause} "
+            f"WHERE {self.key} > :lower AND {self.key} <= :upper{where}"
+        )
+
+    def upper_bound_statement(self):
+        """Build the query of the last key of the next batch."""
+        return text(
+            f"SELECT max({self.key}) FROM ("
+            f"SELECT {self.key} FROM {self.table} WHERE {self.key} > :lower "
+            f"ORDER BY {self.key} LIMIT :batch_size) AS batch"
+        )
+
+
+BACKFILLS = {
+    backfill.name: backfill for backfill in (
+        Backfill(
+            'contacts_phone_digits',
+            'contacts',
+            {
+                'postgresql': (
+                    "phone_digits = "
+                    "NULLIF(regexp_replace(phone_number, '[^0-9]', '', 'g'), "
+                    "'')"
+                ),
+                # SQLite has no regexp_replace; the application's own
+                # normalization is called instead.
+                'sqlite': "phone_digits = normalize_phone(phone_number)",
+            },
+            where="phone_number IS NOT NULL",
+            sqlite_functions={'normalize_phone': normalize_phone},
+        ),
+    )
+}
+
+
+@contextmanager
+def _transaction(bind: Engine | Connection):
+    """Run one batch in its own transaction."""
+    if isinstance(bind, Engine):
+        with bind.begin() as connection:
+            yield connection
+    else:
+        # A connection is expected to be in autocommit mode, e.g. in an
+        # autocommit block of a migration, where every statement commits.
+        yield bind
+
+
+def _save_checkpoint(connection, name: str, last_key: int, rows: int,
+                     completed: bool = False) -> None:
+    values = {
+        "last_key": last_key,
+        "rows": rows,
+        "updated_at": datetime.utcnow(),
+        "completed_at": datetime.utcnow() if completed else None,
+    }
+    updated = connection.execute(
+        checkpoints.update().where(checkpoints.c.name == name).values(values)
+    )
+    if not updated.rowcount:
+        connection.execute(checkpoints.insert().values(name=name, **values))
+
+
+def forget_backfill(bind: Engine | Connection, backfill: Backfill) -> None:
+    """
+    Delete the checkpoint of a backfill, so that it runs again from the
+    start, e.g. when the migration that ran it is downgraded.
+
+    Args:
+        bind (Engine | Connection): An engine or a connection.
+        backfill (Backfill): The backfill to forget.
+    """
+    with _transaction(bind) as connection:
+        if inspect(connection).has_table(checkpoints.name):
+            connection.execute(
+                checkpoints.delete().where(checkpoints.c.name == backfill.name)
+            )
+
+
+def run_backfill(bind: Engine | Connection,
+                 backfill: Backfill,
+                 batch_size: int = 1000,
+                 pause: float = 0.0,
+                 restart: bool = False,
+                 report: Callable[[str], None] = print,
+                 report_interval: float = 5.0) -> int:
+    """
+    Run a backfill to completion, resuming from its checkpoint.
+
+    Args:
+        bind (Engine | Connection): An engine, or a connection in
+                                    autocommit mode, e.g. in a migration.
+        backfill (Backfill): The backfill to run.
+        batch_size (int): Number of keys per batch.
+        pause (float): Seconds to sleep between batches.
+        restart (bool): Start over instead of resuming.
+        report (Callable[[str], None]): Receives progress messages.
+        report_interval (float): Minimum seconds between two messages.
+
+    Returns:
+        int: The number of rows updated by this run.
+    """
+    with _transaction(bind) as connection:
+        checkpoints.create(connection, checkfirst=True)
+        dialect = connection.dialect.name
+        state = connection.execute(
+            checkpoints.select().where(checkpoints.c.name == backfill.name)
+        ).first()
+        first_key, last_key = connection.execute(text(
+            f"SELECT min({backfill.key}), max({backfill.key}) "
+            f"FROM {backfill.table}"
+        )).one()
+    update = backfill.update_statement(dialect)
+    upper_bound = backfill.upper_bound_statement()
+
+    if state is not None and not restart:
+        if state.completed_at is not None:
+            report(f"{backfill.name}: already completed")
+            return 0
+        lower, total_rows = state.last_key, state.rows
+        report(f"{backfill.name}: resuming after key {lower}")
+    else:
+        lower, total_rows = (first_key or 1) - 1, 0
+    if last_key is None:
+        last_key = lower
+
+    rows = batches = 0
+    started = last_report = time.monotonic()
+    while True:
+        with _transaction(bind) as connection:
+            upper = connection.execute(
+                upper_bound, {"lower": lower, "batch_size": batch_size}
+            ).scalar()
+            if upper is None:
+                _save_checkpoint(connection, backfill.name, lower,
+                                 total_rows + rows, completed=True)
+                break
+            backfill.register_functions(connection)
+            rows += connection.execute(
+                update, {"lower": lower, "upper": upper}
+            ).rowcount
+            _save_checkpoint(connection, backfill.name, upper,
+                             total_rows + rows)
+        lower, batches = upper, batches + 1
+
+        now = time.monotonic()
+        if now - last_report >= report_interval:
+            last_report = now
+            span = max(last_key - (first_key or 0), 1)
+            done = min((lower - (first_key or 0)) / span, 1.0)
+            rate = rows / (now - started)
+            eta = (now - started) * (1 - done) / done if done else 0
+            report(
+                f"{backfill.name}: {rows} rows in {batches} batches, "
+                f"key {lower}/{last_key} ({done:.1%}), "
+                f"{rate:.0f} rows/s, ETA {eta:.0f}s"
+            )
+        if pause:
+            time.sleep(pause)
+
+    elapsed = time.monotonic() - started
+    report(
+        f"{backfill.name}: done, {rows} rows in {batches} batches "
+        f"in {elapsed:.1f}s"
+    )
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run an online backfill.")
+    parser.add_argument("name", nargs="?", choices=sorted(BACKFILLS))
+    parser.add_argument("--list", action="store_true")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--pause", type=float, default=0.0)
+    parser.add_argument("--restart", action="store_true")
+    args = parser.parse_args()
+    if args.list or args.name is None:
+        for name, backfill in sorted(BACKFILLS.items()):
+            print(f"{name}: {backfill.table}")
+    else:
+        from src.database.db import engine
+
+        run_backfill(
+            engine, BACKFILLS[args.name], batch_size=args.batch_size,
+            pause=args.pause, restart=args.restart
+        )
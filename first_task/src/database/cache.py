@@ -0,0 +1,128 @@
+"""
+This module owns the Redis clients shared by the application.
+
+Clients are created on first use rather than at import time, so importing
+the application does no I/O setup, and they are closed by the application
+lifespan. The synchronous clients serve the services; the asynchronous
+client serves the rate limiter.
+
+It also guards values computed from the database against concurrent
+invalidations: a value is stored only if the version of its key, read
+before computing it, is still current, as every invalidation changes it.
+"""
+
+import time
+
+import redis
+import redis.asyncio
+
+from src.conf.config import settings
+
+_clients: dict[bool, redis.Redis] = {}
+_async_client: redis.asyncio.Redis | None = None
+
+# Replaces the hash KEYS[1] with the field/value pairs ARGV[3..] for ARGV[2]
+# seconds, unless its version KEYS[2] changed from ARGV[1] ('' if unset).
+STORE_IF_CURRENT_SCRIPT = """
+if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+def get_redis(decode_responses: bool = False) -> redis.Redis:
+    """
+    Return the shared synchronous Redis client, creating it if needed.
+
+    Args:
+        decode_responses (bool): Whether replies are decoded to str
+                                 instead of being returned as bytes.
+
+    Returns:
+        redis.Redis: The client for the requested reply type.
+    """
+    client = _clients.get(decode_responses)
+    if client is None:
+        client = _clients[decode_responses] = redis.Redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=0,
+            decode_responses=decode_responses
+        )
+    return client
+
+
+def get_async_redis() -> redis.asyncio.Redis:
+    """Return the shared asynchronous Redis client, creating it if needed."""
+    global _async_client
+    if _async_client is None:
+        _async_client = redis.asyncio.Redis(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            db=0,
+            encoding="utf-8",
+            decode_responses=True
+        )
+    return _async_client
+
+
+async def close_redis() -> None:
+    """Close every client created so far."""
+    global _async_client
+    for client in _clients.values():
+        client.close()
+    _clients.clear()
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+
+
+def version_key(key: str) -> str:
+    """Return the key holding the version of a cached key."""
+    return f"{key}:version"
+
+
+def store_if_current(r: redis.Redis, key: str, version: str | None,
+                     mapping: dict, ttl: int) -> bool:
+    """
+    Replace a cached hash, unless it was invalidated since its version
+    was read.
+
+    Args:
+        r (redis.Redis): The client to store with.
+        key (str): The key of the hash.
+        version (str | None): The value of `version_key(key)` read before
+                              the hash was computed.
+        mapping (dict): The fields and values of the hash.
+        ttl (int): Seconds the hash is kept.
+
+    Returns:
+        bool: True if the hash was stored.
+    """
+    args = [version or '', ttl]
+    for field, value in mapping.items():
+        args += [field, value]
+    store = r.register_script(STORE_IF_CURRENT_SCRIPT)
+    return bool(store(keys=[key, version_key(key)], args=args, client=r))
+
+
+def invalidate(r: redis.Redis, key: str, ttl: int) -> None:
+    """
+    Drop a cached hash and change its version, so that a value computed
+    before the change is not stored afterwards.
+
+    Args:
+        r (redis.Redis): The client to invalidate with.
+        key (str): The key of the hash.
+        ttl (int): Seconds the version is kept, at least the time it takes
+                   to compute the hash.
+    """
+    pipe = r.pipeline()
+    pipe.delete(key)
+    # From the clock, so that an expired version is not set again.
+    pipe.set(version_key(key), time.time_ns(), ex=ttl)
+    pipe.execute()
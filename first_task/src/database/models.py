@@ -1,9 +1,13 @@
-from sqlalchemy import Column, Integer, String, Boolean, Date, Text, func
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    Column, Integer, String, Boolean, Date, Text, Index, func
+)
+from sqlalchemy.orm import relationship, validates
 from sqlalchemy.sql.schema import ForeignKey
 from sqlalchemy.sql.sqltypes import DateTime
 from sqlalchemy.ext.declarative import declarative_base
 
+from src.services.normalize import normalize_phone
+
 Base = declarative_base()
 
 
@@ -19,6 +23,9 @@ class Contact(Base):
         last_name (String): The contact's last name, a required field.
         email (String): The contact's email address, must be unique.
         phone_number (String): The contact's phone number, an optional field.
+        phone_digits (String): The digits of the phone number, kept in sync
+                               with it and indexed together with user_id
+                               for exact-match lookups.
         birthday (Date): The contact's date of birth, an optional field.
         additional_info (Text): Additional information or notes about
                                 the contact, stored as text and is optional.
@@ -33,12 +40,16 @@ class Contact(Base):
                              to the user details.
     """
     __tablename__ = 'contacts'
+    __table_args__ = (
+        Index('ix_contacts_user_id_phone_digits', 'user_id', 'phone_digits'),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     first_name = Column(String(50), nullable=False, index=True)
     last_name = Column(String(50), nullable=False, index=True)
     email = Column(String(50), unique=True, index=True)
     phone_number = Column(String(15))
+    phone_digits = Column(String(15))
     birthday = Column(Date)
     additional_info = Column(Text)
     created_at = Column('created_at', DateTime, default=func.now())
@@ -50,6 +61,12 @@ class Contact(Base):
     )
     user = relationship('User', backref="notes")
 
+    @validates('phone_number')
+    def validate_phone_number(self, key, phone_number):
+        """Keep the normalized phone digits in sync with the phone number."""
+        self.phone_digits = normalize_phone(phone_number)
+        return phone_number
+
 
 class User(Base):
     """
@@ -68,13 +85,16 @@ class User(Base):
                                last updated, updates automatically
                                on modification.
         avatar (String): A URL to the user's avatar image, optional.
-        refresh_token (String): A refresh token for the user's session,
-                                optional, used in authentication systems
-                                to renew access tokens.
+        refresh_token (String): Legacy single-device refresh token, no longer
+                                written; refresh sessions are stored
+                                in Redis by `src.services.sessions`.
         confirmed (Boolean): Indicates whether the user's email address
                              has been confirmed. Defaults to False, and
                              it must be set to True after the user confirms
                              their email.
+        calendar_token (String): The secret part of the URL of the user's
+                                 birthday calendar feed, None while the
+                                 feed is disabled.
     """
     __tablename__ = "users"
     id = Column(Integer, primary_key=True)
@@ -88,3 +108,4 @@ class User(Base):
     avatar = Column(String(255), nullable=True)
     refresh_token = Column(String(255), nullable=True)
     confirmed = Column(Boolean, default=False)
+    calendar_token = Column(String(64), nullable=True, unique=True)
@@ -0,0 +1,276 @@
+"""
+This module provides an ASGI middleware that makes writes safe to retry.
+
+Clients send an `Idempotency-Key` header, unique per logical operation, with
+create, update and delete requests. The first request with a key stores a
+pending marker in Redis, runs normally and then stores its response under
+the key for a short time. A retry with the same key is answered with the
+stored response without reaching the route, its rate limiter or the
+database, and a retry arriving while the first request is still running
+waits for its response. Keys are scoped to the authenticated user, and
+reusing a key for a different request is rejected.
+"""
+
+import asyncio
+import base64
+import hashlib
+import json
+import time
+from typing import Callable
+
+from jose import JWTError, jwt
+from redis.exceptions import RedisError
+
+IDEMPOTENCY_HEADER = b"idempotency-key"
+REPLAYED_HEADER = b"idempotent-replayed"
+MAX_KEY_LENGTH = 255
+# Larger responses are passed through but not stored.
+MAX_STORED_BODY = 1024 * 1024
+POLL_INTERVAL = 0.05
+# Client errors that may not repeat on a retry, e.g. after a rate limit
+# resets or a conflicting request completes, are not stored.
+TRANSIENT_STATUSES = {401, 408, 409, 423, 425, 429}
+
+
+def is_replayable(status: int | None) -> bool:
+    """Whether a response status is final, so that retries replay it."""
+    if status is None:
+        return False
+    return (200 <= status < 300
+            or (400 <= status < 500 and status not in TRANSIENT_STATUSES))
+
+
+class IdempotencyMiddleware:
+    """
+    ASGI middleware replaying the responses of retried writes.
+
+    Args:
+        app: The ASGI application to wrap.
+        redis: Callable returning the asynchronous Redis client, so that
+               the client can be created after the middleware.
+        secret_key (str): Key the access tokens are signed with.
+        algorithm (str): Algorithm the access tokens are signed with.
+        prefixes (tuple[str, ...]): Paths whose writes are handled.
+        ttl (int): How long responses are kept, in seconds.
+        lock_ttl (int): How long a pending marker outlives a request
+                        that never completes, e.g. after a crash.
+        wait_timeout (float): How long a retry waits for the response
+                              of the request it repeats.
+    """
+
+    methods = {"POST", "PUT", "PATCH", "DELETE"}
+
+    def __init__(self,
+                 app,
+                 redis: Callable,
+                 secret_key: str,
+                 algorithm: str,
+                 prefixes: tuple[str, ...],
+                 ttl: int,
+                 lock_ttl: int,
+                 wait_timeout: float):
+        self.app = app
+        self.redis = redis
+        self.secret_key = secret_key
+        self.algorithm = algorithm
+        self.prefixes = prefixes
+        self.ttl = ttl
+        self.lock_ttl = lock_ttl
+        self.wait_timeout = wait_timeout
+
+    def _subject(self, headers: dict) -> str | None:
+        """Return the user an access token was issued to, if it is valid."""
+        scheme, _, token = headers.get(b"authorization", b"").partition(b" ")
+        if scheme.lower() != b"bearer":
+            return None
+        try:
+            payload = jwt.decode(
+                token.decode(), self.secret_key, algorithms=[self.algorithm]
+            )
+        except (JWTError, UnicodeDecodeError):
+            return None
+        if payload.get("scope") != "access_token":
+            return None
+        return payload.get("sub")
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http"
+                or scope["method"] not in self.methods
+                or not scope["path"].startswith(self.prefixes)):
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        key = headers.get(IDEMPOTENCY_HEADER)
+        subject = self._subject(headers) if key else None
+        if subject is None:
+            # Without a key, or for requests the route will reject as
+            # unauthenticated, there is nothing to deduplicate.
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await self._error(send, 400, "Idempotency-Key is too long")
+            return
+
+        body, receive = await self._read_body(receive)
+        fingerprint = hashlib.sha256(b"\0".join((
+            scope["method"].encode(), scope["path"].encode(),
+            scope["query_string"], body
+        ))).hexdigest()
+        redis_key = f"idempotency:{subject}:{key.decode('latin-1')}"
+        r = self.redis()
+
+        pending = json.dumps({"fingerprint": fingerprint})
+        try:
+            acquired = await r.set(
+                redis_key, pending, nx=True, ex=self.lock_ttl
+            )
+        except RedisError as e:
+            # Without Redis, writes still work, only without deduplication.
+            print(e)
+            await self.app(scope, receive, send)
+            return
+        if acquired:
+            await self._execute(scope, receive, send, r, redis_key,
+                                fingerprint)
+            return
+
+        deadline = time.monotonic() + self.wait_timeout
+        while True:
+            try:
+                stored = await r.get(redis_key)
+            except RedisError as e:
+                print(e)
+                await self.app(scope, receive, send)
+                return
+            if stored is None:
+                # The first request failed and released the key.
+                await self._error(
+                    send, 409, "A request with this Idempotency-Key failed, "
+                    "please retry", retry_after=True
+                )
+                return
+            record = json.loads(stored)
+            if record["fingerprint"] != fingerprint:
+                await self._error(
+                    send, 422, "Idempotency-Key was already used for a "
+                    "different request"
+                )
+                return
+            if "status" in record:
+                await self._replay(send, record)
+                return
+            if time.monotonic() >= deadline:
+                await self._error(
+                    send, 409, "A request with this Idempotency-Key is "
+                    "still being processed", retry_after=True
+                )
+                return
+            await asyncio.sleep(POLL_INTERVAL)
+
+    @staticmethod
+    async def _read_body(receive):
+        """Buffer the request body and return a receive replaying it."""
+        chunks = []
+        while True:
+            message = await receive()
+            if message["type"] != "http.request":
+                break
+            chunks.append(message.get("body", b""))
+            if not message.get("more_body"):
+                break
+        body = b"".join(chunks)
+        replayed = False
+
+        async def replay():
+            nonlocal replayed
+            if not replayed:
+                replayed = True
+                return {"type": "http.request", "body": body,
+                        "more_body": False}
+            return await receive()
+
+        return body, replay
+
+    async def _execute(self, scope, receive, send, r, redis_key: str,
+                       fingerprint: str):
+        """Run the request and store its response under the key."""
+        response = {"status": None, "headers": [], "body": []}
+        size = 0
+
+        async def send_and_capture(message):
+            nonlocal size
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                response["headers"] = message.get("headers", [])
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_and_capture)
+        except BaseException:
+            await self._release(r, redis_key)
+            raise
+
+        # Server errors and transient client errors are not stored, so that
+        # the client can retry them.
+        if not is_replayable(response["status"]) or size > MAX_STORED_BODY:
+            await self._release(r, redis_key)
+            return
+        record = {
+            "fingerprint": fingerprint,
+            "status": response["status"],
+            "headers": [
+                [name.decode("latin-1"), value.decode("latin-1")]
+                for name, value in response["headers"]
+            ],
+            "body": base64.b64encode(b"".join(response["body"])).decode(),
+        }
+        try:
+            await r.set(redis_key, json.dumps(record), ex=self.ttl)
+        except RedisError as e:
+            # The response was sent; retries wait for the pending marker
+            # to expire, then run the request again.
+            print(e)
+
+    @staticmethod
+    async def _release(r, redis_key: str):
+        """Delete the pending marker, so that the client can retry."""
+        try:
+            await r.delete(redis_key)
+        except RedisError as e:
+            # Retries are rejected until the pending marker expires.
+            print(e)
+
+    @staticmethod
+    async def _replay(send, record: dict):
+        await send({
+            "type": "http.response.start",
+            "status": record["status"],
+            "headers": [
+                (name.encode("latin-1"), value.encode("latin-1"))
+                for name, value in record["headers"]
+            ] + [(REPLAYED_HEADER, b"true")],
+        })
+        await send({
+            "type": "http.response.body",
+            "body": base64.b64decode(record["body"]),
+        })
+
+    @staticmethod
+    async def _error(send, status: int, detail: str,
+                     retry_after: bool = False):
+        body = json.dumps({"detail": detail}).encode()
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ]
+        if retry_after:
+            headers.append((b"retry-after", b"1"))
+        await send({
+            "type": "http.response.start",
+            "status": status,
+            "headers": headers,
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,200 @@
+"""
+This module provides an ASGI middleware that bounds the number of requests
+processed concurrently, so that an overloaded API answers some requests
+quickly with 503 instead of answering all of them slowly.
+
+Requests beyond the in-flight limit wait in a short, bounded priority queue.
+When the queue is full, or a request has waited longer than the queue
+timeout, it is shed with a 503 response and a Retry-After header. Requests
+are prioritized by route class, so that token refreshes and logins keep
+working while bulk listings are the first to be shed.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+from collections import Counter
+
+# Lower values are admitted first and shed last.
+PRIORITIES = {"auth": 0, "default": 1, "bulk": 2}
+AUTH_PREFIX = "/api/auth/"
+BULK_ROUTES = {
+    "/api/contacts",
+    "/api/contacts/duplicates",
+}
+
+
+def classify(method: str, path: str) -> str:
+    """
+    Return the route class of a request.
+
+    Args:
+        method (str): The HTTP method of the request.
+        path (str): The path of the request.
+
+    Returns:
+        str: "auth" for authentication routes, "bulk" for listings that
+             scan many rows, and "default" for everything else.
+    """
+    if path.startswith(AUTH_PREFIX):
+        return "auth"
+    if method == "GET" and path.rstrip("/") in BULK_ROUTES:
+        return "bulk"
+    return "default"
+
+
+class ConcurrencyLimiter:
+    """
+    Admission control shared by the middleware and the metrics endpoint.
+
+    Attributes:
+        max_concurrency (int): Maximum number of requests in flight.
+        max_queue (int): Maximum number of requests waiting for a slot.
+        queue_timeout (float): Maximum time in seconds a request waits
+                               for a slot before it is shed.
+        retry_after (int): Value of the Retry-After header, in seconds,
+                           sent with shed responses.
+    """
+
+    def __init__(self,
+                 max_concurrency: int,
+                 max_queue: int,
+                 queue_timeout: float,
+                 retry_after: int = 1):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.in_flight = 0
+        self.admitted = Counter()
+        self.shed = Counter()
+        self._waiters = []
+        self._sequence = itertools.count()
+
+    def stats(self) -> dict:
+        """Return the current load and the admission counters."""
+        return {
+            "in_flight": self.in_flight,
+            "queue_depth": len(self._waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "admitted": dict(self.admitted),
+            "shed": dict(self.shed),
+        }
+
+    async def acquire(self, route_class: str) -> bool:
+        """
+        Wait for a processing slot.
+
+        Args:
+            route_class (str): The route class of the request.
+
+        Returns:
+            bool: True if the request was admitted and must release its
+                  slot afterwards, False if it has to be shed.
+        """
+        if self.in_flight < self.max_concurrency and not self._waiters:
+            self.in_flight += 1
+            return self._admit(route_class)
+
+        priority = PRIORITIES[route_class]
+        if len(self._waiters) >= self.max_queue:
+            # Make room by shedding the lowest priority, newest waiter,
+            # unless the incoming request is not more important than it.
+            worst = max(self._waiters)
+            if worst[0] <= priority:
+                return self._reject(route_class)
+            self._waiters.remove(worst)
+            heapq.heapify(self._waiters)
+            worst[2].set_result(False)
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (priority, next(self._sequence), future)
+        heapq.heappush(self._waiters, entry)
+        try:
+            await asyncio.wait({future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # The client went away while waiting, possibly right after
+            # being handed a slot that must then be passed on.
+            if future.done() and future.result():
+                self.release()
+            else:
+                self._withdraw(entry)
+            raise
+        if not future.done():
+            self._withdraw(entry)
+        if future.cancelled() or not future.result():
+            return self._reject(route_class)
+        return self._admit(route_class)
+
+    def release(self) -> None:
+        """Hand the slot of a finished request over to the next waiter."""
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(True)
+                return
+        self.in_flight -= 1
+
+    def _withdraw(self, entry: tuple) -> None:
+        entry[2].cancel()
+        # A waiter displaced by a more important request has already been
+        # taken out of the queue.
+        if entry in self._waiters:
+            self._waiters.remove(entry)
+            heapq.heapify(self._waiters)
+
+    def _admit(self, route_class: str) -> bool:
+        self.admitted[route_class] += 1
+        return True
+
+    def _reject(self, route_class: str) -> bool:
+        self.shed[route_class] += 1
+        return False
+
+
+class LoadSheddingMiddleware:
+    """
+    ASGI middleware applying a ConcurrencyLimiter to HTTP requests.
+
+    Paths listed in `exempt` (such as health and metrics endpoints)
+    bypass admission control so that they stay observable under load.
+    """
+
+    def __init__(self,
+                 app,
+                 limiter: ConcurrencyLimiter,
+                 exempt: tuple[str, ...] = ()):
+        self.app = app
+        self.limiter = limiter
+        self.exempt = set(exempt)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["path"] in self.exempt:
+            await self.app(scope, receive, send)
+            return
+
+        route_class = classify(scope["method"], scope["path"])
+        if not await self.limiter.acquire(route_class):
+            await self._overloaded(send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.limiter.release()
+
+    async def _overloaded(self, send):
+        body = json.dumps(
+            {"detail": "Server is overloaded, please retry later"}
+        ).encode()
+        await send({
+            "type": "http.response.start",
+            "status": 503,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"retry-after", str(self.limiter.retry_after).encode()),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,140 @@
+"""
+This module provides an ASGI middleware that profiles individual requests
+on demand, to find out where the time of a slow endpoint goes in production.
+
+A request is profiled when it carries an `X-Profile` header matching the
+configured profiling token, or when it is picked by the configured sampling
+rate. Profiles are recorded with pyinstrument as HTML when it is installed,
+and with cProfile as pstats files otherwise.
+
+pyinstrument follows the context of the profiled request across awaits.
+cProfile instead records everything running on the event loop thread, so
+it only profiles requests that start while no other request is in flight,
+and requests arriving before the profiled one completes are still mixed
+into its profile. Install pyinstrument for reliable profiles of servers
+under concurrent load.
+
+Profiles are written to a directory
+that acts as a ring buffer: once it holds the configured number of profiles,
+the oldest ones are deleted. Requests that are not profiled only pay for a
+header lookup and a random number.
+"""
+
+import asyncio
+import cProfile
+import hmac
+import random
+import re
+import time
+from pathlib import Path
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_SUFFIXES = (".html", ".pstats")
+UNSAFE_CHARACTERS = re.compile(r"[^A-Za-z0-9]+")
+
+
+def list_profiles(directory: str) -> list[Path]:
+    """Return the recorded profiles, newest first."""
+    path = Path(directory)
+    if not path.is_dir():
+        return []
+    profiles = [p for p in path.iterdir() if p.suffix in PROFILE_SUFFIXES]
+    return sorted(profiles, key=lambda p: p.name, reverse=True)
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware recording a profile of selected requests.
+
+    Args:
+        app: The ASGI application to wrap.
+        directory (str): Where profiles are written.
+        max_files (int): How many profiles are kept.
+        token (str): Value of the `X-Profile` header that requests a
+                     profile; an empty token disables the header.
+        sample_rate (float): Fraction of requests profiled at random.
+    """
+
+    def __init__(self,
+                 app,
+                 directory: str,
+                 max_files: int,
+                 token: str = "",
+                 sample_rate: float = 0.0):
+        self.app = app
+        self.directory = Path(directory)
+        self.max_files = max_files
+        self.token = token.encode()
+        self.sample_rate = sample_rate
+        try:
+            from pyinstrument import Profiler
+        except ImportError:  # pragma: no cover - pyinstrument is optional
+            Profiler = None
+        self.profiler_class = Profiler
+        # Profilers cannot record overlapping requests on the same thread,
+        # so requests arriving while one is being profiled are skipped.
+        self._busy = False
+        # Requests in flight, which cProfile would attribute to a profile.
+        self._in_flight = 0
+
+    def _requested(self, scope) -> bool:
+        if self.token:
+            for name, value in scope["headers"]:
+                if name == PROFILE_HEADER:
+                    return hmac.compare_digest(value, self.token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        self._in_flight += 1
+        try:
+            await self._handle(scope, receive, send)
+        finally:
+            self._in_flight -= 1
+
+    async def _handle(self, scope, receive, send):
+        # Without pyinstrument, only requests running alone are profiled.
+        alone = self.profiler_class is not None or self._in_flight == 1
+        if self._busy or not alone or not self._requested(scope):
+            await self.app(scope, receive, send)
+            return
+
+        slug = UNSAFE_CHARACTERS.sub("_", scope["path"]).strip("_") or "root"
+        name = f"{time.time_ns()}-{scope['method']}-{slug}"
+
+        async def send_with_profile_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = [
+                    *message["headers"], (b"x-profile-id", name.encode())
+                ]
+            await send(message)
+
+        self._busy = True
+        if self.profiler_class is not None:
+            profiler = self.profiler_class(async_mode="enabled")
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+        try:
+            await self.app(scope, receive, send_with_profile_id)
+        finally:
+            if self.profiler_class is not None:
+                profiler.stop()
+            else:
+                profiler.disable()
+            self._busy = False
+            await asyncio.to_thread(self._write, profiler, name)
+
+    def _write(self, profiler, name: str) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        if self.profiler_class is not None:
+            path = self.directory / f"{name}.html"
+            path.write_text(profiler.output_html(), encoding="utf-8")
+        else:
+            profiler.dump_stats(self.directory / f"{name}.pstats")
+        for stale in list_profiles(str(self.directory))[self.max_files:]:
+            stale.unlink(missing_ok=True)
@@ -1,10 +1,18 @@
 from typing import List, Optional
-from datetime import date, timedelta
+from datetime import date, datetime, timedelta
 from fastapi import HTTPException
-from sqlalchemy import extract, and_, or_
+from sqlalchemy import (
+    String, and_, cast, extract, func, literal, null, or_, select, union_all
+)
 from sqlalchemy.orm import Session
 from src.database.models import Contact, User
 from src.schemas import ContactModel, ContactUpdate
+from src.services.duplicates import find_duplicates
+from src.services.normalize import normalize_phone
+
+MERGED_FIELDS = ('email', 'phone_number', 'birthday')
+STATS_TOP_DOMAINS = 10
+STATS_RECENT_DAYS = (7, 30)
 
 
 async def get_contacts(skip: int,
@@ -22,6 +30,7 @@ async def get_contacts(skip: int,
         user (User): The user whose contacts are to be retrieved.
         search (str): Search query to filter contacts by any attribute
                       (first name, last name, email, phone number).
+                      Phone numbers also match regardless of formatting.
         db (Session): SQLAlchemy session for database access.
 
     Returns:
@@ -29,16 +38,50 @@ async def get_contacts(skip: int,
     """
     query = db.query(Contact).filter(Contact.user_id == user.id)
     if search:
-        search_filter = (
-            (Contact.first_name.ilike(f'%{search}%')) |
-            (Contact.last_name.ilike(f'%{search}%')) |
-            (Contact.email.ilike(f'%{search}%')) |
-            (Contact.phone_number.ilike(f'%{search}%'))
-        )
-        query = query.filter(search_filter)
+        query = query.filter(_search_filter(search))
     return query.offset(skip).limit(limit).all()
 
 
+def _search_filter(search: str):
+    """Build the condition matching contacts against a search query."""
+    search_filter = (
+        (Contact.first_name.ilike(f'%{search}%')) |
+        (Contact.last_name.ilike(f'%{search}%')) |
+        (Contact.email.ilike(f'%{search}%')) |
+        (Contact.phone_number.ilike(f'%{search}%'))
+    )
+    digits = normalize_phone(search)
+    if digits:
+        search_filter |= Contact.phone_digits.contains(digits)
+    return search_filter
+
+
+async def count_contacts(user: User,
+                         search: str | None,
+                         db: Session,
+                         cap: int | None = None) -> int:
+    """
+    Counts the contacts of a user, optionally matching a search query.
+
+    Args:
+        user (User): The user whose contacts are counted.
+        search (str | None): Search query, as for `get_contacts`.
+        db (Session): SQLAlchemy session for database access.
+        cap (int | None): Stop counting past this many contacts, so that
+                          broad searches do not scan the whole address
+                          book; the result is then `cap + 1`.
+
+    Returns:
+        int: The number of matching contacts, at most `cap + 1`.
+    """
+    query = db.query(Contact.id).filter(Contact.user_id == user.id)
+    if search:
+        query = query.filter(_search_filter(search))
+    if cap is not None:
+        query = query.limit(cap + 1)
+    return db.query(func.count()).select_from(query.subquery()).scalar()
+
+
 async def get_contact(contact_id: int, user: User, db: Session) -> Contact:
     """
     Retrieves a single contact by its ID.
@@ -63,6 +106,39 @@ async def get_contact(contact_id: int, user: User, db: Session) -> Contact:
     )
 
 
+async def get_contacts_by_phone(phone_number: str,
+                                user: User,
+                                db: Session) -> List[Contact]:
+    """
+    Retrieves the contacts of a user with a given phone number.
+
+    The number is normalized to its digits and matched exactly against
+    the indexed `phone_digits` column, so formatting variants such as
+    "+1 (555) 123" and "1555123" find the same contacts.
+
+    Args:
+        phone_number (str): The phone number to look up.
+        user (User): The user whose contacts are searched.
+        db (Session): SQLAlchemy session for database access.
+
+    Returns:
+        List[Contact]: The contacts with this phone number.
+    """
+    digits = normalize_phone(phone_number)
+    if not digits:
+        return []
+    return (
+        db.query(Contact)
+        .filter(
+            and_(
+                Contact.user_id == user.id,
+                Contact.phone_digits == digits
+            )
+        )
+        .all()
+    )
+
+
 async def create_contact(body: ContactModel,
                          user: User,
                          db: Session) -> Contact:
@@ -208,3 +284,252 @@ async def get_upcoming_birthdays(db: Session,
                 )
             )
         ).all()
+
+
+async def get_birthdays(user_id: int, db: Session) -> List:
+    """
+    Retrieves the names and birthdays of all contacts of a user that
+    have a birthday, for the calendar feed.
+
+    Args:
+        user_id (int): The identifier of the user.
+        db (Session): SQLAlchemy session for database access.
+
+    Returns:
+        List: Rows with the id, first_name, last_name and birthday
+              of the contacts, ordered by ID.
+    """
+    return (
+        db.query(
+            Contact.id,
+            Contact.first_name,
+            Contact.last_name,
+            Contact.birthday
+        )
+        .filter(Contact.user_id == user_id, Contact.birthday.is_not(None))
+        .order_by(Contact.id)
+        .all()
+    )
+
+
+async def get_contacts_by_ids(contact_ids: List[int],
+                              user: User,
+                              db: Session) -> List[Contact]:
+    """
+    Retrieves the contacts of a user matching a list of IDs in one query.
+
+    Args:
+        contact_ids (List[int]): The unique identifiers of the contacts.
+        user (User): The user whose contacts are to be retrieved.
+        db (Session): SQLAlchemy session for database access.
+
+    Returns:
+        List[Contact]: The contacts found, in no particular order.
+    """
+    if not contact_ids:
+        return []
+    return (
+        db.query(Contact)
+        .filter(
+            and_(
+                Contact.id.in_(contact_ids),
+                Contact.user_id == user.id
+            )
+        )
+        .all()
+    )
+
+
+async def lookup_contacts(contact_ids: List[int],
+                          user: User,
+                          db: Session) -> tuple[List[Contact], List[int]]:
+    """
+    Resolves a list of contact IDs of a user with a single query.
+
+    Args:
+        contact_ids (List[int]): The unique identifiers of the contacts.
+        user (User): The user whose contacts are to be retrieved.
+        db (Session): SQLAlchemy session for database access.
+
+    Returns:
+        tuple[List[Contact], List[int]]: The contacts found in the order of
+                                         their first request, and the IDs
+                                         that were not found.
+    """
+    contact_ids = list(dict.fromkeys(contact_ids))
+    found = {
+        contact.id: contact
+        for contact in await get_contacts_by_ids(contact_ids, user, db)
+    }
+    return (
+        [found[i] for i in contact_ids if i in found],
+        [i for i in contact_ids if i not in found],
+    )
+
+
+async def find_duplicate_contacts(user: User, db: Session) -> List[dict]:
+    """
+    Detects clusters of likely duplicate contacts of a user.
+
+    Only the columns needed for matching are streamed from the database,
+    and the comparison itself is done by the blocking engine in
+    `src.services.duplicates`.
+
+    Args:
+        user (User): The user whose contacts are checked.
+        db (Session): SQLAlchemy session for database access.
+
+    Returns:
+        List[dict]: Clusters with the "ids" of duplicate contacts and the
+                    "reasons" they were matched on.
+    """
+    rows = (
+        db.query(
+            Contact.id,
+            Contact.first_name,
+            Contact.last_name,
+            Contact.email,
+            Contact.phone_number,
+            Contact.birthday
+        )
+        .filter(Contact.user_id == user.id)
+        .yield_per(10000)
+    )
+    return find_duplicates(rows)
+
+
+async def merge_contacts(primary_id: int,
+                         duplicate_ids: List[int],
+                         user: User,
+                         db: Session) -> Optional[Contact]:
+    """
+    Merges duplicate contacts into a primary contact in one transaction.
+
+    Empty email, phone number and birthday fields of the primary contact
+    are filled from the duplicates in the given order, their additional
+    information is appended, and the duplicates are deleted.
+
+    Args:
+        primary_id (int): The unique identifier of the contact to keep.
+        duplicate_ids (List[int]): The identifiers of the contacts
+                                   merged into it.
+        user (User): The user whose contacts are merged.
+        db (Session): SQLAlchemy session for database access.
+
+    Returns:
+        Optional[Contact]: The merged contact, or None if the primary
+                           contact or any duplicate was not found.
+    """
+    duplicate_ids = [
+        i for i in dict.fromkeys(duplicate_ids) if i != primary_id
+    ]
+    contacts = {
+        contact.id: contact
+        for contact in await get_contacts_by_ids(
+            [primary_id, *duplicate_ids], user, db
+        )
+    }
+    if len(contacts) != len(duplicate_ids) + 1:
+        return None
+
+    primary = contacts[primary_id]
+    duplicates = [contacts[i] for i in duplicate_ids]
+    updates = {}
+    notes = [primary.additional_info] if primary.additional_info else []
+    for duplicate in duplicates:
+        for field in MERGED_FIELDS:
+            value = getattr(duplicate, field)
+            if value and not getattr(primary, field):
+                updates.setdefault(field, value)
+        info = duplicate.additional_info
+        if info and info not in notes:
+            notes.append(info)
+
+    try:
+        for duplicate in duplicates:
+            db.delete(duplicate)
+        # Free unique values such as the email before moving them over.
+        db.flush()
+        for field, value in updates.items():
+            setattr(primary, field, value)
+        primary.additional_info = '\n'.join(notes) or None
+        db.commit()
+        db.refresh(primary)
+        return primary
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def get_contact_stats(user: User, today: date, db: Session) -> dict:
+    """
+    Computes aggregate statistics of a user's contacts in one query.
+
+    The counts per email domain, per birth month, of recently added
+    contacts and in total are grouped by the database and combined with
+    UNION ALL, so a single round-trip returns a few dozen rows however
+    large the address book is.
+
+    Args:
+        user (User): The user whose contacts are aggregated.
+        today (date): The current date, which recent additions are
+                      counted back from.
+        db (Session): SQLAlchemy session for database access.
+
+    Returns:
+        dict: The "total" number of contacts, the most common email domains
+              in "by_email_domain", the "by_birth_month" counts of all
+              twelve months and the "recently_added" counts.
+    """
+    if db.get_bind().dialect.name == 'postgresql':
+        domain = func.split_part(Contact.email, '@', 2)
+    else:
+        domain = func.substr(Contact.email, func.instr(Contact.email, '@') + 1)
+    domain = func.lower(domain)
+    owned = Contact.user_id == user.id
+    count = func.count().label('count')
+
+    domains = (
+        select(literal('domain').label('kind'), domain.label('key'), count)
+        .where(owned, Contact.email.contains('@'))
+        .group_by(domain)
+        .order_by(func.count().desc(), domain)
+        .limit(STATS_TOP_DOMAINS)
+        .subquery()
+    )
+    month = cast(extract('month', Contact.birthday), String)
+    queries = [
+        select(literal('total'), cast(null(), String), count).where(owned),
+        select(domains),
+        select(literal('month'), month, count)
+        .where(owned, Contact.birthday.is_not(None))
+        .group_by(month),
+    ]
+    midnight = datetime.combine(today, datetime.min.time())
+    for days in STATS_RECENT_DAYS:
+        since = midnight - timedelta(days=days)
+        queries.append(
+            select(literal('recent'), literal(str(days)), count)
+            .where(owned, Contact.created_at >= since)
+        )
+
+    stats = {
+        "total": 0,
+        "by_email_domain": [],
+        "by_birth_month": [
+            {"month": month, "count": 0} for month in range(1, 13)
+        ],
+        "recently_added": [],
+    }
+    for kind, key, value in db.execute(union_all(*queries)):
+        if kind == 'total':
+            stats["total"] = value
+        elif kind == 'domain':
+            stats["by_email_domain"].append({"domain": key, "count": value})
+        elif kind == 'month':
+            stats["by_birth_month"][int(float(key)) - 1]["count"] = value
+        else:
+            stats["recently_added"].append({"days": int(key), "count": value})
+    stats["by_email_domain"].sort(key=lambda d: (-d["count"], d["domain"]))
+    stats["recently_added"].sort(key=lambda r: r["days"])
+    return stats
@@ -1,4 +1,3 @@
-from libgravatar import Gravatar
 from sqlalchemy.orm import Session
 
 from src.database.models import User
@@ -31,6 +30,8 @@ async def create_user(body: UserModel, db: Session) -> User:
     Returns:
         User: The newly created user object with all details.
     """
+    from libgravatar import Gravatar
+
     avatar = None
     try:
         g = Gravatar(body.email)
@@ -44,20 +45,6 @@ async def create_user(body: UserModel, db: Session) -> User:
     return new_user
 
 
-async def update_token(user: User, token: str | None, db: Session) -> None:
-    """
-    Update the refresh token for a user in the database.
-
-    Args:
-        user (User): The user object whose token is to be updated.
-        token (str | None): The new refresh token to be saved.
-                            If None, it will clear the existing token.
-        db (Session): The SQLAlchemy session for database interaction.
-    """
-    user.refresh_token = token
-    db.commit()
-
-
 async def confirm_email(email: str, db: Session) -> None:
     """
     Confirm the user's email address in the database. This function sets the
@@ -93,3 +80,37 @@ async def update_avatar(email, url: str, db: Session) -> User:
     user.avatar = url
     db.commit()
     return user
+
+
+async def get_user_by_calendar_token(token: str, db: Session) -> User:
+    """
+    Retrieve the user owning a birthday calendar feed.
+
+    Args:
+        token (str): The secret token from the URL of the feed.
+        db (Session): The SQLAlchemy session for database interaction.
+
+    Returns:
+        User: The user object if found, otherwise None.
+    """
+    return db.query(User).filter(User.calendar_token == token).first()
+
+
+async def update_calendar_token(email: str,
+                                token: str | None,
+                                db: Session) -> User:
+    """
+    Set or clear the token of a user's birthday calendar feed.
+
+    Args:
+        email (str): The email address of the user.
+        token (str | None): The new token, or None to disable the feed.
+        db (Session): The SQLAlchemy session for database interaction.
+
+    Returns:
+        User: The updated user object.
+    """
+    user = await get_user_by_email(email, db)
+    user.calendar_token = token
+    db.commit()
+    return user
@@ -0,0 +1,71 @@
+import hmac
+from datetime import datetime
+from typing import List
+
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from fastapi.responses import FileResponse
+
+from src.conf.config import settings
+from src.middleware.profiling import list_profiles
+from src.schemas import ProfileModel
+
+
+def verify_profiling_token(x_profile_token: str = Header(default="")):
+    """
+    Only let through requests presenting the configured profiling token.
+
+    Raises:
+        HTTPException: If no token is configured or the token is invalid.
+    """
+    if not settings.profiling_token or not hmac.compare_digest(
+        x_profile_token.encode(), settings.profiling_token.encode()
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Invalid profiling token"
+        )
+
+
+router = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    dependencies=[Depends(verify_profiling_token)]
+)
+
+
+@router.get(
+        "/profiles",
+        response_model=List[ProfileModel],
+        description=(
+            "Lists the recorded request profiles, newest first. Requires "
+            "the profiling token in the X-Profile-Token header."
+        )
+)
+async def read_profiles():
+    profiles = []
+    for path in list_profiles(settings.profiling_dir):
+        stat = path.stat()
+        profiles.append({
+            "name": path.name,
+            "size": stat.st_size,
+            "created_at": datetime.fromtimestamp(stat.st_mtime),
+        })
+    return profiles
+
+
+@router.get(
+        "/profiles/{name}",
+        response_class=FileResponse,
+        description=(
+            "Downloads a recorded request profile: an HTML report when "
+            "pyinstrument is installed, a pstats file otherwise."
+        )
+)
+async def read_profile(name: str):
+    # Only names of recorded profiles are served, never arbitrary paths.
+    for path in list_profiles(settings.profiling_dir):
+        if path.name == name:
+            return FileResponse(path, filename=path.name)
+    raise HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found"
+    )
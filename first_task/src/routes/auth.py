@@ -1,3 +1,5 @@
+from typing import List
+
 from fastapi import (
     APIRouter,
     HTTPException,
@@ -17,9 +19,17 @@ from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.orm import Session
 
 from src.database.db import get_db
-from src.schemas import UserModel, UserResponse, TokenModel, RequestEmail
+from src.database.models import User
+from src.schemas import (
+    UserModel,
+    UserResponse,
+    TokenModel,
+    RequestEmail,
+    SessionModel,
+)
 from src.repository import users as repository_users
 from src.services.auth import auth_service
+from src.services.sessions import session_store
 from src.services.email import send_email, send_reset_email
 
 router = APIRouter(prefix='/auth', tags=["auth"])
@@ -68,12 +78,14 @@ async def signup(
         description=(
             "Authenticates a user by their email and password, returning "
             "JWT access and refresh tokens if successful. Ensures that only "
-            "confirmed emails can log in to enhance security. "
-            "Rate-limited to 10 requests per minute."
+            "confirmed emails can log in to enhance security. Each login "
+            "starts a separate session, so several devices can stay signed "
+            "in at once. Rate-limited to 10 requests per minute."
         ),
         dependencies=[Depends(RateLimiter(times=10, seconds=60))]
 )
 async def login(
+    request: Request,
     body: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
@@ -101,10 +113,11 @@ async def login(
     access_token = (
         await auth_service.create_access_token(data={"sub": user.email})
     )
-    refresh_token = (
-        await auth_service.create_refresh_token(data={"sub": user.email})
+    device = request.headers.get("user-agent", "unknown")[:100]
+    family_id, token_id = await session_store.start(user.email, device)
+    refresh_token = await auth_service.create_refresh_token(
+        data={"sub": user.email, "fam": family_id, "jti": token_id}
     )
-    await repository_users.update_token(user, refresh_token, db)
 
     return {
         "access_token": access_token,
@@ -118,20 +131,24 @@ async def login(
         description=(
             "Allows a user to refresh their session by validating an existing "
             "refresh token and issuing new access and refresh tokens. "
+            "Each refresh token can be used only once: reusing a rotated "
+            "token revokes the whole session. "
             "This process is rate-limited to 10 requests per minute "
             "to maintain security."
         ),
         dependencies=[Depends(RateLimiter(times=10, seconds=60))]
 )
 async def refresh_token(
-    credentials: HTTPAuthorizationCredentials = Security(security),
-    db: Session = Depends(get_db)
+    credentials: HTTPAuthorizationCredentials = Security(security)
 ):
-    token = credentials.credentials
-    email = await auth_service.decode_refresh_token(token)
-    user = await repository_users.get_user_by_email(email, db)
-    if user.refresh_token != token:
-        await repository_users.update_token(user, None, db)
+    payload = await auth_service.decode_refresh_token(credentials.credentials)
+    email, family_id = payload["sub"], payload.get("fam")
+    token_id = None
+    if family_id:
+        token_id = await session_store.rotate(
+            email, family_id, payload.get("jti")
+        )
+    if token_id is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid refresh token"
@@ -140,10 +157,9 @@ async def refresh_token(
     access_token = (
         await auth_service.create_access_token(data={"sub": email})
     )
-    refresh_token = (
-        await auth_service.create_refresh_token(data={"sub": email})
+    refresh_token = await auth_service.create_refresh_token(
+        data={"sub": email, "fam": family_id, "jti": token_id}
     )
-    await repository_users.update_token(user, refresh_token, db)
 
     return {
         "access_token": access_token,
@@ -152,6 +168,38 @@ async def refresh_token(
     }
 
 
+@router.get(
+        '/sessions', response_model=List[SessionModel],
+        description=(
+            "Lists the active sessions of the current user, one per device "
+            "the user has logged in from, most recently used first."
+        )
+)
+async def read_sessions(
+    current_user: User = Depends(auth_service.get_current_user)
+):
+    return await session_store.list_sessions(current_user.email)
+
+
+@router.delete(
+        '/sessions/{session_id}',
+        description=(
+            "Revokes a session of the current user, signing the "
+            "corresponding device out once its access token expires."
+        )
+)
+async def revoke_session(
+    session_id: str,
+    current_user: User = Depends(auth_service.get_current_user)
+):
+    if not await session_store.revoke(current_user.email, session_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Session not found"
+        )
+    return {"message": "Session revoked"}
+
+
 @router.get(
         '/confirm_email/{token}',
         description=(
@@ -274,4 +322,5 @@ async def reset_password(
     hashed_password = auth_service.get_password_hash(new_password)
     user.password = hashed_password
     db.commit()
+    await session_store.revoke_all(user.email)
     return {"message": "Your password has been reset successfully."}
@@ -0,0 +1,107 @@
+import secrets
+from email.utils import parsedate_to_datetime
+
+from fastapi import (
+    APIRouter, Depends, HTTPException, Request, Response, status
+)
+from sqlalchemy.orm import Session
+
+from src.database.db import get_db
+from src.database.models import User
+from src.repository import users as repository_users
+from src.schemas import CalendarFeed
+from src.services.auth import auth_service
+from src.services.calendar import calendar_service
+
+router = APIRouter(prefix="/calendar", tags=["calendar"])
+
+FEED_MEDIA_TYPE = "text/calendar; charset=utf-8"
+FEED_CACHE_CONTROL = "private, max-age=900"
+
+
+def _not_modified(request: Request, feed: dict) -> bool:
+    """Evaluate the conditional headers of a feed request."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match uses the weak comparison, ignoring the W/ prefix.
+        tags = [
+            tag.strip().removeprefix("W/") for tag in if_none_match.split(",")
+        ]
+        return "*" in tags or feed["etag"].removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+            modified = parsedate_to_datetime(feed["last_modified"])
+        except (TypeError, ValueError):
+            return False
+        return since.tzinfo is not None and modified <= since
+    return False
+
+
+@router.post(
+        "/token", response_model=CalendarFeed,
+        description=(
+            "Creates a secret URL for a calendar feed of the birthdays of "
+            "all contacts, to subscribe to from calendar applications. "
+            "Calling it again replaces the URL, revoking the previous one."
+        )
+)
+async def create_calendar_token(
+    request: Request,
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db)
+):
+    token, previous = secrets.token_urlsafe(32), current_user.calendar_token
+    await repository_users.update_calendar_token(current_user.email, token, db)
+    # Dropped once revoked, so that the previous feed is not cached again.
+    await calendar_service.invalidate_token(previous)
+    auth_service.clear_cached_user(current_user.email)
+    return {"url": str(request.url_for("read_calendar_feed", token=token))}
+
+
+@router.delete(
+        "/token",
+        description="Disables the birthday calendar feed of the user."
+)
+async def delete_calendar_token(
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db)
+):
+    previous = current_user.calendar_token
+    await repository_users.update_calendar_token(current_user.email, None, db)
+    await calendar_service.invalidate_token(previous)
+    auth_service.clear_cached_user(current_user.email)
+    return {"message": "Calendar feed disabled"}
+
+
+@router.get(
+        "/{token}.ics",
+        response_class=Response,
+        description=(
+            "Serves the birthday calendar feed behind a secret URL, with "
+            "yearly recurring events. Responses carry ETag and Last-Modified "
+            "headers, and the feed is cached until the contacts change."
+        )
+)
+async def read_calendar_feed(
+    token: str, request: Request, db: Session = Depends(get_db)
+):
+    feed = await calendar_service.get_feed(token, db)
+    if feed is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Calendar not found"
+        )
+    headers = {
+        "ETag": feed["etag"],
+        "Last-Modified": feed["last_modified"],
+        "Cache-Control": FEED_CACHE_CONTROL,
+    }
+    if _not_modified(request, feed):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers=headers
+        )
+    return Response(
+        content=feed["body"], media_type=FEED_MEDIA_TYPE, headers=headers
+    )
@@ -1,14 +1,30 @@
 from datetime import date
 from typing import List
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import (
+    APIRouter, HTTPException, Depends, Path, Query, Response, status
+)
 from fastapi_limiter.depends import RateLimiter
 from sqlalchemy.orm import Session
 
 from src.database.db import get_db
-from src.schemas import ContactModel, ContactResponse, ContactUpdate
+from src.schemas import (
+    ContactModel,
+    ContactResponse,
+    ContactUpdate,
+    ContactSuggestion,
+    DuplicateCluster,
+    ContactMerge,
+    ContactStats,
+    ContactLookup,
+    ContactLookupResponse,
+)
 from src.database.models import User
 from src.repository import contacts as repository_contacts
+from src.services.calendar import calendar_service
+from src.services.counters import counter_service
+from src.services.stats import stats_service
+from src.services.suggest import suggest_service
 from .auth import auth_service
 
 router = APIRouter(prefix='/contacts', tags=["contacts"])
@@ -36,17 +52,149 @@ async def get_upcoming_birthdays(
     return upcoming_birthdays
 
 
+@router.get(
+        "/stats", response_model=ContactStats,
+        description=(
+            "Returns aggregate statistics of the user's contacts: the most "
+            "common email domains, birthdays per month and the number of "
+            "contacts added recently. Computed in a single grouped query "
+            "and cached until the contacts change. "
+            "Rate-limited to 30 requests per minute."
+        ),
+        dependencies=[Depends(RateLimiter(times=30, seconds=60))]
+)
+async def read_contact_stats(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+):
+    return await stats_service.get(current_user, date.today(), db)
+
+
+@router.get(
+        "/suggest", response_model=List[ContactSuggestion],
+        description=(
+            "Suggests contacts whose first name, last name, full name or "
+            "email starts with the given prefix. Intended for typeahead "
+            "pickers calling it on every keystroke, so suggestions are "
+            "served from a Redis index without querying the database. "
+            "Rate-limited to 120 requests per minute."
+        ),
+        dependencies=[Depends(RateLimiter(times=120, seconds=60))]
+)
+async def suggest_contacts(
+    prefix: str = Query(min_length=1, max_length=50),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+):
+    return await suggest_service.suggest(current_user, prefix, limit, db)
+
+
+@router.get(
+        "/duplicates", response_model=List[DuplicateCluster],
+        description=(
+            "Detects clusters of likely duplicate contacts, matched by "
+            "normalized email, phone number or a similar sounding name. "
+            "Largest clusters are returned first. Rate-limited to 10 "
+            "requests per minute as it scans the whole address book."
+        ),
+        dependencies=[Depends(RateLimiter(times=10, seconds=60))]
+)
+async def find_duplicates(
+    limit: int = Query(100, ge=1, le=1000),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+):
+    clusters = (
+        await repository_contacts
+        .find_duplicate_contacts(current_user, db)
+    )[:limit]
+    contacts = {
+        contact.id: contact
+        for contact in await repository_contacts.get_contacts_by_ids(
+            [i for cluster in clusters for i in cluster["ids"]],
+            current_user, db
+        )
+    }
+    return [
+        {
+            "contacts": [contacts[i] for i in cluster["ids"]],
+            "reasons": cluster["reasons"]
+        }
+        for cluster in clusters
+    ]
+
+
+@router.post(
+        "/duplicates/merge", response_model=ContactResponse,
+        description=(
+            "Merges duplicate contacts into a primary contact within a "
+            "single transaction. Missing details of the primary contact are "
+            "filled from the duplicates, which are then deleted. "
+            "Rate-limited to 10 requests per minute."
+        ),
+        dependencies=[Depends(RateLimiter(times=10, seconds=60))]
+)
+async def merge_duplicates(
+    body: ContactMerge,
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db)
+):
+    contact = await repository_contacts.merge_contacts(
+        body.primary_id, body.duplicate_ids, current_user, db
+    )
+    if contact is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
+        )
+    removed_ids = [
+        i for i in dict.fromkeys(body.duplicate_ids) if i != body.primary_id
+    ]
+    await suggest_service.remove_contacts(current_user.id, removed_ids)
+    await counter_service.adjust(current_user.id, -len(removed_ids))
+    await suggest_service.index_contact(contact)
+    await stats_service.invalidate(current_user.id)
+    await calendar_service.invalidate(current_user)
+    return contact
+
+
+@router.post(
+        "/lookup", response_model=ContactLookupResponse,
+        description=(
+            "Fetches up to 500 contacts by their IDs in one query, for "
+            "clients holding contact IDs, e.g. from notifications. Contacts "
+            "are returned in the requested order, and IDs that match no "
+            "contact of the user are listed as missing. "
+            "Rate-limited to 30 requests per minute."
+        ),
+        dependencies=[Depends(RateLimiter(times=30, seconds=60))]
+)
+async def lookup_contacts(
+    body: ContactLookup,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(auth_service.get_current_user)
+):
+    contacts, missing = await repository_contacts.lookup_contacts(
+        body.ids, current_user, db
+    )
+    return {"contacts": contacts, "missing": missing}
+
+
 @router.get(
         "/", response_model=List[ContactResponse],
         description=(
             "Retrieves a list of all contacts from the database. "
             "Allows searching by various fields if specified. "
+            "The total number of matching contacts is returned in the "
+            "X-Total-Count header; totals of broad searches are capped, "
+            "which is flagged by an X-Total-Count-Estimated header. "
             "Rate-limited to 10 requests per minute to prevent abuse "
             "and ensure service responsiveness."
         ),
         dependencies=[Depends(RateLimiter(times=10, seconds=60))]
 )
 async def read_contacts(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     search: str = None,
@@ -57,9 +205,36 @@ async def read_contacts(
         await repository_contacts
         .get_contacts(skip, limit, current_user, search, db)
     )
+    if len(contacts) < limit and (contacts or not skip):
+        # A partial page is the last one, so its total needs no count.
+        total, exact = skip + len(contacts), True
+    else:
+        total, exact = await counter_service.total(current_user, search, db)
+    response.headers["X-Total-Count"] = str(total)
+    if not exact:
+        response.headers["X-Total-Count-Estimated"] = "true"
     return contacts
 
 
+@router.get(
+        "/by-phone/{phone_number}", response_model=List[ContactResponse],
+        description=(
+            "Looks up contacts by phone number regardless of its formatting, "
+            "e.g. for caller-ID integrations. The number is reduced to its "
+            "digits and matched exactly against an indexed column, so the "
+            "lookup stays cheap at high request rates."
+        )
+)
+async def read_contacts_by_phone(
+    phone_number: str = Path(max_length=30),
+    current_user: User = Depends(auth_service.get_current_user),
+    db: Session = Depends(get_db)
+):
+    return await repository_contacts.get_contacts_by_phone(
+        phone_number, current_user, db
+    )
+
+
 @router.get(
         "/{contact_id}", response_model=ContactResponse,
         description=(
@@ -103,7 +278,14 @@ async def create_contact(
     current_user: User = Depends(auth_service.get_current_user),
     db: Session = Depends(get_db)
 ):
-    return await repository_contacts.create_contact(body, current_user, db)
+    contact = (
+        await repository_contacts.create_contact(body, current_user, db)
+    )
+    await suggest_service.index_contact(contact)
+    await counter_service.adjust(current_user.id, 1)
+    await stats_service.invalidate(current_user.id)
+    await calendar_service.invalidate(current_user)
+    return contact
 
 
 @router.patch(
@@ -130,6 +312,9 @@ async def update_contact(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
         )
+    await suggest_service.index_contact(contact)
+    await stats_service.invalidate(current_user.id)
+    await calendar_service.invalidate(current_user)
     return contact
 
 
@@ -155,4 +340,8 @@ async def remove_contact(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Contact not found"
         )
+    await suggest_service.remove_contact(contact)
+    await counter_service.adjust(current_user.id, -1)
+    await stats_service.invalidate(current_user.id)
+    await calendar_service.invalidate(current_user)
     return contact
@@ -1,16 +1,12 @@
-from fastapi import APIRouter, Depends, UploadFile, File
+from fastapi import (
+    APIRouter, BackgroundTasks, Depends, UploadFile, File, status
+)
 from fastapi_limiter.depends import RateLimiter
-from sqlalchemy.orm import Session
-
-import cloudinary
-import cloudinary.uploader
 
-from src.database.db import get_db
 from src.database.models import User
-from src.repository import users as repository_users
 from src.services.auth import auth_service
-from src.conf.config import settings
-from src.schemas import UserDb
+from src.services.avatars import avatar_service
+from src.schemas import AvatarUploadResponse, UserDb
 
 router = APIRouter(prefix="/users", tags=["users"])
 
@@ -33,39 +29,32 @@ async def read_users_me(
 
 @router.patch(
         '/avatar',
-        response_model=UserDb,
+        response_model=AvatarUploadResponse,
+        status_code=status.HTTP_202_ACCEPTED,
         description=(
             "Updates the user's avatar image. This endpoint allows "
-            "authenticated users to upload a new avatar image, which will be "
-            "stored and managed via Cloudinary. The new avatar URL is then "
-            "updated in the user's profile. This endpoint is rate-limited "
-            "to 10 requests per minute to prevent abuse."
+            "authenticated users to upload a new avatar image, which is "
+            "resized and stored via Cloudinary or the local filesystem "
+            "after the response has been sent. The response carries the "
+            "pending URL the new avatar will be served from. The avatar URL "
+            "of the profile is updated once the image is stored; until then, "
+            "and if the image cannot be stored, the previous avatar is kept. "
+            "This endpoint is rate-limited to 10 requests per minute to "
+            "prevent abuse."
         ),
         dependencies=[Depends(RateLimiter(times=10, seconds=60))]
 )
 async def update_avatar_user(
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(),
-    current_user: User = Depends(auth_service.get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(auth_service.get_current_user)
 ):
-    cloudinary.config(
-        cloud_name=settings.cloudinary_name,
-        api_key=settings.cloudinary_api_key,
-        api_secret=settings.cloudinary_api_secret,
-        secure=True
-    )
-
-    public_id = f'ContactsApp/{current_user.username}'
-    r = cloudinary.uploader.upload(
-        file.file,
-        public_id=public_id,
-        overwrite=True
-    )
-    src_url = cloudinary.CloudinaryImage(public_id).build_url(
-        width=250, height=250, crop='fill', version=r.get('version')
-    )
-
-    user = await repository_users.update_avatar(
-        current_user.email, src_url, db
+    spooled = await avatar_service.spool(file)
+    key = str(current_user.id)
+    background_tasks.add_task(
+        avatar_service.finalize, spooled, key, current_user.email
     )
-    return user
+    return {
+        "user": current_user,
+        "pending_avatar": avatar_service.pending_url(key),
+    }
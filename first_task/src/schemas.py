@@ -1,5 +1,5 @@
 from datetime import datetime, date
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field, EmailStr
 
 
@@ -69,6 +69,109 @@ class ContactResponse(ContactBase):
         from_attributes = True
 
 
+class ContactSuggestion(BaseModel):
+    """
+    A lightweight representation of a contact returned by the typeahead
+    endpoint.
+
+    Attributes:
+        id (int): The unique identifier for the contact.
+        first_name (str): The first name of the contact.
+        last_name (str): The last name of the contact.
+        email (Optional[str]): The email address of the contact.
+    """
+    id: int
+    first_name: str
+    last_name: str
+    email: Optional[str] = None
+
+
+class DuplicateCluster(BaseModel):
+    """
+    A group of contacts that are likely to describe the same person.
+
+    Attributes:
+        contacts (List[ContactResponse]): The contacts of the cluster.
+        reasons (List[str]): The fields the contacts were matched on,
+                             any of "email", "phone" and "name".
+    """
+    contacts: List[ContactResponse]
+    reasons: List[str]
+
+
+class ContactMerge(BaseModel):
+    """
+    A model describing which duplicate contacts to merge.
+
+    Attributes:
+        primary_id (int): The identifier of the contact to keep.
+        duplicate_ids (List[int]): The identifiers of the contacts merged
+                                   into the primary one and then deleted.
+    """
+    primary_id: int
+    duplicate_ids: List[int] = Field(min_length=1, max_length=100)
+
+
+class ContactLookup(BaseModel):
+    """
+    A model listing the contacts to fetch in one request.
+
+    Attributes:
+        ids (List[int]): The identifiers of the contacts, at most 500.
+    """
+    ids: List[int] = Field(min_length=1, max_length=500)
+
+
+class ContactLookupResponse(BaseModel):
+    """
+    The result of a batch lookup of contacts.
+
+    Attributes:
+        contacts (List[ContactResponse]): The contacts found, in the order
+                                          their IDs were requested.
+        missing (List[int]): The requested IDs that matched no contact
+                             of the user.
+    """
+    contacts: List[ContactResponse]
+    missing: List[int]
+
+
+class DomainCount(BaseModel):
+    """The number of contacts with an email address at a domain."""
+    domain: str
+    count: int
+
+
+class MonthCount(BaseModel):
+    """The number of contacts born in a month, numbered from 1."""
+    month: int
+    count: int
+
+
+class RecentCount(BaseModel):
+    """The number of contacts added within a number of days."""
+    days: int
+    count: int
+
+
+class ContactStats(BaseModel):
+    """
+    Aggregate statistics of a user's contacts, for dashboards.
+
+    Attributes:
+        total (int): The number of contacts.
+        by_email_domain (List[DomainCount]): The most common email domains.
+        by_birth_month (List[MonthCount]): Birthdays in each of the twelve
+                                           months of the year.
+        recently_added (List[RecentCount]): Contacts added within the last
+                                            7 and 30 days.
+    """
+    total: int
+    by_email_domain: List[DomainCount]
+    by_birth_month: List[MonthCount]
+    recently_added: List[RecentCount]
+
+
 class UserModel(BaseModel):
     """
     A model representing the data required to create a user.
@@ -122,6 +225,23 @@ class UserResponse(BaseModel):
     detail: str = "User successfully created"
 
 
+class AvatarUploadResponse(BaseModel):
+    """
+    A response model for an accepted avatar upload, which is stored after
+    the response has been sent.
+
+    Attributes:
+        user (UserDb): The user data, still with the previous avatar.
+        pending_avatar (str): The URL the new avatar is served from once
+                              it is stored.
+        status (str): The state of the upload, "pending" until the avatar
+                      is stored and the profile points to it.
+    """
+    user: UserDb
+    pending_avatar: str
+    status: str = "pending"
+
+
 class TokenModel(BaseModel):
     """
     A model representing the authentication tokens including access and
@@ -139,6 +259,22 @@ class TokenModel(BaseModel):
     token_type: str = "bearer"
 
 
+class SessionModel(BaseModel):
+    """
+    A model describing an active refresh-token session of a user.
+
+    Attributes:
+        id (str): The identifier of the session (its token family).
+        device (str): The device the session was started from.
+        created_at (datetime): When the user logged in on the device.
+        last_used (datetime): When the session was last refreshed.
+    """
+    id: str
+    device: str
+    created_at: datetime
+    last_used: datetime
+
+
 class RequestEmail(BaseModel):
     """
     A model designed to handle incoming email data for requests that
@@ -151,3 +287,27 @@ class RequestEmail(BaseModel):
                           conforms to the format of a standard email address.
     """
     email: EmailStr
+
+
+class ProfileModel(BaseModel):
+    """
+    A model describing a recorded request profile.
+
+    Attributes:
+        name (str): The file name of the profile.
+        size (int): The size of the profile in bytes.
+        created_at (datetime): When the profile was recorded.
+    """
+    name: str
+    size: int
+    created_at: datetime
+
+
+class CalendarFeed(BaseModel):
+    """
+    A model describing the birthday calendar feed of a user.
+
+    Attributes:
+        url (str): The secret URL to subscribe to the feed.
+    """
+    url: str
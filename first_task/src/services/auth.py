@@ -1,27 +1,36 @@
 from typing import Optional
 from datetime import datetime, timedelta
+from functools import cached_property
 
 import pickle
-import redis
 
 from jose import JWTError, jwt
 from fastapi import HTTPException, status, Depends
 from fastapi.security import OAuth2PasswordBearer
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
 
+from src.database.cache import get_redis
 from src.database.db import get_db
 from src.repository import users as repository_users
 from src.conf.config import settings
 
 
 class Auth:
-    pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
     SECRET_KEY = settings.secret_key
     ALGORITHM = settings.algorithm
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-    # Redis instance for storing refresh tokens or other temporary data.
-    r = redis.Redis(host=settings.redis_host, port=settings.redis_port, db=0)
+
+    @cached_property
+    def pwd_context(self):
+        """Password hashing context, built on first use."""
+        from passlib.context import CryptContext
+
+        return CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+    @property
+    def r(self):
+        """Redis instance caching the users of authenticated requests."""
+        return get_redis()
 
     def verify_password(self, plain_password, hashed_password):
         """Verify a hashed password against the entered password."""
@@ -63,14 +72,13 @@ class Auth:
         return encoded_refresh_token
 
     async def decode_refresh_token(self, refresh_token: str):
-        """Decode a JWT refresh token."""
+        """Decode a JWT refresh token and return its payload."""
         try:
             payload = jwt.decode(
                 refresh_token, self.SECRET_KEY, algorithms=[self.ALGORITHM]
             )
             if payload['scope'] == 'refresh_token':
-                email = payload['sub']
-                return email
+                return payload
             raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED,
                                 detail='Invalid scope for token')
         except JWTError:
@@ -110,6 +118,10 @@ class Auth:
             user = pickle.loads(user)
         return user
 
+    def clear_cached_user(self, email: str):
+        """Drop a user from the cache after their profile has changed."""
+        self.r.delete(f"user:{email}")
+
     def create_email_token(self, data: dict):
         """Create a token for email verification purposes."""
         to_encode = data.copy()
@@ -0,0 +1,243 @@
+"""
+This module implements the avatar upload pipeline.
+
+An upload is spooled from the request into a temporary file, which keeps
+small images in memory and larger ones on disk. The image is then resized
+and encoded in a worker pool and handed to a storage backend, so neither
+the image processing nor the blocking upload stalls the event loop. The
+route responds as soon as the upload is spooled, with the pending URL the
+avatar will be served from, and the pipeline records the URL of the
+avatar once the image is stored, so that a failed upload leaves the
+previous avatar in place.
+
+Two storage backends are available: Cloudinary, and the local filesystem
+for tests and installations without access to Cloudinary.
+"""
+
+import asyncio
+import io
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from fastapi import HTTPException, UploadFile, status
+
+from src.conf.config import settings
+from src.database.db import SessionLocal
+from src.repository import users as repository_users
+from src.services.auth import auth_service
+
+AVATAR_SIZE = (250, 250)
+CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+
+
+class AvatarStorage(ABC):
+    """Interface of the places where processed avatars are stored."""
+
+    @abstractmethod
+    def url(self, key: str) -> str:
+        """Return the URL of the latest stored version of an avatar."""
+
+    @abstractmethod
+    def save(self, key: str, data: bytes) -> str:
+        """Store an encoded avatar and return its final URL. Blocking."""
+
+
+class CloudinaryStorage(AvatarStorage):
+    """Stores avatars in Cloudinary under the ContactsApp folder."""
+
+    def __init__(self):
+        self._configured = False
+
+    def _cloudinary(self):
+        import cloudinary
+        import cloudinary.uploader  # noqa: F401
+
+        if not self._configured:
+            cloudinary.config(
+                cloud_name=settings.cloudinary_name,
+                api_key=settings.cloudinary_api_key,
+                api_secret=settings.cloudinary_api_secret,
+                secure=True
+            )
+            self._configured = True
+        return cloudinary
+
+    def url(self, key: str, version: str | None = None) -> str:
+        """Return the URL of a version of a stored avatar."""
+        return self._cloudinary().CloudinaryImage(
+            f'ContactsApp/{key}'
+        ).build_url(
+            width=AVATAR_SIZE[0], height=AVATAR_SIZE[1], crop='fill',
+            version=version
+        )
+
+    def save(self, key: str, data: bytes) -> str:
+        r = self._cloudinary().uploader.upload(
+            io.BytesIO(data),
+            public_id=f'ContactsApp/{key}',
+            overwrite=True
+        )
+        return self.url(key, version=r.get('version'))
+
+
+class LocalStorage(AvatarStorage):
+    """Stores avatars as files in a directory served by the application."""
+
+    def __init__(self, directory: str, base_url: str):
+        self.directory = Path(directory)
+        self.base_url = base_url.rstrip('/')
+
+    def url(self, key: str) -> str:
+        """Return the URL of a stored avatar."""
+        return f"{self.base_url}/{key}.png"
+
+    def save(self, key: str, data: bytes) -> str:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"{key}.png"
+        # Write to a temporary file first so readers never see half a file.
+        with tempfile.NamedTemporaryFile(
+            dir=self.directory, suffix='.tmp', delete=False
+        ) as f:
+            f.write(data)
+        os.replace(f.name, path)
+        return f"{self.url(key)}?v={int(time.time())}"
+
+
+def get_storage() -> AvatarStorage:
+    """Return the storage backend selected by the `avatar_storage` setting."""
+    if settings.avatar_storage == 'local':
+        return LocalStorage(
+            settings.avatar_local_dir, settings.avatar_base_url
+        )
+    return CloudinaryStorage()
+
+
+def process_image(source) -> bytes:
+    """
+    Crop an image to the avatar size and encode it as PNG. Blocking.
+
+    Args:
+        source: A file object positioned at the start of the image.
+
+    Returns:
+        bytes: The encoded avatar.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        avatar = ImageOps.fit(image, AVATAR_SIZE)
+    output = io.BytesIO()
+    avatar.save(output, format='PNG', optimize=True)
+    return output.getvalue()
+
+
+def verify_image(source) -> None:
+    """Check that a file holds a readable image without decoding it."""
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image.verify()
+    source.seek(0)
+
+
+class AvatarService:
+    storage = get_storage()
+    executor = ThreadPoolExecutor(
+        max_workers=settings.avatar_workers,
+        thread_name_prefix='avatar'
+    )
+
+    async def spool(self, file: UploadFile):
+        """
+        Copy an upload into a spooled temporary file and validate it.
+
+        Args:
+            file (UploadFile): The uploaded file.
+
+        Returns:
+            SpooledTemporaryFile: The upload, rewound to its start.
+
+        Raises:
+            HTTPException: If the upload is too large or is not an image.
+        """
+        spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        size = 0
+        while chunk := await file.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > MAX_UPLOAD_SIZE:
+                spooled.close()
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Avatar image is too large"
+                )
+            spooled.write(chunk)
+        spooled.seek(0)
+        loop = asyncio.get_running_loop()
+        # Pillow raises UnidentifiedImageError, an OSError, for non-images.
+        try:
+            await loop.run_in_executor(self.executor, verify_image, spooled)
+        except (OSError, SyntaxError):
+            spooled.close()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Uploaded file is not a valid image"
+            )
+        return spooled
+
+    def pending_url(self, key: str) -> str:
+        """
+        Return the URL an avatar is served from once it is stored, before
+        the final, versioned URL is known.
+
+        Args:
+            key (str): The storage key of the avatar.
+
+        Returns:
+            str: The unversioned URL of the avatar.
+        """
+        return self.storage.url(key)
+
+    async def finalize(self, spooled, key: str, email: str) -> None:
+        """
+        Process and store a spooled avatar, then record its final URL.
+
+        Runs as a background task after the response has been sent. If
+        the image cannot be stored, the user keeps the previous avatar.
+
+        Args:
+            spooled: The spooled upload, closed when done.
+            key (str): The storage key of the avatar.
+            email (str): The email of the user the avatar belongs to.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            data = await loop.run_in_executor(
+                self.executor, process_image, spooled
+            )
+            url = await loop.run_in_executor(
+                self.executor, self.storage.save, key, data
+            )
+        except Exception as e:
+            print(f"Failed to store avatar: {e}")
+            return
+        finally:
+            spooled.close()
+
+        db = SessionLocal()
+        try:
+            await repository_users.update_avatar(email, url, db)
+        finally:
+            db.close()
+        auth_service.clear_cached_user(email)
+
+
+avatar_service = AvatarService()
@@ -0,0 +1,196 @@
+"""
+This module serves the birthday calendar feeds of users in iCalendar format.
+
+Every contact with a birthday becomes an all-day event recurring yearly.
+A feed is generated from the database the first time it is polled and kept
+in Redis together with its ETag and Last-Modified values, so that the many
+polls of calendar applications are answered from a single Redis lookup, or
+with 304 Not Modified. Contact writes drop the cached feed of their owner,
+and a feed generated while a write is committed is not stored, as it may
+predate it.
+"""
+
+import hashlib
+from datetime import date, datetime, timedelta, timezone
+from email.utils import formatdate
+from typing import Iterable
+
+import redis
+from sqlalchemy.orm import Session
+
+from src.database.cache import (
+    get_redis, invalidate, store_if_current, version_key
+)
+from src.database.models import User
+from src.repository import contacts as repository_contacts
+from src.repository import users as repository_users
+
+FEED_TTL = 24 * 60 * 60
+# Unknown tokens are remembered briefly so that pollers of a disabled
+# feed do not reach the database.
+MISSING_FEED_TTL = 5 * 60
+MAX_LINE_OCTETS = 75
+
+
+def _escape(text: str) -> str:
+    """Escape a value of a TEXT property."""
+    return (
+        text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,')
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+    )
+
+
+def _fold(line: str) -> str:
+    """Split a content line into lines of at most 75 octets."""
+    data = line.encode()
+    if len(data) <= MAX_LINE_OCTETS:
+        return line
+    parts, start = [], 0
+    while start < len(data):
+        end = min(start + MAX_LINE_OCTETS - (1 if parts else 0), len(data))
+        # Never split a multi-byte UTF-8 character.
+        while end < len(data) and data[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode())
+        start = end
+    return '\r\n '.join(parts)
+
+
+def _recurrence(birthday: date) -> str:
+    """Return the yearly recurrence rule of a birthday."""
+    if (birthday.month, birthday.day) == (2, 29):
+        # Celebrated on the last day of February in common years.
+        return 'RRULE:FREQ=YEARLY;BYMONTH=2;BYMONTHDAY=-1'
+    return 'RRULE:FREQ=YEARLY'
+
+
+def build_calendar(rows: Iterable, generated_at: datetime) -> str:
+    """
+    Render the birthdays of contacts as an iCalendar document.
+
+    Args:
+        rows (Iterable): Rows with the id, first_name, last_name and
+                         birthday of the contacts.
+        generated_at (datetime): The generation time, used as DTSTAMP.
+
+    Returns:
+        str: The calendar, with CRLF line endings.
+    """
+    stamp = generated_at.astimezone(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    lines = [
+        'BEGIN:VCALENDAR',
+        'VERSION:2.0',
+        'PRODID:-//ContactsApp//Birthdays//EN',
+        'CALSCALE:GREGORIAN',
+        'METHOD:PUBLISH',
+        'X-WR-CALNAME:Birthdays',
+    ]
+    for row in rows:
+        name = f"{row.first_name} {row.last_name}".strip()
+        lines += [
+            'BEGIN:VEVENT',
+            f'UID:birthday-{row.id}@contactsapp',
+            f'DTSTAMP:{stamp}',
+            f'DTSTART;VALUE=DATE:{row.birthday:%Y%m%d}',
+            f'DTEND;VALUE=DATE:{row.birthday + timedelta(days=1):%Y%m%d}',
+            _recurrence(row.birthday),
+            f'SUMMARY:{_escape(name)}\'s birthday',
+            'TRANSP:TRANSPARENT',
+            'END:VEVENT',
+        ]
+    lines.append('END:VCALENDAR')
+    return ''.join(_fold(line) + '\r\n' for line in lines)
+
+
+class BirthdayCalendar:
+    @property
+    def r(self) -> redis.Redis:
+        """Redis instance holding the generated feeds of all users."""
+        return get_redis(decode_responses=True)
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return f"calendar:{token}"
+
+    async def get_feed(self, token: str, db: Session) -> dict | None:
+        """
+        Return the birthday feed identified by a token.
+
+        Args:
+            token (str): The secret token from the URL of the feed.
+            db (Session): SQLAlchemy session, only used to generate
+                          a feed that is not cached.
+
+        Returns:
+            dict | None: The "body", "etag" and "last_modified" values of
+                         the feed, or None if no user owns the token.
+        """
+        key = self._key(token)
+        version = None
+        try:
+            pipe = self.r.pipeline()
+            pipe.hgetall(key)
+            pipe.get(version_key(key))
+            cached, version = pipe.execute()
+            if cached:
+                return cached if 'body' in cached else None
+        except redis.RedisError as e:
+            print(e)
+
+        user = await repository_users.get_user_by_calendar_token(token, db)
+        if user is None:
+            try:
+                store_if_current(
+                    self.r, key, version, {'missing': 1}, MISSING_FEED_TTL
+                )
+            except redis.RedisError as e:
+                print(e)
+            return None
+
+        rows = await repository_contacts.get_birthdays(user.id, db)
+        now = datetime.now(timezone.utc)
+        # The ETag only depends on the events, so a regenerated feed with
+        # the same birthdays still matches the copies held by clients. It
+        # is weak, as the bodies differ in their DTSTAMP.
+        digest = hashlib.sha256()
+        for row in rows:
+            digest.update(
+                f"{row.id}\0{row.first_name}\0{row.last_name}\0"
+                f"{row.birthday}\n".encode()
+            )
+        feed = {
+            "body": build_calendar(rows, now),
+            "etag": f'W/"{digest.hexdigest()[:32]}"',
+            "last_modified": formatdate(now.timestamp(), usegmt=True),
+        }
+        try:
+            store_if_current(self.r, key, version, feed, FEED_TTL)
+        except redis.RedisError as e:
+            print(e)
+        return feed
+
+    async def invalidate(self, user: User) -> None:
+        """
+        Drop the cached feed of a user after their contacts changed.
+
+        Args:
+            user (User): The owner of the changed contacts.
+        """
+        await self.invalidate_token(user.calendar_token)
+
+    async def invalidate_token(self, token: str | None) -> None:
+        """
+        Drop the cached feed identified by a token, if any.
+
+        Args:
+            token (str | None): The token of the feed.
+        """
+        if not token:
+            return
+        try:
+            invalidate(self.r, self._key(token), FEED_TTL)
+        except redis.RedisError as e:
+            print(e)
+
+
+calendar_service = BirthdayCalendar()
@@ -0,0 +1,118 @@
+"""
+This module provides the totals reported with paginated contact listings.
+
+The number of contacts of every user is kept in a Redis counter that is
+initialized with an exact COUNT the first time it is needed, and then
+adjusted by contact creations and deletions. Every adjustment also
+changes the version of the counter, so that a COUNT racing with it is
+not stored over the adjusted value. Counters expire after
+COUNT_TTL, so they are periodically reconciled with the database should
+an adjustment ever be missed. Totals of searches cannot be maintained
+that way; they are counted exactly up to SEARCH_COUNT_CAP and reported as
+an estimate beyond it.
+"""
+
+import time
+from functools import cached_property
+
+import redis
+from sqlalchemy.orm import Session
+
+from src.database.cache import get_redis, store_if_current, version_key
+from src.database.models import User
+from src.repository import contacts as repository_contacts
+
+COUNT_TTL = 60 * 60
+SEARCH_COUNT_CAP = 1000
+
+# Sets the version KEYS[2] of a counter to ARGV[2] for ARGV[3] seconds,
+# and adjusts the counter KEYS[1] only while it exists, so that an
+# adjustment racing with an expiry does not recreate the counter from
+# zero. HINCRBY keeps the remaining time to live, and with it the
+# reconciliation schedule.
+INCREMENT_SCRIPT = """
+redis.call('SET', KEYS[2], ARGV[2], 'EX', ARGV[3])
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('HINCRBY', KEYS[1], 'total', ARGV[1])
+end
+return nil
+"""
+
+
+class ContactCounter:
+    @property
+    def r(self) -> redis.Redis:
+        """Redis instance holding the contact counters of all users."""
+        return get_redis(decode_responses=True)
+
+    @cached_property
+    def _increment(self):
+        return self.r.register_script(INCREMENT_SCRIPT)
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"count:contacts:{user_id}"
+
+    async def total(self,
+                    user: User,
+                    search: str | None,
+                    db: Session) -> tuple[int, bool]:
+        """
+        Return the number of contacts of a user matching a search.
+
+        Args:
+            user (User): The user whose contacts are counted.
+            search (str | None): The search query of the listing, if any.
+            db (Session): SQLAlchemy session for counting on a cache miss.
+
+        Returns:
+            tuple[int, bool]: The total, and whether it is exact.
+        """
+        if search:
+            total = await repository_contacts.count_contacts(
+                user, search, db, cap=SEARCH_COUNT_CAP
+            )
+            return min(total, SEARCH_COUNT_CAP), total <= SEARCH_COUNT_CAP
+
+        key = self._key(user.id)
+        version = None
+        try:
+            pipe = self.r.pipeline()
+            pipe.hget(key, "total")
+            pipe.get(version_key(key))
+            cached, version = pipe.execute()
+            if cached is not None:
+                return max(int(cached), 0), True
+        except redis.RedisError as e:
+            print(e)
+        total = await repository_contacts.count_contacts(user, None, db)
+        try:
+            store_if_current(
+                self.r, key, version, {"total": total}, COUNT_TTL
+            )
+        except redis.RedisError as e:
+            print(e)
+        return total, True
+
+    async def adjust(self, user_id: int, delta: int) -> None:
+        """
+        Adjust the contact counter of a user after contacts were created
+        or deleted.
+
+        Args:
+            user_id (int): The owner of the contacts.
+            delta (int): The change in the number of contacts.
+        """
+        key = self._key(user_id)
+        try:
+            # From the clock, so that an expired version is not set again.
+            self._increment(
+                keys=[key, version_key(key)],
+                args=[delta, time.time_ns(), COUNT_TTL],
+                client=self.r
+            )
+        except redis.RedisError as e:
+            print(e)
+
+
+counter_service = ContactCounter()
@@ -0,0 +1,141 @@
+"""
+This module detects near-duplicate contacts within a user's address book.
+
+Comparing every pair of contacts is quadratic, so contacts are first grouped
+into blocks that share a cheap blocking key: the normalized email address,
+the trailing digits of the phone number or a phonetic code of the name.
+Only contacts that fall into the same block are compared, and matching pairs
+are merged into clusters with a union-find structure.
+"""
+
+from collections import defaultdict
+from difflib import SequenceMatcher
+from typing import Iterable, List
+
+from src.services.normalize import (
+    normalize_email,
+    normalize_phone,
+    normalize_text,
+    phonetic_key,
+)
+
+# Blocks larger than this are too generic (e.g. a placeholder phone number
+# or a very common name) to be discriminative and are skipped.
+MAX_BLOCK_SIZE = 500
+MIN_PHONE_LENGTH = 7
+PHONE_SUFFIX_LENGTH = 9
+NAME_SIMILARITY = 0.85
+
+
+def _name_pairs(members: list):
+    """
+    Yield the pairs of a name block that need to be compared.
+
+    Contacts with different known birthdays cannot be the same person,
+    so the block is split by birthday and only contacts sharing one,
+    or lacking one, are paired.
+    """
+    by_birthday = defaultdict(list)
+    for member in members:
+        by_birthday[member[2]].append(member)
+    unknown = by_birthday.pop(None, [])
+    for i, a in enumerate(unknown):
+        for b in unknown[i + 1:]:
+            yield a, b
+    for group in by_birthday.values():
+        for i, a in enumerate(group):
+            for b in group[i + 1:]:
+                yield a, b
+            for b in unknown:
+                yield a, b
+
+
+def find_duplicates(rows: Iterable) -> List[dict]:
+    """
+    Group contacts into clusters of likely duplicates.
+
+    Args:
+        rows (Iterable): Rows exposing the id, first_name, last_name, email,
+                         phone_number and birthday of each contact.
+
+    Returns:
+        List[dict]: One entry per cluster with the sorted "ids" of its
+                    contacts and the "reasons" they were matched on,
+                    largest clusters first.
+    """
+    # Email and phone blocks only remember the first contact of each key,
+    # and collect the others, so unique keys cost a single dict insertion.
+    first_seen = {'email': {}, 'phone': {}}
+    collisions = defaultdict(list)
+    name_blocks = defaultdict(list)
+    for row in rows:
+        keys = []
+        email = normalize_email(row.email)
+        if email:
+            keys.append(('email', email))
+        digits = normalize_phone(row.phone_number) or ''
+        if len(digits) >= MIN_PHONE_LENGTH:
+            keys.append(('phone', digits[-PHONE_SUFFIX_LENGTH:]))
+        for kind, key in keys:
+            first = first_seen[kind].setdefault(key, row.id)
+            if first != row.id:
+                collisions[kind, key].append(row.id)
+        name_key = phonetic_key(row.last_name) + phonetic_key(row.first_name)
+        if name_key:
+            name_blocks[name_key].append(
+                (row.id, f"{row.first_name} {row.last_name}", row.birthday)
+            )
+
+    parent = {}
+    reasons = defaultdict(set)
+
+    def find(contact_id):
+        root = contact_id
+        while parent.get(root, root) != root:
+            root = parent[root]
+        # Path compression keeps subsequent lookups nearly constant.
+        while contact_id != root:
+            parent[contact_id], contact_id = root, parent[contact_id]
+        return root
+
+    def union(a, b, reason):
+        root_a, root_b = find(a), find(b)
+        if root_a != root_b:
+            parent[root_b] = root_a
+            reasons[root_a] |= reasons.pop(root_b, set())
+        reasons[root_a].add(reason)
+
+    for (kind, key), others in collisions.items():
+        if len(others) < MAX_BLOCK_SIZE:
+            # Every member of an email or phone block matches the first one.
+            first = first_seen[kind][key]
+            for other in others:
+                union(first, other, kind)
+
+    for members in name_blocks.values():
+        if len(members) < 2 or len(members) > MAX_BLOCK_SIZE:
+            continue
+        names = {}
+        for a, b in _name_pairs(members):
+            if find(a[0]) == find(b[0]):
+                continue
+            for member in (a, b):
+                if member[0] not in names:
+                    names[member[0]] = normalize_text(member[1])
+            ratio = SequenceMatcher(None, names[a[0]], names[b[0]]).ratio()
+            if ratio >= NAME_SIMILARITY:
+                union(a[0], b[0], 'name')
+
+    clusters = defaultdict(list)
+    for contact_id in parent:
+        clusters[find(contact_id)].append(contact_id)
+    for root in reasons:
+        if root not in parent:
+            clusters[root].append(root)
+
+    result = [
+        {"ids": sorted(ids), "reasons": sorted(reasons[root])}
+        for root, ids in clusters.items() if len(ids) > 1
+    ]
+    result.sort(key=lambda cluster: (-len(cluster["ids"]), cluster["ids"]))
+    return result
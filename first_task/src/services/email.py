@@ -4,34 +4,45 @@ FastAPI-Mail, which provides support for sending emails asynchronously.
 
 It configures the email settings and defines a function to send verification
 emails to users during the registration process.
+
+FastAPI-Mail pulls in a large dependency tree, so it is imported and
+configured when the first email is sent rather than at application startup.
 """
 
+from functools import lru_cache
 from pathlib import Path
 
 from fastapi import HTTPException
-
-from fastapi_mail import FastMail, MessageSchema, ConnectionConfig, MessageType
-from fastapi_mail.errors import ConnectionErrors
 from pydantic import EmailStr
 
 from src.services.auth import auth_service
 from src.conf.config import settings
 
-# Configuration for FastAPI-Mail,
-# using settings from the application configuration.
-conf = ConnectionConfig(
-    MAIL_USERNAME=settings.mail_username,
-    MAIL_PASSWORD=settings.mail_password,
-    MAIL_FROM=settings.mail_from,
-    MAIL_PORT=settings.mail_port,
-    MAIL_SERVER=settings.mail_server,
-    MAIL_FROM_NAME="Rest API Application",
-    MAIL_STARTTLS=False,
-    MAIL_SSL_TLS=True,
-    USE_CREDENTIALS=True,
-    VALIDATE_CERTS=True,
-    TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
-)
+
+@lru_cache
+def get_mail():
+    """
+    Build the FastAPI-Mail client from the application configuration.
+
+    Returns:
+        FastMail: The client, created once and reused for every email.
+    """
+    from fastapi_mail import ConnectionConfig, FastMail
+
+    conf = ConnectionConfig(
+        MAIL_USERNAME=settings.mail_username,
+        MAIL_PASSWORD=settings.mail_password,
+        MAIL_FROM=settings.mail_from,
+        MAIL_PORT=settings.mail_port,
+        MAIL_SERVER=settings.mail_server,
+        MAIL_FROM_NAME="Rest API Application",
+        MAIL_STARTTLS=False,
+        MAIL_SSL_TLS=True,
+        USE_CREDENTIALS=True,
+        VALIDATE_CERTS=True,
+        TEMPLATE_FOLDER=Path(__file__).parent / 'templates',
+    )
+    return FastMail(conf)
 
 
 async def send_email(email: EmailStr, username: str, host: str):
@@ -49,6 +60,9 @@ async def send_email(email: EmailStr, username: str, host: str):
         HTTPException: An error occurs if the email could not be sent due to
                        server or configuration issues.
     """
+    from fastapi_mail import MessageSchema, MessageType
+    from fastapi_mail.errors import ConnectionErrors
+
     try:
         # Generate a verification token for the email
         token_verification = auth_service.create_email_token({"sub": email})
@@ -65,8 +79,9 @@ async def send_email(email: EmailStr, username: str, host: str):
         )
 
         # Send the email using the configured FastMail instance
-        fm = FastMail(conf)
-        await fm.send_message(message, template_name="email_template.html")
+        await get_mail().send_message(
+            message, template_name="email_template.html"
+        )
     except ConnectionErrors as err:
         print(f"Failed to send email: {err}")
         raise HTTPException(status_code=500, detail="Email could not be sent.")
@@ -92,6 +107,9 @@ async def send_reset_email(email: EmailStr, username: str, host: str):
         HTTPException: An error occurs if the email could not be sent due to
                        server or configuration issues.
     """
+    from fastapi_mail import MessageSchema, MessageType
+    from fastapi_mail.errors import ConnectionErrors
+
     try:
         token_verification = auth_service.create_email_token({'sub': email})
         message = MessageSchema(
@@ -104,9 +122,9 @@ async def send_reset_email(email: EmailStr, username: str, host: str):
             },
             subtype=MessageType.html
         )
-        fm = FastMail(conf)
-        await fm.send_message(message,
-                              template_name="reset_password_email.html")
+        await get_mail().send_message(
+            message, template_name="reset_password_email.html"
+        )
     except ConnectionErrors as err:
         print(f"Failed to send email: {err}")
         raise HTTPException(status_code=500, detail="Email could not be sent.")
@@ -0,0 +1,104 @@
+"""
+This module provides helpers that reduce contact fields to canonical forms,
+so that formatting variants of the same name, email or phone number can be
+compared, indexed and grouped together.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+
+# ASCII digits only, as in the phone_digits backfill of PostgreSQL.
+NON_DIGITS = re.compile(r'[^0-9]')
+NON_LETTERS = re.compile(r'[^a-z]')
+REPEATED_CODES = re.compile(r'(\d)(?=\1)')
+# Domains ignoring the dots of the local part, all serving Gmail mailboxes.
+GMAIL_DOMAINS = {'gmail.com', 'googlemail.com'}
+# Soundex digit of each letter; vowels, 'y', 'h' and 'w' are coded as 0.
+SOUNDEX_TABLE = str.maketrans(
+    'abcdefghijklmnopqrstuvwxyz', '01230120022455012623010202'
+)
+
+
+def normalize_text(text: str | None) -> str:
+    """
+    Normalize a piece of text for matching.
+
+    The text is lowercased, stripped of accents and its whitespace
+    is collapsed, so that "  Zoë " and "zoe" produce the same value.
+
+    Args:
+        text (str | None): The text to normalize.
+
+    Returns:
+        str: The normalized text, or an empty string for empty input.
+    """
+    if not text:
+        return ''
+    if text.isascii():
+        return ' '.join(text.lower().split())
+    decomposed = unicodedata.normalize('NFKD', text)
+    stripped = ''.join(c for c in decomposed if not unicodedata.combining(c))
+    return ' '.join(stripped.lower().split())
+
+
+def normalize_phone(phone_number: str | None) -> str | None:
+    """
+    Reduce a phone number to its digits.
+
+    "+1 (555) 123" and "1555123" are both normalized to "1555123".
+
+    Args:
+        phone_number (str | None): The phone number as entered by the user.
+
+    Returns:
+        str | None: The digits of the number, or None if it has none.
+    """
+    if not phone_number:
+        return None
+    return NON_DIGITS.sub('', phone_number) or None
+
+
+def normalize_email(email: str | None) -> str:
+    """
+    Normalize an email address for duplicate detection.
+
+    The address is lowercased and sub-address tags ("+news") are removed
+    from the local part. Dots are removed too for Gmail, which ignores
+    them, and googlemail.com addresses become gmail.com ones.
+
+    Args:
+        email (str | None): The email address to normalize.
+
+    Returns:
+        str: The normalized address, or an empty string for empty input.
+    """
+    local, _, domain = normalize_text(email).partition('@')
+    local = local.split('+', 1)[0]
+    if domain in GMAIL_DOMAINS:
+        local, domain = local.replace('.', ''), 'gmail.com'
+    return f"{local}@{domain}" if domain else local
+
+
+@lru_cache(maxsize=65536)
+def phonetic_key(name: str | None) -> str:
+    """
+    Compute the American Soundex code of a name.
+
+    Names that sound alike, such as "Robert" and "Rupert", share a code.
+
+    Args:
+        name (str | None): The name to encode.
+
+    Returns:
+        str: A four character code, or an empty string if the name
+             contains no letters.
+    """
+    letters = NON_LETTERS.sub('', normalize_text(name))
+    if not letters:
+        return ''
+    # 'h' and 'w' do not separate letters with the same code, so they are
+    # dropped before adjacent identical codes are collapsed.
+    head, tail = letters[0], letters[1:].replace('h', '').replace('w', '')
+    codes = REPEATED_CODES.sub('', (head + tail).translate(SOUNDEX_TABLE))
+    return (head.upper() + codes[1:].replace('0', '') + '000')[:4]
@@ -0,0 +1,174 @@
+"""
+This module stores refresh-token sessions in Redis.
+
+Every login starts a token family: a session bound to one device whose
+current refresh token is identified by a random token ID ("jti"). Each
+refresh rotates the family to a new token ID in a single atomic script.
+Presenting a token ID that has already been rotated away means the token
+was stolen or replayed, so the whole family is revoked. Families expire
+automatically when they have not been refreshed within their lifetime.
+"""
+
+import time
+import uuid
+from functools import cached_property
+from typing import List
+
+import redis
+
+from src.database.cache import get_redis
+
+SESSION_TTL = 7 * 24 * 60 * 60
+
+# Returns 1 when the token was rotated, 0 when the family does not exist
+# (expired or revoked) or belongs to another user, and -1 when a rotated
+# token was reused, in which case the family is revoked. The set of the
+# families of the user (KEYS[2]) is refreshed with the family, so that it
+# lives as long as its most recently used session.
+ROTATE_SCRIPT = """
+local current, email = unpack(redis.call('HMGET', KEYS[1], 'jti', 'email'))
+if not current or email ~= ARGV[5] then
+    return 0
+end
+if current ~= ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return -1
+end
+redis.call('HSET', KEYS[1], 'jti', ARGV[2], 'last_used', ARGV[4])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+return 1
+"""
+
+
+class RefreshTokenStore:
+    @property
+    def r(self) -> redis.Redis:
+        """Redis instance holding the refresh-token families of all users."""
+        return get_redis(decode_responses=True)
+
+    @cached_property
+    def _rotate(self):
+        return self.r.register_script(ROTATE_SCRIPT)
+
+    @staticmethod
+    def _family_key(family_id: str) -> str:
+        return f"refresh:family:{family_id}"
+
+    @staticmethod
+    def _user_key(email: str) -> str:
+        return f"refresh:user:{email}"
+
+    async def start(self, email: str, device: str) -> tuple[str, str]:
+        """
+        Start a new session for a user on a device.
+
+        Args:
+            email (str): The email of the user logging in.
+            device (str): A label of the device, e.g. its user agent.
+
+        Returns:
+            tuple[str, str]: The family ID and the token ID to embed
+                             in the refresh token.
+        """
+        family_id, token_id = uuid.uuid4().hex, uuid.uuid4().hex
+        now = int(time.time())
+        pipe = self.r.pipeline()
+        pipe.hset(self._family_key(family_id), mapping={
+            "email": email,
+            "jti": token_id,
+            "device": device,
+            "created_at": now,
+            "last_used": now,
+        })
+        pipe.expire(self._family_key(family_id), SESSION_TTL)
+        pipe.sadd(self._user_key(email), family_id)
+        pipe.expire(self._user_key(email), SESSION_TTL)
+        pipe.execute()
+        return family_id, token_id
+
+    async def rotate(
+        self, email: str, family_id: str, token_id: str
+    ) -> str | None:
+        """
+        Rotate a session to a new refresh token in one round-trip.
+
+        Args:
+            email (str): The email of the user owning the session.
+            family_id (str): The family ID carried by the refresh token.
+            token_id (str): The token ID carried by the refresh token.
+
+        Returns:
+            str | None: The new token ID, or None if the session has
+                        expired, was revoked or the token was reused,
+                        in which case the session is revoked.
+        """
+        new_token_id = uuid.uuid4().hex
+        result = self._rotate(
+            keys=[self._family_key(family_id), self._user_key(email)],
+            args=[token_id, new_token_id, SESSION_TTL, int(time.time()),
+                  email],
+            client=self.r
+        )
+        return new_token_id if result == 1 else None
+
+    async def list_sessions(self, email: str) -> List[dict]:
+        """
+        List the active sessions of a user.
+
+        Args:
+            email (str): The email of the user.
+
+        Returns:
+            List[dict]: The sessions, most recently used first.
+        """
+        family_ids = list(self.r.smembers(self._user_key(email)))
+        pipe = self.r.pipeline()
+        for family_id in family_ids:
+            pipe.hgetall(self._family_key(family_id))
+        sessions, expired = [], []
+        for family_id, data in zip(family_ids, pipe.execute()):
+            if data:
+                sessions.append({
+                    "id": family_id,
+                    "device": data["device"],
+                    "created_at": int(data["created_at"]),
+                    "last_used": int(data["last_used"]),
+                })
+            else:
+                expired.append(family_id)
+        if expired:
+            self.r.srem(self._user_key(email), *expired)
+        sessions.sort(key=lambda session: session["last_used"], reverse=True)
+        return sessions
+
+    async def revoke(self, email: str, family_id: str) -> bool:
+        """
+        Revoke one session of a user.
+
+        Args:
+            email (str): The email of the user owning the session.
+            family_id (str): The ID of the session to revoke.
+
+        Returns:
+            bool: True if the session existed and was revoked.
+        """
+        if not self.r.srem(self._user_key(email), family_id):
+            return False
+        return bool(self.r.delete(self._family_key(family_id)))
+
+    async def revoke_all(self, email: str) -> None:
+        """
+        Revoke every session of a user, e.g. after a password reset.
+
+        Args:
+            email (str): The email of the user.
+        """
+        family_ids = self.r.smembers(self._user_key(email))
+        self.r.delete(
+            self._user_key(email),
+            *(self._family_key(family_id) for family_id in family_ids)
+        )
+
+
+session_store = RefreshTokenStore()
@@ -0,0 +1,83 @@
+"""
+This module caches the contact statistics of every user in Redis.
+
+Statistics are computed by the database in one grouped query and stored
+in a per-user hash, keyed by the date they were computed for, since the
+counts of recently added contacts move with the date. Every contact write
+drops the hash of its owner, so the next request recomputes them.
+Statistics computed while a write is committed are not stored, as they
+may predate it.
+"""
+
+import json
+
+import redis
+from sqlalchemy.orm import Session
+
+from src.database.cache import (
+    get_redis, invalidate, store_if_current, version_key
+)
+from src.database.models import User
+from src.repository import contacts as repository_contacts
+
+STATS_TTL = 24 * 60 * 60
+
+
+class ContactStatsCache:
+    @property
+    def r(self) -> redis.Redis:
+        """Redis instance holding the cached statistics of all users."""
+        return get_redis(decode_responses=True)
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"stats:{user_id}"
+
+    async def get(self, user: User, today, db: Session) -> dict:
+        """
+        Return the contact statistics of a user, computing them if needed.
+
+        Args:
+            user (User): The user whose statistics are returned.
+            today (date): The current date.
+            db (Session): SQLAlchemy session, only used on a cache miss.
+
+        Returns:
+            dict: The statistics, see `repository.contacts.get_contact_stats`.
+        """
+        key, field = self._key(user.id), today.isoformat()
+        version = None
+        try:
+            pipe = self.r.pipeline()
+            pipe.hget(key, field)
+            pipe.get(version_key(key))
+            cached, version = pipe.execute()
+            if cached:
+                return json.loads(cached)
+        except redis.RedisError as e:
+            print(e)
+
+        stats = await repository_contacts.get_contact_stats(user, today, db)
+        try:
+            # Statistics computed for earlier dates are replaced.
+            store_if_current(
+                self.r, key, version, {field: json.dumps(stats)}, STATS_TTL
+            )
+        except redis.RedisError as e:
+            print(e)
+        return stats
+
+    async def invalidate(self, user_id: int) -> None:
+        """
+        Drop the cached statistics of a user after their contacts changed.
+
+        Args:
+            user_id (int): The owner of the changed contacts.
+        """
+        try:
+            invalidate(self.r, self._key(user_id), STATS_TTL)
+        except redis.RedisError as e:
+            print(e)
+
+
+stats_service = ContactStatsCache()
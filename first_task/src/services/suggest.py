@@ -0,0 +1,210 @@
+"""
+This module maintains a per-user typeahead index of contacts in Redis so
+that contact pickers can be served without querying the database.
+
+Every user owns a single sorted set whose members all share the same score
+and are therefore ordered lexicographically. Each member is a normalized
+search term (first name, last name, full name or email), the contact ID and
+the data needed to render a suggestion, separated by NUL characters. A
+prefix lookup is then answered with a single ZRANGEBYLEX call. A companion
+hash keeps the indexed data of every contact so that its old members can be
+removed when the contact changes.
+"""
+
+import json
+from typing import List
+
+import redis
+from sqlalchemy.orm import Session
+
+from src.database.cache import get_redis
+from src.database.models import Contact, User
+from src.services.normalize import normalize_text
+
+SEPARATOR = '\x00'
+MAX_TERM_LENGTH = 50
+REBUILD_BATCH_SIZE = 1000
+
+
+class ContactSuggestions:
+    @property
+    def r(self) -> redis.Redis:
+        """Redis instance holding the typeahead indexes of all users."""
+        return get_redis(decode_responses=True)
+
+    @staticmethod
+    def _keys(user_id: int) -> tuple[str, str, str]:
+        """Return the terms, data and ready-marker keys of a user."""
+        return (
+            f"suggest:{user_id}:terms",
+            f"suggest:{user_id}:data",
+            f"suggest:{user_id}:ready",
+        )
+
+    @staticmethod
+    def _payload(contact) -> str:
+        """Serialize the contact fields returned with a suggestion."""
+        return json.dumps({
+            "id": contact.id,
+            "first_name": contact.first_name,
+            "last_name": contact.last_name,
+            "email": contact.email,
+        })
+
+    @staticmethod
+    def _members(payload: str) -> set[str]:
+        """Build the sorted set members that index a serialized contact."""
+        data = json.loads(payload)
+        first_name = normalize_text(data["first_name"])
+        last_name = normalize_text(data["last_name"])
+        terms = {
+            first_name,
+            last_name,
+            f"{first_name} {last_name}".strip(),
+            normalize_text(data["email"]),
+        }
+        return {
+            SEPARATOR.join((term[:MAX_TERM_LENGTH], str(data["id"]), payload))
+            for term in terms if term
+        }
+
+    async def rebuild(self, user: User, db: Session) -> None:
+        """
+        Rebuild the typeahead index of a user from the database.
+
+        Contacts are streamed in batches and written to Redis through
+        a pipeline, so the rebuild cost is one query and a handful
+        of round-trips regardless of the address book size.
+
+        Args:
+            user (User): The user whose index is rebuilt.
+            db (Session): SQLAlchemy session for database access.
+        """
+        terms_key, data_key, ready_key = self._keys(user.id)
+        rows = (
+            db.query(
+                Contact.id,
+                Contact.first_name,
+                Contact.last_name,
+                Contact.email
+            )
+            .filter(Contact.user_id == user.id)
+            .yield_per(REBUILD_BATCH_SIZE)
+        )
+        pipe = self.r.pipeline(transaction=False)
+        pipe.delete(terms_key, data_key, ready_key)
+        for number, row in enumerate(rows, start=1):
+            payload = self._payload(row)
+            pipe.hset(data_key, row.id, payload)
+            pipe.zadd(terms_key, dict.fromkeys(self._members(payload), 0))
+            if number % REBUILD_BATCH_SIZE == 0:
+                pipe.execute()
+        pipe.set(ready_key, 1)
+        pipe.execute()
+
+    async def suggest(self,
+                      user: User,
+                      prefix: str,
+                      limit: int,
+                      db: Session) -> List[dict]:
+        """
+        Return contacts of a user whose name or email starts with a prefix.
+
+        The index is rebuilt from the database the first time it is
+        queried; afterwards suggestions are served by Redis alone.
+
+        Args:
+            user (User): The user whose contacts are suggested.
+            prefix (str): The text typed so far.
+            limit (int): Maximum number of suggestions to return.
+            db (Session): SQLAlchemy session, only used to build
+                          a missing index.
+
+        Returns:
+            List[dict]: Matching contacts ordered by the matched term.
+        """
+        terms_key, _, ready_key = self._keys(user.id)
+        term = normalize_text(prefix)[:MAX_TERM_LENGTH]
+        if not term:
+            return []
+        low = "[" + term
+        high = b"[" + term.encode() + b"\xff"
+        # A contact can match on several terms, so fetch a few extra members.
+        pipe = self.r.pipeline(transaction=False)
+        pipe.exists(ready_key)
+        pipe.zrangebylex(terms_key, low, high, start=0, num=limit * 4)
+        ready, members = pipe.execute()
+        if not ready:
+            await self.rebuild(user, db)
+            members = self.r.zrangebylex(
+                terms_key, low, high, start=0, num=limit * 4
+            )
+
+        suggestions = {}
+        for member in members:
+            _, contact_id, payload = member.split(SEPARATOR, 2)
+            if contact_id not in suggestions:
+                suggestions[contact_id] = json.loads(payload)
+                if len(suggestions) == limit:
+                    break
+        return list(suggestions.values())
+
+    async def index_contact(self, contact: Contact) -> None:
+        """
+        Add a created or updated contact to its owner's index.
+
+        Members derived from the previously indexed version of the contact
+        are removed. Nothing is written while the index of the user has not
+        been built yet, as the first lookup will build it from scratch.
+
+        Args:
+            contact (Contact): The contact to index.
+        """
+        terms_key, data_key, ready_key = self._keys(contact.user_id)
+        try:
+            if not self.r.exists(ready_key):
+                return
+            previous = self.r.hget(data_key, contact.id)
+            payload = self._payload(contact)
+            pipe = self.r.pipeline()
+            if previous:
+                pipe.zrem(terms_key, *self._members(previous))
+            pipe.zadd(terms_key, dict.fromkeys(self._members(payload), 0))
+            pipe.hset(data_key, contact.id, payload)
+            pipe.execute()
+        except redis.RedisError as e:
+            print(e)
+
+    async def remove_contact(self, contact: Contact) -> None:
+        """
+        Remove a deleted contact from its owner's index.
+
+        Args:
+            contact (Contact): The contact to remove.
+        """
+        await self.remove_contacts(contact.user_id, [contact.id])
+
+    async def remove_contacts(self,
+                              user_id: int,
+                              contact_ids: List[int]) -> None:
+        """
+        Remove several deleted contacts of a user from the index.
+
+        Args:
+            user_id (int): The owner of the contacts.
+            contact_ids (List[int]): The identifiers of the contacts.
+        """
+        terms_key, data_key, _ = self._keys(user_id)
+        try:
+            previous = [p for p in self.r.hmget(data_key, contact_ids) if p]
+            if previous:
+                pipe = self.r.pipeline()
+                for payload in previous:
+                    pipe.zrem(terms_key, *self._members(payload))
+                pipe.hdel(data_key, *contact_ids)
+                pipe.execute()
+        except redis.RedisError as e:
+            print(e)
+
+
+suggest_service = ContactSuggestions()
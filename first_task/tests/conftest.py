@@ -0,0 +1,49 @@
+"""
+Settings for the tests, which need neither PostgreSQL nor Redis: the
+services under test are given an in-memory Redis, and the repository an
+in-memory SQLite database.
+"""
+
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+for name, value in {
+    "POSTGRES_DB": "contacts",
+    "POSTGRES_USER": "postgres",
+    "POSTGRES_PASSWORD": "postgres",
+    "SQLALCHEMY_DATABASE_URL": "sqlite://",
+    "SECRET_KEY": "secret",
+    "ALGORITHM": "HS256",
+    "MAIL_USERNAME": "contacts@example.com",
+    "MAIL_PASSWORD": "password",
+    "MAIL_FROM": "contacts@example.com",
+    "MAIL_PORT": "465",
+    "MAIL_SERVER": "smtp.example.com",
+}.items():
+    os.environ.setdefault(name, value)
+
+# Imported once the settings are in the environment.
+from src.database.models import Base, User  # noqa: E402
+
+
+@pytest.fixture
+def db():
+    """A session of an empty in-memory SQLite database."""
+    engine = create_engine("sqlite://", poolclass=StaticPool)
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine)()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+@pytest.fixture
+def user(db):
+    user = User(username="user1", email="user@example.com", password="x")
+    db.add(user)
+    db.commit()
+    return user
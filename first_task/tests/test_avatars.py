@@ -0,0 +1,74 @@
+import asyncio
+import io
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import Mock
+
+from fastapi import BackgroundTasks, UploadFile
+from PIL import Image
+
+from src.routes import users as routes_users
+from src.schemas import AvatarUploadResponse
+from src.services import avatars
+from src.services.avatars import AvatarService, LocalStorage
+
+
+class FailingStorage(LocalStorage):
+    def save(self, key: str, data: bytes) -> str:
+        raise OSError("storage unavailable")
+
+
+def spooled_image():
+    image = io.BytesIO()
+    Image.new("RGB", (400, 300), "white").save(image, format="PNG")
+    image.seek(0)
+    return image
+
+
+def finalize(monkeypatch, storage):
+    updates = []
+
+    async def update_avatar(email, url, db):
+        updates.append((email, url))
+
+    monkeypatch.setattr(avatars.repository_users, "update_avatar",
+                        update_avatar)
+    monkeypatch.setattr(avatars, "SessionLocal", Mock)
+    monkeypatch.setattr(avatars.auth_service, "clear_cached_user",
+                        lambda email: None)
+    service = AvatarService()
+    service.storage = storage
+    asyncio.run(service.finalize(spooled_image(), "1", "user@example.com"))
+    return updates
+
+
+def test_stored_avatar_is_recorded(monkeypatch, tmp_path):
+    updates = finalize(monkeypatch, LocalStorage(tmp_path, "/media"))
+    assert (tmp_path / "1.png").exists()
+    [(email, url)] = updates
+    assert email == "user@example.com" and url.startswith("/media/1.png?v=")
+
+
+def test_failed_upload_keeps_the_previous_avatar(monkeypatch, tmp_path):
+    assert finalize(monkeypatch, FailingStorage(tmp_path, "/media")) == []
+
+
+def test_upload_is_answered_with_a_pending_url(monkeypatch, tmp_path):
+    monkeypatch.setattr(avatars.avatar_service, "storage",
+                        LocalStorage(tmp_path, "/media"))
+    user = SimpleNamespace(
+        id=1, username="user1", email="user@example.com",
+        created_at=datetime(2026, 1, 1), updated_at=datetime(2026, 1, 1),
+        avatar="/media/previous.png"
+    )
+    tasks = BackgroundTasks()
+    result = asyncio.run(routes_users.update_avatar_user(
+        tasks, UploadFile(spooled_image()), current_user=user
+    ))
+    response = AvatarUploadResponse.model_validate(result,
+                                                   from_attributes=True)
+    assert response.status == "pending"
+    assert response.pending_avatar == "/media/1.png"
+    assert response.user.avatar == "/media/previous.png"
+    assert len(tasks.tasks) == 1
+    assert not (tmp_path / "1.png").exists()
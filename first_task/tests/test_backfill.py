@@ -0,0 +1,48 @@
+from sqlalchemy import create_engine, text
+
+from src.database.backfill import BACKFILLS, forget_backfill, run_backfill
+from src.services.normalize import normalize_phone
+
+PHONES = ["+1 (555) 123-45", "555/123 ext. 7", "n/a", None]
+
+
+def create_contacts():
+    engine = create_engine("sqlite://")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE contacts (id INTEGER PRIMARY KEY, "
+            "phone_number VARCHAR(50), phone_digits VARCHAR(15))"
+        ))
+        for phone_number in PHONES:
+            connection.execute(
+                text("INSERT INTO contacts (phone_number) VALUES (:phone)"),
+                {"phone": phone_number}
+            )
+    return engine
+
+
+def phone_digits(engine):
+    with engine.connect() as connection:
+        return list(connection.execute(
+            text("SELECT phone_digits FROM contacts ORDER BY id")
+        ).scalars())
+
+
+def test_sqlite_backfill_matches_normalize_phone():
+    engine = create_contacts()
+    backfill = BACKFILLS["contacts_phone_digits"]
+    run_backfill(engine, backfill, batch_size=2, report=lambda message: None)
+    assert phone_digits(engine) == [normalize_phone(p) for p in PHONES]
+
+
+def test_forgotten_backfill_runs_again():
+    engine = create_contacts()
+    backfill = BACKFILLS["contacts_phone_digits"]
+    run_backfill(engine, backfill, report=lambda message: None)
+    with engine.begin() as connection:
+        connection.execute(text("UPDATE contacts SET phone_digits = NULL"))
+    assert run_backfill(engine, backfill, report=lambda message: None) == 0
+
+    forget_backfill(engine, backfill)
+    assert run_backfill(engine, backfill, report=lambda message: None) == 3
+    assert phone_digits(engine) == [normalize_phone(p) for p in PHONES]
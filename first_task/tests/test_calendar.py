@@ -0,0 +1,76 @@
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from src.routes import calendar as routes_calendar
+from src.services import calendar
+from src.services.calendar import BirthdayCalendar
+
+TOKEN = "token"
+USER = SimpleNamespace(id=1, calendar_token=TOKEN)
+
+
+@pytest.fixture
+def r(monkeypatch):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(calendar, "get_redis", lambda **kwargs: r)
+    return r
+
+
+def contacts(monkeypatch, *names, during=None):
+    rows = [
+        SimpleNamespace(id=number, first_name=name, last_name="",
+                        birthday=date(1990, 5, number))
+        for number, name in enumerate(names, 1)
+    ]
+
+    async def get_user_by_calendar_token(token, db):
+        return USER if token == TOKEN else None
+
+    async def get_birthdays(user_id, db):
+        if during is not None:
+            await during()
+        return rows
+
+    monkeypatch.setattr(calendar.repository_users,
+                        "get_user_by_calendar_token",
+                        get_user_by_calendar_token)
+    monkeypatch.setattr(calendar.repository_contacts, "get_birthdays",
+                        get_birthdays)
+
+
+def test_feeds_are_cached_until_invalidated(r, monkeypatch):
+    feeds = BirthdayCalendar()
+    contacts(monkeypatch, "Ada")
+    assert "Ada" in asyncio.run(feeds.get_feed(TOKEN, None))["body"]
+    contacts(monkeypatch, "Grace")
+    assert "Ada" in asyncio.run(feeds.get_feed(TOKEN, None))["body"]
+    asyncio.run(feeds.invalidate(USER))
+    assert "Grace" in asyncio.run(feeds.get_feed(TOKEN, None))["body"]
+    assert asyncio.run(feeds.get_feed("unknown", None)) is None
+
+
+def test_feeds_generated_during_an_invalidation_are_not_stored(
+    r, monkeypatch
+):
+    feeds = BirthdayCalendar()
+    contacts(monkeypatch, "Ada", during=lambda: feeds.invalidate(USER))
+    assert "Ada" in asyncio.run(feeds.get_feed(TOKEN, None))["body"]
+    assert not r.exists("calendar:token")
+    contacts(monkeypatch, "Grace")
+    assert "Grace" in asyncio.run(feeds.get_feed(TOKEN, None))["body"]
+
+
+def test_regenerated_feeds_keep_a_weak_etag(r, monkeypatch):
+    feeds = BirthdayCalendar()
+    contacts(monkeypatch, "Ann")
+    first = asyncio.run(feeds.get_feed(TOKEN, None))
+    asyncio.run(feeds.invalidate(USER))
+    second = asyncio.run(feeds.get_feed(TOKEN, None))
+    assert first["etag"].startswith('W/"')
+    assert second["etag"] == first["etag"]
+    request = SimpleNamespace(headers={"if-none-match": first["etag"]})
+    assert routes_calendar._not_modified(request, second)
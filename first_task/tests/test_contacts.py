@@ -0,0 +1,65 @@
+import asyncio
+
+import pytest
+
+from src.database.models import Contact, User
+from src.routes import contacts as routes_contacts
+from src.schemas import ContactLookup
+
+
+@pytest.fixture
+def stranger(db):
+    """A user other than the current one."""
+    stranger = User(email="stranger@example.com", password="x")
+    db.add(stranger)
+    db.commit()
+    return stranger
+
+
+def add_contact(db, user, phone_number, email):
+    contact = Contact(first_name="Ann", last_name="Lee", email=email,
+                      phone_number=phone_number, user_id=user.id)
+    db.add(contact)
+    db.commit()
+    return contact
+
+
+def test_phone_digits_follow_the_phone_number(db, user):
+    contact = add_contact(db, user, "+1 (555) 123-45", "ann@example.com")
+    assert contact.phone_digits == "155512345"
+    contact.phone_number = "555/67"
+    db.commit()
+    assert db.get(Contact, contact.id).phone_digits == "55567"
+    contact.phone_number = None
+    assert contact.phone_digits is None
+
+
+def test_lookup_by_phone_ignores_the_formatting(db, user, stranger):
+    ann = add_contact(db, user, "+1 (555) 123-45", "ann@example.com")
+    add_contact(db, user, "555 12345", "other@example.com")
+    add_contact(db, stranger, "15551234-5", "theirs@example.com")
+
+    def by_phone(phone_number):
+        contacts = asyncio.run(routes_contacts.read_contacts_by_phone(
+            phone_number, current_user=user, db=db
+        ))
+        return [contact.id for contact in contacts]
+
+    assert by_phone("1-555-123-45") == [ann.id]
+    assert by_phone("15551234") == []
+    assert by_phone("n/a") == []
+
+
+def test_lookup_keeps_the_requested_order_and_lists_missing_ids(
+    db, user, stranger
+):
+    ann = add_contact(db, user, None, "ann@example.com")
+    bob = add_contact(db, user, None, "bob@example.com")
+    theirs = add_contact(db, stranger, None, "theirs@example.com")
+
+    result = asyncio.run(routes_contacts.lookup_contacts(
+        ContactLookup(ids=[bob.id, 999, ann.id, bob.id, theirs.id]),
+        db=db, current_user=user
+    ))
+    assert [contact.id for contact in result["contacts"]] == [bob.id, ann.id]
+    assert result["missing"] == [999, theirs.id]
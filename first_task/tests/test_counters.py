@@ -0,0 +1,101 @@
+import asyncio
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+from fastapi import Response
+
+from src.routes import contacts as routes_contacts
+from src.services import counters
+from src.services.counters import SEARCH_COUNT_CAP, ContactCounter
+
+USER = SimpleNamespace(id=1)
+
+
+@pytest.fixture
+def r(monkeypatch):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(counters, "get_redis", lambda **kwargs: r)
+    return r
+
+
+def count_with(monkeypatch, totals, during=None):
+    async def count_contacts(user, search, db, cap=None):
+        if during is not None:
+            await during()
+        return totals.pop(0)
+
+    monkeypatch.setattr(counters.repository_contacts, "count_contacts",
+                        count_contacts)
+
+
+def test_total_is_counted_once_then_adjusted(r, monkeypatch):
+    counter = ContactCounter()
+    count_with(monkeypatch, [3])
+    assert asyncio.run(counter.total(USER, None, None)) == (3, True)
+    asyncio.run(counter.adjust(USER.id, 1))
+    assert asyncio.run(counter.total(USER, None, None)) == (4, True)
+    asyncio.run(counter.adjust(USER.id, -2))
+    assert asyncio.run(counter.total(USER, None, None)) == (2, True)
+
+
+def test_adjustment_does_not_create_a_missing_counter(r, monkeypatch):
+    counter = ContactCounter()
+    asyncio.run(counter.adjust(USER.id, 1))
+    assert not r.exists("count:contacts:1")
+    count_with(monkeypatch, [5])
+    assert asyncio.run(counter.total(USER, None, None)) == (5, True)
+
+
+def test_total_counted_during_an_adjustment_is_not_stored(r, monkeypatch):
+    counter = ContactCounter()
+    count_with(monkeypatch, [3],
+               during=lambda: counter.adjust(USER.id, 1))
+    assert asyncio.run(counter.total(USER, None, None)) == (3, True)
+    assert not r.exists("count:contacts:1")
+    count_with(monkeypatch, [4])
+    assert asyncio.run(counter.total(USER, None, None)) == (4, True)
+    assert asyncio.run(counter.total(USER, None, None)) == (4, True)
+
+
+def test_search_totals_are_capped(r, monkeypatch):
+    counter = ContactCounter()
+    count_with(monkeypatch, [SEARCH_COUNT_CAP + 1, 7])
+    assert (asyncio.run(counter.total(USER, "smith", None))
+            == (SEARCH_COUNT_CAP, False))
+    assert asyncio.run(counter.total(USER, "smith", None)) == (7, True)
+
+
+def read_contacts(monkeypatch, contacts, skip=0, limit=2, search=None):
+    async def get_contacts(skip, limit, user, search, db):
+        return contacts
+
+    monkeypatch.setattr(routes_contacts.repository_contacts, "get_contacts",
+                        get_contacts)
+    response = Response()
+    asyncio.run(routes_contacts.read_contacts(
+        response, skip=skip, limit=limit, search=search, db=None,
+        current_user=USER
+    ))
+    return response.headers
+
+
+def test_partial_page_reports_its_total_without_counting(r, monkeypatch):
+    count_with(monkeypatch, [])
+    headers = read_contacts(monkeypatch, ["a"], skip=4)
+    assert headers["X-Total-Count"] == "5"
+    assert "X-Total-Count-Estimated" not in headers
+
+
+def test_full_page_reports_the_counted_total(r, monkeypatch):
+    count_with(monkeypatch, [9])
+    headers = read_contacts(monkeypatch, ["a", "b"])
+    assert headers["X-Total-Count"] == "9"
+    assert "X-Total-Count-Estimated" not in headers
+
+
+def test_capped_search_total_is_flagged_as_estimated(r, monkeypatch):
+    count_with(monkeypatch, [SEARCH_COUNT_CAP + 1])
+    headers = read_contacts(monkeypatch, ["a", "b"], search="smith")
+    assert headers["X-Total-Count"] == str(SEARCH_COUNT_CAP)
+    assert headers["X-Total-Count-Estimated"] == "true"
@@ -0,0 +1,151 @@
+import asyncio
+import json
+
+import fakeredis.aioredis
+import pytest
+from jose import jwt
+from redis.exceptions import RedisError
+
+from src.middleware.idempotency import IdempotencyMiddleware
+
+SECRET_KEY = "secret"
+TOKEN = jwt.encode({"sub": "user@example.com", "scope": "access_token"},
+                   SECRET_KEY, algorithm="HS256")
+
+
+class App:
+    """ASGI application answering writes with a status and a counter."""
+
+    def __init__(self, status=201):
+        self.status = status
+        self.calls = 0
+        self.release = None
+
+    async def __call__(self, scope, receive, send):
+        self.calls += 1
+        calls = self.calls
+        if self.release is not None:
+            await self.release.wait()
+        await send({"type": "http.response.start", "status": self.status,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body",
+                    "body": json.dumps({"call": calls}).encode()})
+
+
+@pytest.fixture
+def r():
+    return fakeredis.aioredis.FakeRedis(decode_responses=True)
+
+
+def middleware(app, r):
+    return IdempotencyMiddleware(
+        app, redis=lambda: r, secret_key=SECRET_KEY, algorithm="HS256",
+        prefixes=("/api/contacts",), ttl=60, lock_ttl=10, wait_timeout=1
+    )
+
+
+async def request(app, body=b"{}", key=b"key-1"):
+    scope = {
+        "type": "http", "method": "POST", "path": "/api/contacts/",
+        "query_string": b"",
+        "headers": [(b"authorization", b"Bearer " + TOKEN.encode()),
+                    (b"idempotency-key", key)],
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start, body = messages
+    return start["status"], dict(start["headers"]), json.loads(body["body"])
+
+
+def test_retries_replay_the_stored_response(r):
+    async def scenario():
+        app = App()
+        handler = middleware(app, r)
+        first = await request(handler)
+        second = await request(handler)
+        return app, first, second
+
+    app, first, second = asyncio.run(scenario())
+    assert app.calls == 1
+    assert first[0] == second[0] == 201
+    assert second[2] == first[2] == {"call": 1}
+    assert second[1][b"idempotent-replayed"] == b"true"
+
+
+def test_key_reused_for_another_request_is_rejected(r):
+    async def scenario():
+        handler = middleware(App(), r)
+        await request(handler, body=b'{"name": "a"}')
+        return await request(handler, body=b'{"name": "b"}')
+
+    status, _, body = asyncio.run(scenario())
+    assert status == 422
+    assert "different request" in body["detail"]
+
+
+def test_server_errors_are_not_stored(r):
+    async def scenario():
+        app = App(status=503)
+        handler = middleware(app, r)
+        first = await request(handler)
+        second = await request(handler)
+        return app, first, second, await r.exists("idempotency:"
+                                                  "user@example.com:key-1")
+
+    app, first, second, stored = asyncio.run(scenario())
+    assert app.calls == 2
+    assert (first[0], second[0]) == (503, 503)
+    assert not stored
+
+
+def test_concurrent_duplicate_waits_for_the_response(r):
+    async def scenario():
+        app = App()
+        app.release = asyncio.Event()
+        handler = middleware(app, r)
+        first = asyncio.create_task(request(handler))
+        await asyncio.sleep(0.01)
+        duplicate = asyncio.create_task(request(handler))
+        await asyncio.sleep(0.1)
+        assert not duplicate.done()
+        app.release.set()
+        return app, await first, await duplicate
+
+    app, first, duplicate = asyncio.run(scenario())
+    assert app.calls == 1
+    assert duplicate[0] == 201
+    assert duplicate[2] == first[2]
+    assert duplicate[1][b"idempotent-replayed"] == b"true"
+
+
+def test_redis_failure_after_the_response_is_not_raised(r, monkeypatch):
+    async def fail(*args, **kwargs):
+        raise RedisError("connection lost")
+
+    async def scenario():
+        handler = middleware(App(), r)
+        acquired = r.set
+
+        async def set_once(*args, **kwargs):
+            # Only the pending marker is set, then Redis goes away.
+            monkeypatch.setattr(r, "set", fail)
+            return await acquired(*args, **kwargs)
+
+        monkeypatch.setattr(r, "delete", fail)
+        monkeypatch.setattr(r, "set", set_once)
+        stored = await request(handler)
+        monkeypatch.setattr(r, "set", set_once)
+        handler.app.status = 500
+        failed = await request(handler, key=b"key-2")
+        return stored, failed
+
+    stored, failed = asyncio.run(scenario())
+    assert stored[0] == 201
+    assert failed[0] == 500
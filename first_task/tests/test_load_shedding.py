@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from src.middleware.load_shedding import ConcurrencyLimiter
+
+
+async def settle():
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_queued_requests_are_admitted_by_priority():
+    async def scenario():
+        limiter = ConcurrencyLimiter(1, 2, queue_timeout=1)
+        assert await limiter.acquire("default")
+        bulk = asyncio.create_task(limiter.acquire("bulk"))
+        auth = asyncio.create_task(limiter.acquire("auth"))
+        await settle()
+        limiter.release()
+        assert await auth
+        assert not bulk.done()
+        limiter.release()
+        assert await bulk
+        limiter.release()
+        assert limiter.stats()["in_flight"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_displaced_waiter_can_be_cancelled():
+    async def scenario():
+        limiter = ConcurrencyLimiter(1, 1, queue_timeout=1)
+        assert await limiter.acquire("default")
+        displaced = asyncio.create_task(limiter.acquire("bulk"))
+        await settle()
+        auth = asyncio.create_task(limiter.acquire("auth"))
+        await asyncio.sleep(0)
+        # The bulk request was shed to make room, and its client goes
+        # away before it has been answered.
+        assert limiter.stats()["queue_depth"] == 1
+        displaced.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await displaced
+
+        limiter.release()
+        assert await auth
+        limiter.release()
+        assert limiter.stats()["in_flight"] == 0
+        assert limiter.stats()["queue_depth"] == 0
+
+    asyncio.run(scenario())
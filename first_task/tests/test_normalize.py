@@ -0,0 +1,20 @@
+from src.services.normalize import normalize_email, normalize_phone
+
+
+def test_normalize_email():
+    assert normalize_email(" John.Smith+news@Gmail.com ") == (
+        "johnsmith@gmail.com"
+    )
+    assert normalize_email("john.smith@googlemail.com") == (
+        "johnsmith@gmail.com"
+    )
+    # Other providers may deliver john.smith and johnsmith to two people.
+    assert normalize_email("John.Smith+work@example.com") == (
+        "john.smith@example.com"
+    )
+    assert normalize_email(None) == ""
+
+
+def test_normalize_phone():
+    assert normalize_phone("+1 (555) 123-45.67") == "15551234567"
+    assert normalize_phone("n/a") is None
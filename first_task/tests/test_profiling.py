@@ -0,0 +1,63 @@
+import asyncio
+
+from src.middleware.profiling import ProfilingMiddleware, list_profiles
+
+TOKEN = "token"
+
+
+class App:
+    """ASGI application answering once its release event is set."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def __call__(self, scope, receive, send):
+        await self.release.wait()
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+
+async def request(app, path, profile=True):
+    headers = [(b"x-profile", TOKEN.encode())] if profile else []
+    scope = {"type": "http", "method": "GET", "path": path,
+             "headers": headers}
+    messages = []
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, None, send)
+    return dict(messages[0]["headers"])
+
+
+def test_cprofile_skips_requests_overlapping_others(tmp_path):
+    async def scenario():
+        app = App()
+        middleware = ProfilingMiddleware(app, str(tmp_path), 10, TOKEN)
+        middleware.profiler_class = None
+        running = asyncio.create_task(
+            request(middleware, "/running", profile=False)
+        )
+        await asyncio.sleep(0)
+        overlapping = asyncio.create_task(request(middleware, "/overlapping"))
+        await asyncio.sleep(0)
+        app.release.set()
+        await running
+        return await overlapping
+
+    assert b"x-profile-id" not in asyncio.run(scenario())
+    assert list_profiles(str(tmp_path)) == []
+
+
+def test_cprofile_profiles_requests_running_alone(tmp_path):
+    async def scenario():
+        app = App()
+        app.release.set()
+        middleware = ProfilingMiddleware(app, str(tmp_path), 10, TOKEN)
+        middleware.profiler_class = None
+        return await request(middleware, "/alone")
+
+    assert b"x-profile-id" in asyncio.run(scenario())
+    [profile] = list_profiles(str(tmp_path))
+    assert profile.name.endswith("-GET-alone.pstats")
@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+import fakeredis
+import pytest
+
+from src.services import sessions
+from src.services.sessions import RefreshTokenStore
+
+EMAIL = "user@example.com"
+
+
+@pytest.fixture
+def store(monkeypatch):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(sessions, "get_redis", lambda **kwargs: r)
+    monkeypatch.setattr(sessions, "SESSION_TTL", 2)
+    return RefreshTokenStore()
+
+
+def test_rotation_keeps_the_sessions_of_the_user(store):
+    family_id, token_id = asyncio.run(store.start(EMAIL, "laptop"))
+    for _ in range(3):
+        # Each refresh happens before the session expires, and the last
+        # one after the lifetime given to the session at login.
+        time.sleep(1)
+        token_id = asyncio.run(store.rotate(EMAIL, family_id, token_id))
+        assert token_id is not None
+
+    sessions_ = asyncio.run(store.list_sessions(EMAIL))
+    assert [session["id"] for session in sessions_] == [family_id]
+    asyncio.run(store.revoke_all(EMAIL))
+    assert asyncio.run(store.rotate(EMAIL, family_id, token_id)) is None
+
+
+def test_reused_token_revokes_the_session(store):
+    family_id, token_id = asyncio.run(store.start(EMAIL, "laptop"))
+    assert asyncio.run(store.rotate(EMAIL, family_id, token_id))
+    assert asyncio.run(store.rotate(EMAIL, family_id, token_id)) is None
+    assert asyncio.run(store.list_sessions(EMAIL)) == []
+
+
+def test_session_of_another_user_is_not_rotated(store):
+    family_id, token_id = asyncio.run(store.start(EMAIL, "laptop"))
+    assert asyncio.run(
+        store.rotate("other@example.com", family_id, token_id)
+    ) is None
+    assert asyncio.run(store.rotate(EMAIL, family_id, token_id))
@@ -0,0 +1,51 @@
+import asyncio
+from datetime import date
+from types import SimpleNamespace
+
+import fakeredis
+import pytest
+
+from src.services import stats
+from src.services.stats import ContactStatsCache
+
+USER = SimpleNamespace(id=1)
+TODAY = date(2026, 10, 19)
+
+
+@pytest.fixture
+def r(monkeypatch):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    monkeypatch.setattr(stats, "get_redis", lambda **kwargs: r)
+    return r
+
+
+def compute_with(monkeypatch, counts, during=None):
+    async def get_contact_stats(user, today, db):
+        if during is not None:
+            await during()
+        return {"total": counts.pop(0)}
+
+    monkeypatch.setattr(stats.repository_contacts, "get_contact_stats",
+                        get_contact_stats)
+
+
+def test_statistics_are_cached_until_invalidated(r, monkeypatch):
+    cache = ContactStatsCache()
+    compute_with(monkeypatch, [1, 2])
+    assert asyncio.run(cache.get(USER, TODAY, None)) == {"total": 1}
+    assert asyncio.run(cache.get(USER, TODAY, None)) == {"total": 1}
+    asyncio.run(cache.invalidate(USER.id))
+    assert asyncio.run(cache.get(USER, TODAY, None)) == {"total": 2}
+
+
+def test_statistics_computed_during_an_invalidation_are_not_stored(
+    r, monkeypatch
+):
+    cache = ContactStatsCache()
+    compute_with(monkeypatch, [1],
+                 during=lambda: cache.invalidate(USER.id))
+    assert asyncio.run(cache.get(USER, TODAY, None)) == {"total": 1}
+    assert not r.exists("stats:1")
+    compute_with(monkeypatch, [2])
+    assert asyncio.run(cache.get(USER, TODAY, None)) == {"total": 2}
+    assert asyncio.run(cache.get(USER, TODAY, None)) == {"total": 2}
@@ -0,0 +1,110 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from src.database.models import Contact
+from src.routes import contacts as routes_contacts
+from src.schemas import ContactUpdate
+from src.services import calendar, counters, stats, suggest
+from src.services.suggest import ContactSuggestions
+
+
+@pytest.fixture
+def r(monkeypatch):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    for module in (suggest, counters, stats, calendar):
+        monkeypatch.setattr(module, "get_redis", lambda **kwargs: r)
+    return r
+
+
+def add_contacts(db, user, *names):
+    contacts = []
+    for number, name in enumerate(names, 1):
+        first_name, last_name = name.split()
+        contacts.append(Contact(
+            first_name=first_name, last_name=last_name,
+            email=f"contact{number}@example.com",
+            user_id=user.id
+        ))
+    db.add_all(contacts)
+    db.commit()
+    return contacts
+
+
+def names(suggestions):
+    return [
+        f"{contact['first_name']} {contact['last_name']}"
+        for contact in suggestions
+    ]
+
+
+def test_first_lookup_builds_the_index(r, db, user):
+    add_contacts(db, user, "Ann Lee", "Anna Berg", "Andy Moss", "Bob Ann")
+    service = ContactSuggestions()
+    assert names(asyncio.run(service.suggest(user, "Ann", 10, db))) == [
+        "Ann Lee", "Bob Ann", "Anna Berg"
+    ]
+    assert r.exists(f"suggest:{user.id}:ready")
+    # Served by Redis alone once built.
+    db.query(Contact).delete()
+    db.commit()
+    assert len(asyncio.run(service.suggest(user, "ann", 10, db))) == 3
+
+
+def test_prefixes_match_whole_terms_only(r, db, user):
+    add_contacts(db, user, "Ann Lee", "Annz Roe", "Anm Poe")
+    service = ContactSuggestions()
+    assert names(asyncio.run(service.suggest(user, "ann", 10, db))) == [
+        "Ann Lee", "Annz Roe"
+    ]
+    assert names(asyncio.run(service.suggest(user, "ann l", 10, db))) == [
+        "Ann Lee"
+    ]
+    assert asyncio.run(service.suggest(user, "  ", 10, db)) == []
+
+
+def test_contacts_matching_several_terms_are_suggested_once(r, db, user):
+    add_contacts(db, user, "Ann Annist", "Anna Lee")
+    service = ContactSuggestions()
+    suggestions = asyncio.run(service.suggest(user, "an", 10, db))
+    assert names(suggestions) == ["Ann Annist", "Anna Lee"]
+    assert len(asyncio.run(service.suggest(user, "an", 1, db))) == 1
+
+
+def test_index_follows_updates_and_deletions(r, db, user):
+    ann, bob = add_contacts(db, user, "Ann Lee", "Bob Ray")
+    service = suggest.suggest_service
+    asyncio.run(service.suggest(user, "a", 10, db))
+
+    asyncio.run(routes_contacts.update_contact(
+        ann.id, ContactUpdate(first_name="Zoe"), current_user=user, db=db
+    ))
+    assert asyncio.run(service.suggest(user, "ann", 10, db)) == []
+    assert names(asyncio.run(service.suggest(user, "zoe", 10, db))) == [
+        "Zoe Lee"
+    ]
+
+    asyncio.run(routes_contacts.remove_contact(
+        bob.id, current_user=user, db=db
+    ))
+    assert asyncio.run(service.suggest(user, "bob", 10, db)) == []
+    assert r.hkeys(f"suggest:{user.id}:data") == [str(ann.id)]
+
+
+def test_removing_several_contacts(r, db, user):
+    contacts = add_contacts(db, user, "Ann Lee", "Anna Lee", "Andy Lee")
+    service = ContactSuggestions()
+    asyncio.run(service.suggest(user, "a", 10, db))
+    asyncio.run(service.remove_contacts(
+        user.id, [contacts[0].id, contacts[2].id]
+    ))
+    assert names(asyncio.run(service.suggest(user, "lee", 10, db))) == [
+        "Anna Lee"
+    ]
+
+
+def test_contacts_are_not_indexed_before_the_index_is_built(r, db, user):
+    [ann] = add_contacts(db, user, "Ann Lee")
+    asyncio.run(ContactSuggestions().index_contact(ann))
+    assert not r.exists(f"suggest:{user.id}:terms")
@@ -79,9 +79,13 @@ WSGI_APPLICATION = 'quotes_project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# DATABASE_ENGINE may select e.g. 'django.db.backends.sqlite3' for running
+# the tests without a PostgreSQL server; NAME is then the database file.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': env(
+            'DATABASE_ENGINE', default='django.db.backends.postgresql_psycopg2'
+        ),
         'NAME': env('DATABASE_NAME'),
         'USER': env('DATABASE_USER'),
         'PASSWORD': env('DATABASE_PASSWORD'),
@@ -91,6 +95,25 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# CACHE_URL selects the backend, e.g. redis://127.0.0.1:6379/1 (requires
+# the redis package) or locmemcache:// for a per-process memory cache.
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
+# Seconds full pages are cached for anonymous visitors; 0 disables it.
+# Purges only reach the memory cache of the process making the change, so
+# by default pages are only cached in a cache shared by every process.
+PAGE_CACHE_TIMEOUT = env.int(
+    'PAGE_CACHE_TIMEOUT',
+    default=0 if CACHES['default']['BACKEND'].endswith('.LocMemCache')
+    else 600
+)
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
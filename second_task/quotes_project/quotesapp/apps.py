@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class QuotesappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'quotesapp'
+
+    def ready(self):
+        import quotesapp.signals  # noqa
@@ -0,0 +1,130 @@
+"""
+Full-page caching of the public pages for anonymous visitors.
+
+Every cached page carries surrogate keys naming the objects it shows,
+e.g. 'quote:12', 'author:3' or 'tag:7', plus 'quotes' for pages listing
+all quotes and 'top-tags' for pages showing the top ten tags. Each key
+has a version in the cache, and a page is stored with the versions of its
+keys at the time it was rendered. Purging a key increments its version,
+which turns every page carrying it stale at once, without having to know
+which pages those are. Versions are created from the clock, so that a
+version evicted from the cache never comes back with an old value. A page
+is not stored if any key was purged while it was rendered, as it may show
+data older than the versions read after rendering.
+
+Purges reach the cache of the process making the change only, so pages
+must be cached in a cache shared by every process, e.g. Redis.
+
+Views opt in with the `cache_anonymous_page` decorator and declare their
+keys with `add_surrogate_keys`; the signals in `quotesapp.signals` purge
+the keys of the objects that change. Authenticated users always get
+freshly rendered pages.
+"""
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+PAGE_KEY_PREFIX = 'page:'
+VERSION_KEY_PREFIX = 'surrogate:'
+# Incremented by every purge.
+GENERATION_KEY = VERSION_KEY_PREFIX + '*'
+# The total shown on the main page, deleted when quotes are added or deleted.
+QUOTE_COUNT_CACHE_KEY = 'quotes:count'
+
+
+def surrogate_key(kind, pk=None):
+    """Return the surrogate key of an object, or of a kind of page."""
+    return kind if pk is None else f'{kind}:{pk}'
+
+
+def add_surrogate_keys(request, *keys):
+    """Declare objects the page rendered for a request depends on."""
+    if hasattr(request, 'surrogate_keys'):
+        request.surrogate_keys.update(keys)
+
+
+def purge_surrogate_keys(*keys):
+    """
+    Mark every cached page carrying one of the keys as stale, once the
+    current transaction commits.
+
+    Purging before the commit would let a concurrent request cache the
+    page it renders from the data still visible before the commit.
+    """
+    version_keys = [VERSION_KEY_PREFIX + key for key in set(keys)]
+    if version_keys:
+        transaction.on_commit(lambda: _increment_versions(version_keys))
+
+
+def _increment_versions(version_keys):
+    for version_key in [GENERATION_KEY] + version_keys:
+        try:
+            cache.incr(version_key)
+        except ValueError:
+            # Not stored, so no cached page is valid for it anyway.
+            pass
+
+
+def _current_versions(keys):
+    """Return the versions of the keys, creating the missing ones."""
+    version_keys = [VERSION_KEY_PREFIX + key for key in sorted(keys)]
+    versions = cache.get_many(version_keys)
+    missing = {
+        version_key: time.time_ns()
+        for version_key in version_keys if version_key not in versions
+    }
+    if missing:
+        cache.set_many(missing, timeout=None)
+        # Another request may have created some of them meanwhile.
+        versions.update(cache.get_many(list(missing)))
+    return versions
+
+
+def _page_key(request):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    return f'{PAGE_KEY_PREFIX}{request.method}:{path}'
+
+
+def cache_anonymous_page(view):
+    """
+    Decorator caching the successful responses of a view for anonymous
+    GET and HEAD requests, for `settings.PAGE_CACHE_TIMEOUT` seconds.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        timeout = settings.PAGE_CACHE_TIMEOUT
+        if (not timeout or request.method not in ('GET', 'HEAD')
+                or request.user.is_authenticated):
+            return view(request, *args, **kwargs)
+
+        page_key = _page_key(request)
+        entry = cache.get(page_key)
+        if entry is not None:
+            versions = cache.get_many(list(entry['versions']))
+            if versions == entry['versions']:
+                response = entry['response']
+                response['X-Cache'] = 'HIT'
+                return response
+
+        generation = cache.get_or_set(GENERATION_KEY, 0, timeout=None)
+        request.surrogate_keys = set()
+        response = view(request, *args, **kwargs)
+        if response.status_code == 200 and not response.cookies:
+            keys = request.surrogate_keys
+            response['Surrogate-Key'] = ' '.join(sorted(keys))
+            # Checked after the versions are read: a purge completed since
+            # the page was rendered would otherwise store the page with
+            # the versions that mark it stale.
+            versions = _current_versions(keys)
+            if cache.get(GENERATION_KEY) == generation:
+                cache.set(page_key, {
+                    'versions': versions,
+                    'response': response,
+                }, timeout)
+                response['X-Cache'] = 'MISS'
+        return response
+    return wrapper
@@ -0,0 +1,15 @@
+"""
+Import of the quotes and authors of the original MongoDB site, run with
+`python manage.py import_quotes`.
+"""
+from .loader import ImportStats, QuoteImporter, import_quotes
+from .parallel import ParallelImporter
+from .sources import (
+    InvalidDump, JSONSource, MongomockSource, MongoSource, Source
+)
+
+__all__ = [
+    'ImportStats', 'InvalidDump', 'JSONSource', 'MongomockSource',
+    'MongoSource', 'ParallelImporter', 'QuoteImporter', 'Source',
+    'import_quotes',
+]
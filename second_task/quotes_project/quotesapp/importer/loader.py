@@ -0,0 +1,573 @@
+"""
+Bulk import of authors and quotes from a source of MongoDB documents.
+
+Authors and quotes remember the _id of the document they were imported
+from in `mongo_id`, so that an import can be run again to bring in the
+documents added or changed since the previous one. The import runs in
+stages, each with a constant number of queries per batch instead of
+several per document:
+
+1. Authors: the primary keys of all authors are loaded by _id and by name.
+   New authors are inserted with bulk_create, changed ones updated with
+   bulk_update.
+2. Tags: the existing tags are loaded by name, and the missing tags of the
+   valid quotes of each batch are inserted together, in the order of their
+   names, so that concurrent batches inserting the same tags take their
+   locks in the same order.
+3. Quotes: the quotes and tags of the documents of a batch are read by
+   their _id. New quotes are inserted with bulk_create, changed ones
+   updated with bulk_update, and their links to tags are inserted and
+   deleted in bulk on the through table, in one transaction per batch.
+   The quotes can be split into partitions of the source, imported by
+   concurrent workers (see `quotesapp.importer.parallel`).
+
+Rows imported before the _id was recorded, or entered on the site, are
+matched to the documents by author name and by the text of the quote, and
+take the _id of their document.
+
+Unless the import is full, the documents below the high-water marks of
+the previous import are skipped (see `quotesapp.importer.sync`). The
+marks are saved at the end of a successful import.
+
+bulk_create and bulk_update send no signals, so the work of the receivers
+in `quotesapp.signals` is done once per batch: tag quote counts, search
+vectors and cached pages are updated in the batch transaction. Workers of
+a parallel import leave the quote counts to the parent process instead,
+see `QuoteImporter.defer_tag_counts`.
+"""
+import hashlib
+import time
+from collections import Counter, defaultdict
+from datetime import date, datetime
+from itertools import islice
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Value, When
+
+from quotesapp.cache import (
+    QUOTE_COUNT_CACHE_KEY, purge_surrogate_keys, surrogate_key
+)
+from quotesapp.models import Author, Quote, SyncState, Tag
+from quotesapp.search import update_search_vectors
+from quotesapp.signals import adjust_quote_counts
+
+from .sync import advance, changed_since, document_id
+
+QuoteTags = Quote.tags.through
+
+DATE_FORMATS = ('%Y-%m-%d', '%B %d, %Y', '%b %d, %Y', '%d %B %Y')
+TAG_MAX_LENGTH = Tag._meta.get_field('name').max_length
+AUTHOR_MAX_LENGTH = Author._meta.get_field('fullname').max_length
+MONGO_ID_MAX_LENGTH = Quote._meta.get_field('mongo_id').max_length
+AUTHOR_FIELDS = (
+    'fullname', 'birth_date', 'birth_location', 'description', 'mongo_id'
+)
+
+
+def parse_date(value):
+    """Parse the birth date of an author, e.g. 'March 14, 1879'."""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    if isinstance(value, dict):
+        # Extended JSON, e.g. {'$date': '1879-03-14T00:00:00Z'}.
+        value = str(value.get('$date', ''))[:10]
+    for date_format in DATE_FORMATS:
+        try:
+            return datetime.strptime(str(value).strip(), date_format).date()
+        except ValueError:
+            pass
+    return None
+
+
+def fingerprint(text):
+    """Return a compact digest identifying the text of a quote."""
+    return hashlib.blake2b(text.encode(), digest_size=8).digest()
+
+
+def tag_name(value):
+    return str(value).strip()[:TAG_MAX_LENGTH]
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class ImportStats:
+    """Counters of an import run."""
+
+    fields = (
+        'authors_created', 'authors_updated', 'authors_existing',
+        'authors_invalid', 'tags_created', 'quotes_read', 'quotes_created',
+        'quotes_updated', 'quotes_existing', 'quotes_invalid',
+        'links_created', 'links_deleted',
+    )
+
+    def __init__(self):
+        for field in self.fields:
+            setattr(self, field, 0)
+        self.started = time.monotonic()
+
+    def add(self, other):
+        """Add the counters of another ImportStats, e.g. of a worker."""
+        for field in self.fields:
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    def __str__(self):
+        rate = self.quotes_read / max(self.elapsed, 1e-9)
+        return (
+            f"authors: {self.authors_created} created, "
+            f"{self.authors_updated} updated, "
+            f"{self.authors_existing} unchanged, "
+            f"{self.authors_invalid} invalid; "
+            f"tags: {self.tags_created} created; "
+            f"quotes: {self.quotes_read} read, {self.quotes_created} "
+            f"created, {self.quotes_updated} updated, "
+            f"{self.quotes_existing} unchanged, "
+            f"{self.quotes_invalid} invalid; "
+            f"links: {self.links_created} created, "
+            f"{self.links_deleted} deleted; "
+            f"{self.elapsed:.1f}s, {rate:.0f} quotes/s"
+        )
+
+
+class QuoteImporter:
+    """
+    Imports the authors and quotes of a source into the database.
+
+    Args:
+        source: Provides the `authors()` and `quotes()` documents, see
+                `quotesapp.importer.sources`.
+        batch_size (int): Number of quotes per transaction.
+        dry_run (bool): Read and validate everything, but write nothing.
+        full (bool): Process every document, not only those above the
+                     high-water marks of the previous import.
+        report (Callable[[str], None]): Receives progress messages.
+        report_interval (float): Minimum seconds between two messages.
+    """
+
+    def __init__(self, source, batch_size=1000, dry_run=False, full=False,
+                 report=print, report_interval=5.0):
+        self.source = source
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.full = full
+        self.report = report
+        self.report_interval = report_interval
+        self.stats = ImportStats()
+        # MongoDB author _id -> Author primary key.
+        self.authors = {}
+        # Tag name -> Tag primary key, None for tags of a dry run.
+        self.tags = {}
+        # Names of the tags created by this import.
+        self.new_tags = set()
+        # Whether the changes of the tag quote counts are collected in
+        # tag_deltas instead of applied with each batch, so that concurrent
+        # batches do not contend for the rows of popular tags.
+        self.defer_tag_counts = False
+        # Tag primary key -> change of its quote count not applied yet.
+        self.tag_deltas = Counter()
+        # Fingerprint of the text -> primary key, of the quotes without
+        # a mongo_id.
+        self.unmapped_quotes = {}
+        self.states = {}
+
+    def run(self):
+        """Run every stage of the import and return its ImportStats."""
+        self.prepare()
+        self.import_partition()
+        self.save_states()
+        return self.stats
+
+    def prepare(self):
+        """Load the sync states, tags and quotes, and import the authors."""
+        self.load_states()
+        self.import_authors()
+        self.load_tags()
+        self.load_unmapped_quotes()
+
+    def import_partition(self, partition=None):
+        """Import the quotes of a partition of the source, or all of them."""
+        last_report = time.monotonic()
+        for batch in batched(self.documents('quotes', partition),
+                             self.batch_size):
+            self.import_quotes(batch)
+            if time.monotonic() - last_report >= self.report_interval:
+                last_report = time.monotonic()
+                self.report(f"Progress: {self.stats}")
+
+    def load_states(self):
+        states = SyncState.objects.in_bulk(
+            ['authors', 'quotes'], field_name='collection'
+        )
+        self.states = {
+            collection: states.get(collection)
+            or SyncState(collection=collection)
+            for collection in ('authors', 'quotes')
+        }
+        self.reset_marks()
+
+    def reset_marks(self):
+        # The marks the next import starts from, raised while reading.
+        self.marks = {
+            collection: SyncState(
+                pk=state.pk, collection=collection, last_id=state.last_id,
+                last_updated_at=state.last_updated_at
+            )
+            for collection, state in self.states.items()
+        }
+
+    def save_states(self):
+        if self.dry_run:
+            return
+        for mark in self.marks.values():
+            mark.save()
+        self.report(
+            "Synced up to: " + ", ".join(map(str, self.marks.values()))
+        )
+
+    @property
+    def since(self):
+        """The SyncState of each collection, None for a full import."""
+        return dict.fromkeys(self.states) if self.full else self.states
+
+    def documents(self, collection, partition=None):
+        """
+        Yield the documents of a collection to import. The marks are raised
+        by the stages importing them, for the valid documents only, so
+        that the next import reads an invalid document again if it is
+        corrected.
+        """
+        since = self.since[collection]
+        if collection == 'quotes':
+            documents = self.source.quotes(since=since, partition=partition)
+        else:
+            documents = self.source.authors(since=since)
+        for document in documents:
+            if since is None or changed_since(document, since):
+                yield document
+
+    def import_authors(self):
+        """Map every author of the source to an Author, creating them."""
+        by_name = {}
+        for pk, fullname, mongo_id in Author.objects.values_list(
+                'id', 'fullname', 'mongo_id'):
+            by_name[fullname] = pk
+            if mongo_id is not None:
+                self.authors[mongo_id] = pk
+        for batch in batched(self.documents('authors'), self.batch_size):
+            self._import_author_batch(batch, by_name)
+        self.report(f"Authors: {len(self.authors)} mapped")
+
+    def _author(self, document):
+        """Return the Author described by a document, None if invalid."""
+        mongo_id = document_id(document.get('_id'))
+        fullname = (document.get('fullname') or '').strip()
+        birth_date = parse_date(document.get('born_date'))
+        if (not mongo_id or len(mongo_id) > MONGO_ID_MAX_LENGTH
+                or not fullname or len(fullname) > AUTHOR_MAX_LENGTH
+                or birth_date is None):
+            return None
+        return Author(
+            fullname=fullname,
+            birth_date=birth_date,
+            birth_location=(document.get('born_location') or '').strip(),
+            description=document.get('description'),
+            mongo_id=mongo_id,
+        )
+
+    def _import_author_batch(self, documents, by_name):
+        # New authors by name, and the _ids of the documents naming them.
+        new, new_ids = {}, defaultdict(list)
+        # Primary key -> (Author, document).
+        matched = {}
+        marks = self.marks['authors']
+        for document in documents:
+            author = self._author(document)
+            if author is None:
+                self.stats.authors_invalid += 1
+                continue
+            pk = self.authors.get(author.mongo_id)
+            if pk is None:
+                pk = by_name.get(author.fullname)
+            if pk is None:
+                new.setdefault(author.fullname, author)
+                new_ids[author.fullname].append(author.mongo_id)
+                advance(marks, document)
+            else:
+                author.pk = pk
+                matched[pk] = (author, document)
+                self.authors[author.mongo_id] = pk
+
+        changed, renamed = [], []
+        current = Author.objects.in_bulk(list(matched)) if matched else {}
+        for pk, (author, document) in matched.items():
+            stored = current.get(pk)
+            if stored is None:
+                # Deleted on the site since it was imported.
+                author.pk = None
+                new.setdefault(author.fullname, author)
+                new_ids[author.fullname].append(author.mongo_id)
+                advance(marks, document)
+                continue
+            if stored.mongo_id not in (None, author.mongo_id):
+                # Another document with the same name, shown as one author.
+                author.mongo_id = stored.mongo_id
+            if by_name.get(author.fullname, pk) != pk:
+                # Renamed to the name of another author.
+                self.stats.authors_invalid += 1
+                continue
+            advance(marks, document)
+            if all(getattr(stored, field) == getattr(author, field)
+                   for field in AUTHOR_FIELDS):
+                self.stats.authors_existing += 1
+                continue
+            changed.append(author)
+            if stored.fullname != author.fullname:
+                renamed.append(pk)
+                del by_name[stored.fullname]
+                by_name[author.fullname] = pk
+        self.stats.authors_created += len(new)
+        self.stats.authors_updated += len(changed)
+        if self.dry_run:
+            for mongo_ids in new_ids.values():
+                self.authors.update(dict.fromkeys(mongo_ids))
+            return
+
+        with transaction.atomic():
+            if new:
+                Author.objects.bulk_create(
+                    list(new.values()), ignore_conflicts=True
+                )
+                created = dict(
+                    Author.objects.filter(fullname__in=list(new))
+                                  .values_list('fullname', 'id')
+                )
+                by_name.update(created)
+                for fullname, mongo_ids in new_ids.items():
+                    for mongo_id in mongo_ids:
+                        self.authors[mongo_id] = created[fullname]
+            if changed:
+                Author.objects.bulk_update(changed, AUTHOR_FIELDS)
+                update_search_vectors(Quote.objects.filter(author__in=renamed))
+                purge_surrogate_keys(
+                    surrogate_key('search'),
+                    *(surrogate_key('author', author.pk) for author in changed)
+                )
+
+    def load_tags(self):
+        self.tags = dict(Tag.objects.values_list('name', 'id'))
+
+    def load_unmapped_quotes(self):
+        """Fingerprint the texts of the quotes without a mongo_id."""
+        quotes = Quote.objects.filter(mongo_id=None).values_list('id', 'quote')
+        self.unmapped_quotes = {
+            fingerprint(text.strip()): pk
+            for pk, text in quotes.iterator(chunk_size=10000)
+        }
+
+    def _tag_names(self, document):
+        names = []
+        for name in map(tag_name, document.get('tags') or ()):
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    def _create_tags(self, names):
+        """Create the missing tags of a batch and map their primary keys."""
+        missing = sorted(name for name in names if name not in self.tags)
+        if not missing:
+            return
+        self.stats.tags_created += len(missing)
+        self.new_tags.update(missing)
+        if self.dry_run:
+            self.tags.update(dict.fromkeys(missing))
+            return
+        Tag.objects.bulk_create(
+            [Tag(name=name) for name in missing], ignore_conflicts=True
+        )
+        self.tags.update(
+            Tag.objects.filter(name__in=missing).values_list('name', 'id')
+        )
+
+    def _read_quotes(self, documents):
+        """
+        Return the valid documents of a batch as (Quote, tag names) pairs,
+        the last document of each _id winning.
+        """
+        quotes = {}
+        for document in documents:
+            self.stats.quotes_read += 1
+            mongo_id = document_id(document.get('_id'))
+            text = (document.get('quote') or '').strip()
+            author = document_id(document.get('author'))
+            if (not mongo_id or len(mongo_id) > MONGO_ID_MAX_LENGTH
+                    or not text or author not in self.authors):
+                self.stats.quotes_invalid += 1
+                continue
+            quotes[mongo_id] = (
+                Quote(quote=text, author_id=self.authors[author],
+                      mongo_id=mongo_id),
+                self._tag_names(document),
+            )
+            advance(self.marks['quotes'], document)
+        return list(quotes.values())
+
+    def _stored_quotes(self, rows):
+        """
+        Return the stored quotes of a batch by _id, matching the quotes
+        without a mongo_id by their text.
+        """
+        fields = ('id', 'quote', 'author_id', 'mongo_id')
+        stored = {
+            quote.mongo_id: quote
+            for quote in Quote.objects.filter(
+                mongo_id__in=[quote.mongo_id for quote, _ in rows]
+            ).only(*fields)
+        }
+        matches = {}
+        for quote, _ in rows:
+            if quote.mongo_id not in stored:
+                pk = self.unmapped_quotes.pop(fingerprint(quote.quote), None)
+                if pk is not None:
+                    matches[pk] = quote.mongo_id
+        if not matches:
+            return stored
+        unmapped = Quote.objects.filter(pk__in=list(matches), mongo_id=None)
+        if not self.dry_run:
+            # Claimed in the transaction of the batch, so that a quote
+            # matched by concurrent imports is only taken by one of them.
+            unmapped.update(mongo_id=Case(*(
+                When(pk=pk, then=Value(mongo_id))
+                for pk, mongo_id in matches.items()
+            )))
+            unmapped = Quote.objects.filter(
+                pk__in=list(matches), mongo_id__in=list(matches.values())
+            )
+        for quote in unmapped.only(*fields):
+            # Saved again with the other changes of the quote.
+            quote.mongo_id = None
+            stored[matches[quote.pk]] = quote
+        return stored
+
+    def import_quotes(self, documents):
+        """Import a batch of quote documents in one transaction."""
+        rows = self._read_quotes(documents)
+        if not rows:
+            return
+        if self.dry_run:
+            self._import_rows(rows)
+        else:
+            with transaction.atomic():
+                self._import_rows(rows)
+
+    def _import_rows(self, rows):
+        """Insert and update the quotes of a batch and their tags."""
+        stored = self._stored_quotes(rows)
+        # Quote primary key -> {tag name: (tag primary key, link primary
+        # key)}.
+        stored_links = defaultdict(dict)
+        for link_pk, quote_pk, tag_pk, name in QuoteTags.objects.filter(
+                quote_id__in=[quote.pk for quote in stored.values()]
+        ).values_list('id', 'quote_id', 'tag_id', 'tag__name'):
+            stored_links[quote_pk][name] = (tag_pk, link_pk)
+
+        new, changed, added, removed = [], [], [], []
+        for quote, names in rows:
+            current = stored.get(quote.mongo_id)
+            if current is None:
+                new.append(quote)
+                added += [(quote, name) for name in names]
+                continue
+            quote.pk = current.pk
+            links = stored_links[current.pk]
+            quote_added = [(quote, name) for name in names
+                           if name not in links]
+            quote_removed = [links[name] for name in links
+                             if name not in names]
+            fields_changed = (
+                (current.quote, current.author_id, current.mongo_id)
+                != (quote.quote, quote.author_id, quote.mongo_id)
+            )
+            if fields_changed or quote_added or quote_removed:
+                changed.append(quote)
+                added += quote_added
+                removed += quote_removed
+            else:
+                self.stats.quotes_existing += 1
+
+        self.stats.quotes_created += len(new)
+        self.stats.quotes_updated += len(changed)
+        self.stats.links_created += len(added)
+        self.stats.links_deleted += len(removed)
+        self._create_tags({name for _, name in added})
+        if self.dry_run:
+            return
+
+        Quote.objects.bulk_create(new, batch_size=self.batch_size)
+        Quote.objects.bulk_update(
+            changed, ['quote', 'author', 'mongo_id'],
+            batch_size=self.batch_size
+        )
+        links = [
+            QuoteTags(quote_id=quote.pk, tag_id=self.tags[name])
+            for quote, name in added
+        ]
+        # Without ignore_conflicts: the links are diffed against the stored
+        # ones, and the quote counts are adjusted by the inserted rows.
+        QuoteTags.objects.bulk_create(links, batch_size=self.batch_size)
+        QuoteTags.objects.filter(
+            pk__in=[link_pk for _, link_pk in removed]
+        ).delete()
+
+        deltas = Counter(link.tag_id for link in links)
+        deltas.subtract(tag_pk for tag_pk, _ in removed)
+        self._after_write(new, changed, deltas)
+
+    def _after_write(self, new, changed, deltas):
+        """Do what the signals of single writes would do, for a batch."""
+        if self.defer_tag_counts:
+            self.tag_deltas.update(deltas)
+        else:
+            self.adjust_tag_counts(deltas)
+
+        update_search_vectors(
+            Quote.objects.filter(pk__in=[quote.pk for quote in new + changed])
+        )
+
+        keys = [surrogate_key('quote', quote.pk) for quote in changed]
+        if changed:
+            keys.append(surrogate_key('search'))
+        keys += [surrogate_key('tag', tag_id) for tag_id in deltas]
+        if deltas:
+            keys.append(surrogate_key('top-tags'))
+        if new:
+            keys.append(surrogate_key('quotes'))
+            transaction.on_commit(lambda: cache.delete(QUOTE_COUNT_CACHE_KEY))
+        purge_surrogate_keys(*keys)
+
+    def adjust_tag_counts(self, deltas):
+        """Add the changes of a Counter to the quote counts of the tags."""
+        tags_by_delta = defaultdict(list)
+        for tag_id, delta in sorted(deltas.items()):
+            tags_by_delta[delta].append(tag_id)
+        for delta, tag_ids in tags_by_delta.items():
+            adjust_quote_counts(tag_ids, delta)
+
+
+def import_quotes(source, **options):
+    """
+    Import the authors and quotes of a source, see QuoteImporter.
+
+    Returns:
+        ImportStats: The counters of the import.
+    """
+    return QuoteImporter(source, **options).run()
@@ -0,0 +1,204 @@
+"""
+Parallel import of the quotes of a source by a pool of worker processes.
+
+The parent process imports the authors up front, then splits the quotes
+into partitions of the source (see `Source.partitions`), a few per worker
+so that uneven partitions even out. Each worker imports whole partitions
+in batches, as QuoteImporter does, with its own database connection, and
+returns its counters, the tags it created and its high-water marks, which
+the parent adds up and saves once every partition is imported. Workers
+needing the same new tag both insert it, ignoring the conflict, and the
+parent counts it once.
+
+Each batch would otherwise update the quote counts of its tags, and hold
+the locks of the rows of popular tags until it commits, serializing the
+workers. The workers return the changes of the counts instead, which the
+parent applies once at the end. Should the import fail, the batches of
+the workers were committed without them, so the counts of every tag are
+reconciled instead.
+
+Workers are forked where possible, so that they inherit the state of the
+parent instead of receiving it pickled, which the mongomock source needs.
+The database connections of the parent are closed first, as a connection
+cannot be shared between processes.
+
+SQLite allows a single writer at a time, and fails the transactions of
+workers waiting for each other, so only dry runs import in parallel there.
+"""
+import copy
+import multiprocessing
+import os
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import django
+from django.apps import apps
+from django.db import (
+    DatabaseError, NotSupportedError, connections, transaction
+)
+
+from quotesapp.cache import purge_surrogate_keys, surrogate_key
+from quotesapp.models import Tag
+
+from .loader import ImportStats, QuoteImporter
+from .sync import raise_marks
+
+# Partitions of the quotes per worker.
+PARTITIONS_PER_WORKER = 4
+
+# The importer of a worker process.
+_importer = None
+
+
+def _ignore(message):
+    pass
+
+
+def _start_worker(importer):
+    """Initialize a worker process with a copy of the parent importer."""
+    global _importer
+    if not apps.ready:
+        # A spawned process starts without Django.
+        django.setup()
+    connections.close_all()
+    importer.source = importer.source.for_worker()
+    _importer = importer
+
+
+def _import_partition(partition):
+    """
+    Import a partition of the quotes in a worker process.
+
+    Returns:
+        tuple: The process ID, the ImportStats of the partition, the names
+               of the tags created by the worker so far, the changes of the
+               tag quote counts, the high-water marks reached and the
+               seconds it took.
+    """
+    started = time.monotonic()
+    _importer.stats = ImportStats()
+    _importer.tag_deltas = Counter()
+    _importer.reset_marks()
+    _importer.import_partition(partition)
+    return (os.getpid(), _importer.stats, _importer.new_tags,
+            _importer.tag_deltas, _importer.marks,
+            time.monotonic() - started)
+
+
+def _context():
+    if 'fork' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('fork')
+    return multiprocessing.get_context()
+
+
+class ParallelImporter(QuoteImporter):
+    """
+    Imports the authors and quotes of a source, the quotes by a pool of
+    worker processes.
+
+    Args:
+        source: Provides the documents, see `quotesapp.importer.sources`.
+                Sources that cannot be partitioned are imported by one
+                worker.
+        workers (int | None): Number of worker processes, the number of
+                              CPUs by default. With one worker, the
+                              partitions are imported in this process.
+        **options: The other options of QuoteImporter.
+
+    Raises:
+        NotSupportedError: From `run()`, for concurrent writes to SQLite.
+    """
+
+    def __init__(self, source, workers=None, **options):
+        super().__init__(source, **options)
+        self.workers = workers or os.cpu_count() or 1
+
+    def run(self):
+        """Run every stage of the import and return its ImportStats."""
+        if (self.workers > 1 and not self.dry_run
+                and connections['default'].vendor == 'sqlite'):
+            raise NotSupportedError(
+                "SQLite does not support concurrent imports, use one worker"
+            )
+        self.prepare()
+        partitions = self.source.partitions(
+            self.workers * PARTITIONS_PER_WORKER, since=self.since['quotes']
+        )
+        self.report(
+            f"Quotes: {len(partitions)} partitions, {self.workers} workers"
+        )
+        if self.workers == 1:
+            for partition in partitions:
+                self.import_partition(partition)
+        else:
+            self.run_workers(partitions)
+        self.save_states()
+        return self.stats
+
+    def run_workers(self, partitions):
+        """Import the partitions in a pool of worker processes."""
+        worker = copy.copy(self)
+        worker.report = _ignore
+        worker.defer_tag_counts = True
+        tag_deltas = Counter()
+        # Process ID -> [quotes read, seconds].
+        throughput = defaultdict(lambda: [0, 0.0])
+        last_report = time.monotonic()
+        connections.close_all()
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=_context(),
+            initializer=_start_worker, initargs=(worker,)
+        )
+        with pool:
+            futures = [
+                pool.submit(_import_partition, partition)
+                for partition in partitions
+            ]
+            try:
+                for future in as_completed(futures):
+                    (pid, stats, new_tags, deltas, marks,
+                     elapsed) = future.result()
+                    self.stats.add(stats)
+                    self.new_tags |= new_tags
+                    tag_deltas.update(deltas)
+                    raise_marks(self.marks['quotes'], marks['quotes'])
+                    throughput[pid][0] += stats.quotes_read
+                    throughput[pid][1] += elapsed
+                    if time.monotonic() - last_report >= self.report_interval:
+                        last_report = time.monotonic()
+                        self.report(f"Progress: {self.stats}")
+            except BaseException:
+                pool.shutdown(cancel_futures=True)
+                self.reconcile_tag_counts()
+                raise
+        # Tags created by several workers are counted by each of them.
+        self.stats.tags_created = len(self.new_tags)
+        with transaction.atomic():
+            self.adjust_tag_counts(tag_deltas)
+            if tag_deltas:
+                purge_surrogate_keys(
+                    surrogate_key('top-tags'),
+                    *(surrogate_key('tag', tag_id) for tag_id in tag_deltas)
+                )
+
+        for number, (quotes, seconds) in enumerate(throughput.values(), 1):
+            rate = quotes / max(seconds, 1e-9)
+            self.report(
+                f"Worker {number}: {quotes} quotes in {seconds:.1f}s, "
+                f"{rate:.0f} quotes/s"
+            )
+
+    def reconcile_tag_counts(self):
+        """Recount the quotes of every tag after a failed import."""
+        if self.dry_run:
+            return
+        try:
+            drifted = Tag.objects.reconcile_quote_counts()
+        except DatabaseError as e:
+            self.report(
+                f"Could not reconcile the tag quote counts ({e}), run "
+                f"reconcile_tag_counts"
+            )
+        else:
+            self.report(f"Tags: {len(drifted)} quote counts reconciled")
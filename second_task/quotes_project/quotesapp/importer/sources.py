@@ -0,0 +1,350 @@
+"""
+Sources of the documents imported by `quotesapp.importer`.
+
+A source provides two iterables of dictionaries shaped like the documents
+of the MongoDB collections of the original site:
+
+    authors: {'_id', 'fullname', 'born_date', 'born_location',
+              'description'}
+    quotes:  {'_id', 'quote', 'author' (the _id of an author), 'tags'}
+
+Besides a live MongoDB database, documents can be read from dumps of the
+collections, `authors.json` and `quotes.json`, written by `mongoexport`
+either as one JSON array or as one document per line (NDJSON). Dumps are
+parsed incrementally, so their size does not matter.
+
+The quotes of a source can be split into partitions read by concurrent
+workers: ranges of _id for MongoDB, ranges of lines for NDJSON dumps. A
+JSON array can only be parsed from its start, so it is not split.
+"""
+import configparser
+import json
+import os
+from .sync import mongo_filter
+
+# Documents fetched per round trip from MongoDB.
+CURSOR_BATCH_SIZE = 5000
+# Characters read at once from a dump file.
+READ_CHUNK_SIZE = 1 << 16
+# Longest document of a dump, in characters: MongoDB documents are at most
+# 16 MB of BSON.
+MAX_DOCUMENT_SIZE = 16 << 20
+
+_WHITESPACE = ' \t\n\r'
+
+
+class InvalidDump(ValueError):
+    """Raised for a dump that is not valid JSON."""
+
+
+def _is_truncated(error, length):
+    """
+    Whether a JSON error is due to the end of the text, of length
+    `length`, cutting a document off: the decoder then fails in a string,
+    or at the end of the text or of the incomplete token before it, e.g.
+    'fals' or '\\u12'.
+    """
+    return (error.msg.startswith('Unterminated string')
+            or length - error.pos <= 6)
+
+
+def iter_json_documents(file, chunk_size=READ_CHUNK_SIZE, object_hook=None):
+    """
+    Yield the documents of a JSON array, or of a sequence of JSON values
+    such as NDJSON, read from a text file a chunk at a time.
+
+    Only the current chunk and the document being parsed are held in
+    memory. `object_hook` is passed to the JSON decoder.
+
+    Raises:
+        ValueError: If the file is not valid JSON, or holds a document
+                    longer than MAX_DOCUMENT_SIZE.
+    """
+    decoder = json.JSONDecoder(object_hook=object_hook)
+    buffer, position, eof = '', 0, False
+    in_array = None
+    while True:
+        # Skip the whitespace and the array punctuation before a document.
+        while position < len(buffer) and (
+            buffer[position] in _WHITESPACE
+            or (in_array and buffer[position] == ',')
+        ):
+            position += 1
+        if position == len(buffer):
+            if eof:
+                if in_array:
+                    raise ValueError("Unterminated JSON array")
+                return
+            buffer, position = file.read(chunk_size), 0
+            eof = not buffer
+            continue
+        if in_array is None:
+            in_array = buffer[position] == '['
+            if in_array:
+                position += 1
+                continue
+        if in_array and buffer[position] == ']':
+            return
+        try:
+            document, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError as e:
+            # The document continues in the next chunk, unless there is none.
+            if eof or not _is_truncated(e, len(buffer)):
+                raise
+            length = len(buffer) - position
+            if length > MAX_DOCUMENT_SIZE:
+                raise ValueError(
+                    f"Document longer than {MAX_DOCUMENT_SIZE} characters"
+                ) from e
+            # The document read so far is at least doubled, so that a long
+            # document is parsed a few times rather than once per chunk.
+            chunk = file.read(max(chunk_size, length))
+            eof = not chunk
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield document
+        position = end
+
+
+class Source:
+    """
+    Base class of the sources of documents.
+
+    Subclasses implement `authors()` and `quotes()`, each returning a new
+    iterable of documents on every call. Their `since` argument is the
+    SyncState of the collection in an incremental import: sources that can
+    query by _id and `updated_at` may skip the documents below its marks,
+    the others return every document, and the importer filters them.
+
+    Sources that can read their quotes in parts override `partitions()`;
+    the partitions it returns are passed back to `quotes()`.
+    """
+
+    def authors(self, since=None):
+        raise NotImplementedError
+
+    def quotes(self, since=None, partition=None):
+        raise NotImplementedError
+
+    def partitions(self, count, since=None):
+        """
+        Split the quotes into at most `count` disjoint partitions, which
+        must be picklable.
+        """
+        return [None]
+
+    def for_worker(self):
+        """Return the source to read from in a worker process."""
+        return self
+
+
+class MongoSource(Source):
+    """
+    Reads the `authors` and `quotes` collections of a MongoDB database.
+
+    Args:
+        db: A pymongo database.
+        uri (str | None): The URI the database was connected with, with
+                          which worker processes connect again.
+    """
+
+    def __init__(self, db, uri=None):
+        self.db = db
+        self.uri = uri
+
+    @classmethod
+    def connect(cls, uri, db_name):
+        from pymongo import MongoClient
+
+        client = MongoClient(uri)
+        # Fail early if the cluster cannot be reached.
+        client.server_info()
+        return cls(client[db_name], uri)
+
+    @classmethod
+    def from_config(cls, path):
+        """
+        Connect to the Atlas cluster described by the [DB] section of an
+        INI file, with the keys user, pass, domain and db_name.
+        """
+        config = configparser.ConfigParser()
+        if not config.read(path):
+            raise FileNotFoundError(path)
+        uri = (
+            f"mongodb+srv://{config.get('DB', 'user')}:"
+            f"{config.get('DB', 'pass')}@{config.get('DB', 'domain')}"
+            "/?retryWrites=true&w=majority&appName=Cluster0"
+        )
+        return cls.connect(uri, config.get('DB', 'db_name'))
+
+    def __reduce__(self):
+        # A client cannot be shared with another process, which connects
+        # again instead.
+        if self.uri is None:
+            raise TypeError(f"{type(self).__name__} has no URI to pickle")
+        return (type(self).connect, (self.uri, self.db.name))
+
+    def for_worker(self):
+        # The client of a forked process must not be used.
+        if self.uri is None:
+            return self
+        return type(self).connect(self.uri, self.db.name)
+
+    def authors(self, since=None):
+        return self.db.authors.find(mongo_filter(since))\
+                              .batch_size(CURSOR_BATCH_SIZE)
+
+    def quotes(self, since=None, partition=None):
+        query = mongo_filter(since)
+        if partition is not None:
+            lower, upper = partition
+            id_range = {}
+            if lower is not None:
+                id_range['$gte'] = lower
+            if upper is not None:
+                id_range['$lt'] = upper
+            if id_range:
+                query = {'$and': [query, {'_id': id_range}]}
+        return self.db.quotes.find(query).batch_size(CURSOR_BATCH_SIZE)
+
+    def partitions(self, count, since=None):
+        """
+        Split the quotes into ranges of _id of about the same size, found
+        by skipping along the _id index.
+        """
+        query = mongo_filter(since)
+        total = self.db.quotes.count_documents(query)
+        size = -(-total // count)
+        bounds = [None]
+        for start in range(size, total, size or 1):
+            document = next(
+                self.db.quotes.find(query, {'_id': 1})
+                              .sort('_id', 1).skip(start).limit(1),
+                None
+            )
+            if document is not None:
+                bounds.append(document['_id'])
+        bounds.append(None)
+        return list(zip(bounds, bounds[1:]))
+
+
+class JSONSource(Source):
+    """
+    Streams the documents of the `authors.json` and `quotes.json` dumps of
+    a directory.
+
+    Args:
+        directory (str): The directory of the dumps.
+        chunk_size (int): Characters read at once from a dump.
+        object_hook (Callable[[dict], Any] | None): Converts the decoded
+                                                   objects, see json.
+
+    Raises:
+        FileNotFoundError: If a dump is missing.
+
+    Iterating the documents raises InvalidDump when the JSON is invalid.
+    """
+
+    def __init__(self, directory, chunk_size=READ_CHUNK_SIZE,
+                 object_hook=None):
+        self.paths = {
+            name: os.path.join(directory, f'{name}.json')
+            for name in ('authors', 'quotes')
+        }
+        for path in self.paths.values():
+            if not os.path.isfile(path):
+                raise FileNotFoundError(path)
+        self.chunk_size = chunk_size
+        self.object_hook = object_hook
+
+    def _documents(self, name):
+        path = self.paths[name]
+        with open(path, encoding='utf-8') as file:
+            try:
+                yield from iter_json_documents(
+                    file, self.chunk_size, self.object_hook
+                )
+            except ValueError as e:
+                raise InvalidDump(f"{path}: {e}") from e
+
+    def _lines(self, name, start, end):
+        """Yield the documents on the lines starting between two offsets."""
+        path = self.paths[name]
+        with open(path, 'rb') as file:
+            if start:
+                # Skip the end of the line before the range.
+                file.seek(start - 1)
+                file.readline()
+            while file.tell() < end:
+                line = file.readline()
+                if not line:
+                    break
+                if line.strip():
+                    try:
+                        yield json.loads(line, object_hook=self.object_hook)
+                    except ValueError as e:
+                        raise InvalidDump(f"{path}: {e}") from e
+
+    def _is_ndjson(self, name):
+        """Whether the first line of a dump holds a whole document."""
+        with open(self.paths[name], 'rb') as file:
+            try:
+                return isinstance(json.loads(file.readline()), dict)
+            except ValueError:
+                return False
+
+    def authors(self, since=None):
+        return self._documents('authors')
+
+    def quotes(self, since=None, partition=None):
+        if partition is None:
+            return self._documents('quotes')
+        return self._lines('quotes', *partition)
+
+    def partitions(self, count, since=None):
+        """
+        Split NDJSON dumps into ranges of lines of about the same size.
+        A JSON array is one partition, as every worker would have to parse
+        it whole to find its part.
+        """
+        if not self._is_ndjson('quotes'):
+            return [None]
+        size = os.path.getsize(self.paths['quotes'])
+        bounds = sorted({size * index // count for index in range(count)})
+        return list(zip(bounds, bounds[1:] + [size]))
+
+
+class MongomockSource(MongoSource):
+    """
+    Serves documents from an in-memory mongomock database, through the same
+    cursors as a MongoSource, to exercise the import without a cluster.
+
+    Args:
+        authors (Iterable[dict]): The documents of the `authors` collection.
+        quotes (Iterable[dict]): The documents of the `quotes` collection.
+
+    Raises:
+        ImportError: If mongomock is not installed.
+    """
+
+    def __init__(self, authors=(), quotes=()):
+        import mongomock
+
+        db = mongomock.MongoClient().quotes
+        for collection, documents in (('authors', authors),
+                                      ('quotes', quotes)):
+            documents = list(documents)
+            if documents:
+                db[collection].insert_many(documents)
+        super().__init__(db)
+
+    @classmethod
+    def from_dumps(cls, directory):
+        """
+        Load the dumps of a directory, see JSONSource, turning extended
+        JSON such as {'$oid': ...} into BSON values as mongoimport does.
+        """
+        from bson import json_util
+
+        dumps = JSONSource(directory, object_hook=json_util.object_hook)
+        return cls(dumps.authors(), dumps.quotes())
@@ -0,0 +1,107 @@
+import configparser
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import NotSupportedError
+
+from quotesapp.importer import (
+    InvalidDump, JSONSource, MongomockSource, MongoSource, ParallelImporter,
+    QuoteImporter
+)
+
+
+class Command(BaseCommand):
+    """
+    Import the authors and quotes of the original MongoDB site in batches.
+    Each run only processes the documents added or changed since the
+    previous one, unless `--full` is given, so it can run e.g. nightly to
+    keep the site in sync.
+
+    The documents are read from the MongoDB cluster of `--config`, or with
+    `--source json` from the `authors.json` and `quotes.json` dumps in the
+    directory `--path`. `--source mongomock` loads those dumps into an
+    in-memory MongoDB (requires mongomock) to test the MongoDB reader.
+
+    With `--workers`, the quotes are split into ranges of _id, or of lines
+    of an NDJSON dump, imported by a pool of processes.
+    """
+    help = "Import authors and quotes from MongoDB or its JSON dumps."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', choices=('mongo', 'json', 'mongomock'),
+            default='mongo',
+            help="Where the documents are read from."
+        )
+        parser.add_argument(
+            '--config', default='utils/config.ini',
+            help="INI file with the MongoDB connection parameters."
+        )
+        parser.add_argument(
+            '--path', default='.',
+            help="Directory of authors.json and quotes.json, for the json "
+                 "and mongomock sources."
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Number of quotes imported per transaction."
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help="Number of processes importing the quotes in parallel "
+                 "(PostgreSQL only, except for dry runs)."
+        )
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Process every document, not only the new and changed ones."
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Read and validate the documents without writing anything."
+        )
+
+    def get_source(self, options):
+        try:
+            if options['source'] == 'json':
+                return JSONSource(options['path'])
+            if options['source'] == 'mongomock':
+                return MongomockSource.from_dumps(options['path'])
+            from pymongo.errors import PyMongoError
+            try:
+                return MongoSource.from_config(options['config'])
+            except PyMongoError as e:
+                raise CommandError(f"Cannot connect to MongoDB: {e}")
+        except FileNotFoundError as e:
+            raise CommandError(f"File not found: {e}")
+        except ImportError as e:
+            raise CommandError(f"Missing dependency: {e.name}")
+        except configparser.Error as e:
+            raise CommandError(f"Invalid configuration: {e}")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive")
+        if options['workers'] < 1:
+            raise CommandError("--workers must be positive")
+        source = self.get_source(options)
+
+        importer_options = {
+            'batch_size': options['batch_size'],
+            'dry_run': options['dry_run'],
+            'full': options['full'],
+            'report': self.stdout.write,
+        }
+        if options['workers'] > 1:
+            importer = ParallelImporter(
+                source, workers=options['workers'], **importer_options
+            )
+        else:
+            importer = QuoteImporter(source, **importer_options)
+        try:
+            stats = importer.run()
+        except InvalidDump as e:
+            # The batches before the invalid document are imported.
+            raise CommandError(f"Invalid dump: {e}")
+        except NotSupportedError as e:
+            raise CommandError(str(e))
+        prefix = "Dry run, nothing written: " if options['dry_run'] else ""
+        self.stdout.write(self.style.SUCCESS(f"{prefix}{stats}"))
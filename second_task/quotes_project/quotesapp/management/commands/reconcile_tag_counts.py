@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from quotesapp.models import Tag
+
+
+class Command(BaseCommand):
+    """
+    Recount the quotes of every tag and correct the stored counts that
+    drifted, e.g. after links were written with raw SQL. Meant to run
+    periodically, e.g. nightly from cron.
+    """
+    help = "Reconcile Tag.quote_count with the actual number of quotes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report the drifted counts without correcting them."
+        )
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            drifted = list(Tag.objects.drifted_quote_counts())
+        else:
+            with transaction.atomic():
+                drifted = Tag.objects.reconcile_quote_counts()
+
+        for tag in drifted:
+            self.stdout.write(
+                f"{tag.name}: {tag.quote_count} -> {tag.actual_quote_count}"
+            )
+        verb = "drifted" if options['dry_run'] else "reconciled"
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(drifted)} tag count(s) {verb}"
+        ))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:20
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_quotes(apps, schema_editor):
+    Tag = apps.get_model('quotesapp', 'Tag')
+    QuoteTags = apps.get_model('quotesapp', 'Quote').tags.through
+    Tag.objects.update(quote_count=Coalesce(
+        Subquery(
+            QuoteTags.objects.filter(tag_id=OuterRef('pk'))
+                             .values('tag_id')
+                             .annotate(count=Count('*'))
+                             .values('count')
+        ),
+        0
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotesapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tag',
+            name='quote_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_quotes, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='tag',
+            index=models.Index(fields=['-quote_count', 'name', 'id'], name='quotesapp_tag_popular_idx'),
+        ),
+    ]
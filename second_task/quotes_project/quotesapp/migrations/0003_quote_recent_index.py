@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotesapp', '0002_tag_quote_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='quote',
+            index=models.Index(fields=['created_at', 'id'], name='quotesapp_quote_recent_idx'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:25
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Index the links of the auto-created Quote.tags through table by tag and
+    quote, for keyset pagination of the quotes of a tag. The through table
+    cannot declare indexes itself.
+    """
+
+    dependencies = [
+        ('quotesapp', '0003_quote_recent_index'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX quotesapp_quote_tags_tag_quote_idx '
+            'ON quotesapp_quote_tags (tag_id, quote_id)',
+            'DROP INDEX quotesapp_quote_tags_tag_quote_idx',
+        ),
+    ]
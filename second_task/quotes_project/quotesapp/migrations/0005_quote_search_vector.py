@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:26
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+def index_search_vectors(apps, schema_editor):
+    # Full-text search is only maintained on PostgreSQL.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        "UPDATE quotesapp_quote AS q SET search_vector = "
+        "setweight(to_tsvector('english', coalesce(q.quote, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(a.fullname, '')), 'B') "
+        "FROM quotesapp_author AS a WHERE a.id = q.author_id"
+    )
+    schema_editor.execute(
+        "CREATE INDEX quotesapp_quote_search_idx "
+        "ON quotesapp_quote USING gin (search_vector)"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(
+            "DROP INDEX IF EXISTS quotesapp_quote_search_idx"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotesapp', '0004_quote_tags_tag_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quote',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(index_search_vectors, drop_search_index),
+    ]
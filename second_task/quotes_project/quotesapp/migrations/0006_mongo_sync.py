@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quotesapp', '0005_quote_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('collection', models.CharField(max_length=50, unique=True)),
+                ('last_id', models.CharField(blank=True, default='', max_length=24)),
+                ('last_updated_at', models.DateTimeField(blank=True, null=True)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='author',
+            name='mongo_id',
+            field=models.CharField(editable=False, max_length=24, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name='quote',
+            name='mongo_id',
+            field=models.CharField(editable=False, max_length=24, null=True, unique=True),
+        ),
+    ]
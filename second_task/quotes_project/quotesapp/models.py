@@ -1,4 +1,49 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+class TagQuerySet(models.QuerySet):
+    def drifted_quote_counts(self):
+        """
+        Select the tags whose stored quote count differs from the actual
+        count, annotated with the `actual_quote_count`.
+        """
+        return self.annotate(actual_quote_count=actual_quote_count())\
+                   .exclude(quote_count=F('actual_quote_count'))\
+                   .order_by('pk')
+
+    def reconcile_quote_counts(self):
+        """
+        Correct the stored quote counts of the tags that drifted from the
+        actual counts.
+
+        Returns:
+            list: The reconciled tags, annotated with the previous
+                  `quote_count` and the `actual_quote_count`.
+        """
+        drifted = list(self.drifted_quote_counts())
+        if drifted:
+            # Counted again within the UPDATE, so that quotes tagged in the
+            # meantime are not missed.
+            Tag.objects.filter(pk__in=[tag.pk for tag in drifted])\
+                       .update(quote_count=actual_quote_count())
+        return drifted
+
+
+def actual_quote_count():
+    """Expression counting the quotes of a tag in the through table."""
+    through = Quote.tags.through
+    return Coalesce(
+        Subquery(
+            through.objects.filter(tag_id=OuterRef('pk'))
+                           .values('tag_id')
+                           .annotate(count=Count('*'))
+                           .values('count')
+        ),
+        0
+    )
 
 
 class Tag(models.Model):
@@ -6,13 +51,29 @@ class Tag(models.Model):
 
     Attributes:
         name (CharField): The name of the tag, must be unique.
+        quote_count (PositiveIntegerField): The number of quotes with the
+                                            tag, maintained by the signals
+                                            in `quotesapp.signals`.
         created_at (DateTimeField): The date and time the tag was created,
                                     automatically set to the current time
                                     when the tag is created.
     """
     name = models.CharField(max_length=50, null=False, unique=True)
+    quote_count = models.PositiveIntegerField(default=0, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = TagQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Holds every column of the top tags, so that they are read
+            # from the index alone.
+            models.Index(
+                fields=['-quote_count', 'name', 'id'],
+                name='quotesapp_tag_popular_idx'
+            ),
+        ]
+
     def __str__(self):
         return f"{self.name}"
 
@@ -25,6 +86,8 @@ class Author(models.Model):
         birth_date (DateField): The birth date of the author.
         birth_location (CharField): The birth location of the author.
         description (TextField): An optional description of the author.
+        mongo_id (CharField): The _id of the author in the MongoDB site it
+                              was imported from, if any.
         created_at (DateTimeField): The date and time the author was created,
                                     automatically set to the current time
                                     when the author is created.
@@ -33,6 +96,9 @@ class Author(models.Model):
     birth_date = models.DateField(null=False)
     birth_location = models.CharField(max_length=100, null=False)
     description = models.TextField(null=True, blank=True)
+    mongo_id = models.CharField(
+        max_length=24, null=True, unique=True, editable=False
+    )
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
@@ -48,14 +114,55 @@ class Quote(models.Model):
                              establishing a many-to-one relationship.
         tags (ManyToManyField): A set of Tags associated with the quote,
                                 establishing a many-to-many relationship.
+        mongo_id (CharField): The _id of the quote in the MongoDB site it
+                              was imported from, if any.
         created_at (DateTimeField): The date and time the quote was created,
                                     automatically set to the current time
                                     when the quote is created.
+        search_vector (SearchVectorField): The full-text search document of
+                                           the quote and its author name,
+                                           maintained on PostgreSQL only
+                                           (see `quotesapp.search`).
     """
     quote = models.TextField(null=False)
     author = models.ForeignKey(Author, on_delete=models.CASCADE)
     tags = models.ManyToManyField(Tag)
+    mongo_id = models.CharField(
+        max_length=24, null=True, unique=True, editable=False
+    )
     created_at = models.DateTimeField(auto_now_add=True)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # The keyset of the quote listings, newest first.
+            models.Index(
+                fields=['created_at', 'id'], name='quotesapp_quote_recent_idx'
+            ),
+        ]
 
     def __str__(self):
         return f"{self.quote} by {self.author}"
+
+
+class SyncState(models.Model):
+    """The high-water marks of the import of a MongoDB collection, up to
+    which its documents are known to be imported (see
+    `quotesapp.importer.sync`).
+
+    Attributes:
+        collection (CharField): The name of the collection, e.g. 'quotes'.
+        last_id (CharField): The greatest _id imported, empty before the
+                             first import.
+        last_updated_at (DateTimeField): The greatest `updated_at` of the
+                                         documents imported, if they have
+                                         one.
+        synced_at (DateTimeField): The date and time of the last import.
+    """
+    collection = models.CharField(max_length=50, unique=True)
+    last_id = models.CharField(max_length=24, blank=True, default='')
+    last_updated_at = models.DateTimeField(null=True, blank=True)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.collection} up to {self.last_id or '-'}"
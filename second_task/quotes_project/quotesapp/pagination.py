@@ -0,0 +1,209 @@
+"""
+Keyset (cursor) pagination for long listings.
+
+Django's Paginator counts all rows on every request and reads pages with
+OFFSET, which has to skip every row before the page. KeysetPaginator
+instead remembers the sort key of the first and last rows of a page in
+opaque cursors and reads the next page with a WHERE condition on that
+key, which an index on the ordering columns answers directly, so deep
+pages cost the same as the first one. The ordering must end with a
+unique column, e.g. the primary key, for the key to be unambiguous.
+"""
+import base64
+import json
+from datetime import datetime
+
+from django.core.cache import cache
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    """Raised for a cursor that was not created by the paginator."""
+
+
+class KeysetPage:
+    """A page of a KeysetPaginator, usable like a list of objects.
+
+    Attributes:
+        object_list (list): The objects of the page.
+        has_previous (bool): Whether objects exist before this page.
+        has_next (bool): Whether objects exist after this page.
+        previous_cursor (str | None): The `before` cursor of the previous
+                                      page.
+        next_cursor (str | None): The `after` cursor of the next page.
+        paginator (KeysetPaginator): The paginator of the page.
+    """
+
+    def __init__(self, object_list, has_previous, has_next, paginator):
+        self.object_list = object_list
+        self.has_previous = has_previous
+        self.has_next = has_next
+        self.paginator = paginator
+        self.previous_cursor = (
+            paginator.encode_cursor(object_list[0])
+            if has_previous and object_list else None
+        )
+        self.next_cursor = (
+            paginator.encode_cursor(object_list[-1])
+            if has_next and object_list else None
+        )
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_other_pages(self):
+        return self.has_previous or self.has_next
+
+
+class KeysetPaginator:
+    """
+    Paginates a queryset by the values of its ordering columns.
+
+    Args:
+        queryset (QuerySet): The objects to paginate.
+        per_page (int): The number of objects per page.
+        ordering (tuple[str, ...]): The order of the listing, all fields
+                                    descending or all ascending, ending
+                                    with a unique field.
+        count_cache_key (str | None): Cache key under which the total
+                                      number of objects is cached, if
+                                      `count` is used.
+        count_timeout (int): How long the total is cached, in seconds.
+    """
+
+    def __init__(self, queryset, per_page,
+                 ordering=('-created_at', '-id'),
+                 count_cache_key=None, count_timeout=300):
+        descending = {field.startswith('-') for field in ordering}
+        if len(descending) != 1:
+            raise ValueError("All ordering fields must have the same order")
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [field.lstrip('-') for field in ordering]
+        self.descending = descending.pop()
+        self.count_cache_key = count_cache_key
+        self.count_timeout = count_timeout
+
+    def encode_cursor(self, obj):
+        """Return the cursor pointing at an object of the listing."""
+        values = [getattr(obj, field) for field in self.fields]
+        payload = json.dumps([
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in values
+        ])
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, cursor):
+        """
+        Return the ordering values a cursor points at.
+
+        Raises:
+            InvalidCursor: If the cursor cannot be decoded.
+        """
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if len(values) != len(self.fields):
+                raise ValueError(cursor)
+            return [
+                self._to_python(field, value)
+                for field, value in zip(self.fields, values)
+            ]
+        except (ValueError, TypeError, ValidationError) as e:
+            raise InvalidCursor(cursor) from e
+
+    def _to_python(self, field, value):
+        try:
+            model_field = self.queryset.model._meta.get_field(field)
+        except FieldDoesNotExist:
+            # An annotation, e.g. a rank.
+            annotation = self.queryset.query.annotations.get(field)
+            if annotation is None:
+                raise ValueError(field)
+            model_field = annotation.output_field
+        return model_field.to_python(value)
+
+    def _beyond(self, values, after):
+        """
+        Build the condition selecting the rows after (or before) the row
+        with the given ordering values, in the order of the listing.
+
+        The condition is written so that its first term bounds the first
+        ordering column, which lets the database scan the index from the
+        cursor: for a descending (a, b) listing, the rows after (x, y)
+        are `a <= x AND (a < x OR (a = x AND b < y))`.
+        """
+        lookup = 'lt' if after == self.descending else 'gt'
+        condition = None
+        for position in reversed(range(len(self.fields))):
+            field, value = self.fields[position], values[position]
+            strict = Q(**{f'{field}__{lookup}': value})
+            if condition is None:
+                condition = strict
+            else:
+                condition = strict | (Q(**{field: value}) & condition)
+        return Q(**{f'{self.fields[0]}__{lookup}e': values[0]}) & condition
+
+    def page(self, after=None, before=None):
+        """
+        Return the page following the `after` cursor, the page preceding
+        the `before` cursor, or the first page.
+
+        Raises:
+            InvalidCursor: If a cursor cannot be decoded.
+        """
+        queryset = self.queryset.order_by(*self.ordering)
+        if before is not None:
+            reverse_ordering = [
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in self.ordering
+            ]
+            rows = list(
+                queryset.filter(self._beyond(self.decode_cursor(before),
+                                             after=False))
+                        .order_by(*reverse_ordering)[:self.per_page + 1]
+            )
+            has_previous = len(rows) > self.per_page
+            rows = rows[:self.per_page][::-1]
+            return KeysetPage(rows, has_previous, True, self)
+
+        if after is not None:
+            queryset = queryset.filter(
+                self._beyond(self.decode_cursor(after), after=True)
+            )
+        rows = list(queryset[:self.per_page + 1])
+        has_next = len(rows) > self.per_page
+        return KeysetPage(
+            rows[:self.per_page], after is not None, has_next, self
+        )
+
+    def count(self):
+        """Return the total number of objects, cached if configured."""
+        if self.count_cache_key is None:
+            return self.queryset.count()
+        return cache.get_or_set(
+            self.count_cache_key, self.queryset.count, self.count_timeout
+        )
+
+
+def get_page(paginator, request):
+    """
+    Return the page requested with the `after` or `before` query parameter,
+    falling back to the first page for invalid or outdated cursors.
+    """
+    after = request.GET.get('after')
+    before = None if after else request.GET.get('before')
+    try:
+        page = paginator.page(after=after, before=before)
+    except InvalidCursor:
+        return paginator.page()
+    if not page.object_list and (after or before):
+        return paginator.page()
+    return page
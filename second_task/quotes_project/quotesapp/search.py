@@ -0,0 +1,106 @@
+"""
+Full-text search of quotes by their text and the name of their author.
+
+On PostgreSQL, every quote stores a `search_vector` combining its text
+(weight A) and the full name of its author (weight B). The vector is
+kept up to date by the signals in `quotesapp.signals` and is indexed with
+GIN, so a search reads the matching quotes from the index, ranked with
+ts_rank and highlighted with ts_headline. Other databases, e.g. SQLite
+in tests, fall back to a case-insensitive substring search, newest first.
+
+Highlighted matches are delimited with HIGHLIGHT_START and HIGHLIGHT_STOP
+instead of markup, so that the text can be escaped before the delimiters
+are turned into <mark> elements by the `highlight` template filter.
+"""
+import re
+
+from django.contrib.postgres.search import (
+    SearchHeadline, SearchQuery, SearchRank, SearchVector
+)
+from django.db import connections
+from django.db.models import F, FloatField, OuterRef, Q, Subquery
+from django.db.models.functions import Cast
+
+from .models import Author, Quote
+
+SEARCH_CONFIG = 'english'
+HIGHLIGHT_START = '\x02'
+HIGHLIGHT_STOP = '\x03'
+
+
+def uses_full_text_search(using='default'):
+    return connections[using].vendor == 'postgresql'
+
+
+def quote_search_vector():
+    """Expression of the search vector of a quote, usable in UPDATE."""
+    author_name = Subquery(
+        Author.objects.filter(pk=OuterRef('author_id')).values('fullname')
+    )
+    return (
+        SearchVector('quote', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(author_name, weight='B', config=SEARCH_CONFIG)
+    )
+
+
+def update_search_vectors(quotes):
+    """
+    Recompute the search vectors of a queryset of quotes in one UPDATE.
+
+    Returns:
+        int: The number of quotes updated, 0 without full-text search.
+    """
+    if not uses_full_text_search(quotes.db):
+        return 0
+    return quotes.update(search_vector=quote_search_vector())
+
+
+def search_quotes(text):
+    """
+    Return the quotes matching a search, and the ordering to paginate
+    them by, best matches first.
+
+    The quotes are annotated with `quote_headline` and `author_headline`,
+    their text and author name with the matches highlighted.
+    """
+    quotes = Quote.objects.select_related('author').prefetch_related('tags')
+    if uses_full_text_search(quotes.db):
+        query = SearchQuery(
+            text, search_type='websearch', config=SEARCH_CONFIG
+        )
+        headline_options = {
+            'start_sel': HIGHLIGHT_START,
+            'stop_sel': HIGHLIGHT_STOP,
+            'highlight_all': True,
+            'config': SEARCH_CONFIG,
+        }
+        quotes = quotes.filter(search_vector=query).annotate(
+            # ts_rank returns a real, which would be compared with the
+            # double precision rank of a cursor without matching it.
+            rank=Cast(SearchRank(F('search_vector'), query), FloatField()),
+            quote_headline=SearchHeadline('quote', query, **headline_options),
+            author_headline=SearchHeadline(
+                'author__fullname', query, **headline_options
+            ),
+        )
+        return quotes, ('-rank', '-id')
+
+    quotes = quotes.filter(
+        Q(quote__icontains=text) | Q(author__fullname__icontains=text)
+    )
+    return quotes, ('-id',)
+
+
+def highlight_matches(quotes, text):
+    """
+    Set the headlines of quotes found without full-text search, marking
+    the occurrences of the searched text.
+    """
+    pattern = re.compile(re.escape(text), re.IGNORECASE)
+    marked = HIGHLIGHT_START + r'\g<0>' + HIGHLIGHT_STOP
+    for quote in quotes:
+        if not hasattr(quote, 'quote_headline'):
+            quote.quote_headline = pattern.sub(marked, quote.quote)
+            quote.author_headline = pattern.sub(
+                marked, quote.author.fullname
+            )
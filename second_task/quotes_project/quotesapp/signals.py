@@ -0,0 +1,219 @@
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_save, pre_delete
+)
+from django.dispatch import receiver
+
+from .cache import (
+    QUOTE_COUNT_CACHE_KEY, purge_surrogate_keys, surrogate_key
+)
+from .models import Author, Quote, Tag
+from .search import update_search_vectors
+
+QuoteTags = Quote.tags.through
+
+
+def adjust_quote_counts(tag_ids, delta):
+    """
+    Add `delta` to the quote count of each of the given tags.
+
+    The signals below run within the transaction of the change they report,
+    so a count is updated together with the quotes it counts.
+
+    Parameters:
+        tag_ids (Iterable[int]): Primary keys of the tags to update.
+        delta (int): The change in the number of quotes of each tag.
+    """
+    tag_ids = list(tag_ids)
+    if tag_ids and delta:
+        Tag.objects.filter(pk__in=tag_ids)\
+                   .update(quote_count=F('quote_count') + delta)
+
+
+@receiver(m2m_changed, sender=QuoteTags)
+def update_quote_counts(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Signal receiver that keeps `Tag.quote_count` up to date when quotes
+    and tags are linked or unlinked, from either side of the relation.
+
+    Parameters:
+        sender (Model): The through model of `Quote.tags`.
+        instance (Quote | Tag): The instance whose relation changed.
+        action (str): The kind of change, e.g. 'post_add'.
+        reverse (bool): True if `instance` is a Tag.
+        pk_set (set | None): Primary keys of the related objects, None
+                             for clear actions.
+        **kwargs: Variable keyword arguments.
+    """
+    if reverse:
+        links = QuoteTags.objects.filter(tag_id=instance.pk)
+        related = 'quote_id'
+    else:
+        links = QuoteTags.objects.filter(quote_id=instance.pk)
+        related = 'tag_id'
+
+    # pk_set only lists the links actually created for additions, whereas
+    # removals and clears report what was asked for; the links that exist
+    # are looked up before they are deleted.
+    if action == 'pre_remove':
+        links = links.filter(**{f'{related}__in': pk_set})
+    if action in ('pre_remove', 'pre_clear'):
+        instance._removed_tag_links = set(
+            links.values_list(related, flat=True)
+        )
+        return
+    if action == 'post_add':
+        changed, delta = pk_set, 1
+    elif action in ('post_remove', 'post_clear'):
+        changed, delta = instance.__dict__.pop('_removed_tag_links', ()), -1
+    else:
+        return
+
+    if reverse:
+        adjust_quote_counts([instance.pk], delta * len(changed))
+    else:
+        adjust_quote_counts(changed, delta)
+
+
+@receiver(pre_delete, sender=Quote)
+def remember_quote_tags(sender, instance, **kwargs):
+    """
+    Signal receiver that records the tags of a quote about to be deleted,
+    as its links are deleted without an m2m_changed signal.
+
+    Parameters:
+        sender (Model): The model class that sent the signal.
+        instance (Quote): The quote being deleted.
+        **kwargs: Variable keyword arguments.
+    """
+    instance._deleted_tag_ids = list(
+        QuoteTags.objects.filter(quote_id=instance.pk)
+                         .values_list('tag_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Quote)
+def decrement_quote_counts(sender, instance, **kwargs):
+    """
+    Signal receiver that decrements the quote counts of the tags of a
+    deleted quote.
+
+    Parameters:
+        sender (Model): The model class that sent the signal.
+        instance (Quote): The deleted quote.
+        **kwargs: Variable keyword arguments.
+    """
+    adjust_quote_counts(instance.__dict__.pop('_deleted_tag_ids', ()), -1)
+
+
+@receiver(post_save, sender=Quote)
+@receiver(post_delete, sender=Quote)
+def purge_quote_pages(sender, instance, created=False, **kwargs):
+    """
+    Signal receiver that purges the cached pages showing a quote and the
+    search results, and the quote listings and the cached total when
+    quotes are added or deleted.
+
+    Parameters:
+        sender (Model): The model class that sent the signal.
+        instance (Quote): The saved or deleted quote.
+        created (bool): True if a new quote was saved.
+        **kwargs: Variable keyword arguments.
+    """
+    keys = [surrogate_key('quote', instance.pk), surrogate_key('search')]
+    if created or kwargs['signal'] is post_delete:
+        keys += [surrogate_key('quotes'), surrogate_key('top-tags')]
+        transaction.on_commit(lambda: cache.delete(QUOTE_COUNT_CACHE_KEY))
+    purge_surrogate_keys(*keys)
+
+
+@receiver(post_save, sender=Author)
+@receiver(post_delete, sender=Author)
+def purge_author_pages(sender, instance, **kwargs):
+    """
+    Signal receiver that purges the cached pages showing an author, and
+    the search results, which match the names of authors.
+
+    Parameters:
+        sender (Model): The model class that sent the signal.
+        instance (Author): The saved or deleted author.
+        **kwargs: Variable keyword arguments.
+    """
+    purge_surrogate_keys(
+        surrogate_key('author', instance.pk), surrogate_key('search')
+    )
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def purge_tag_pages(sender, instance, **kwargs):
+    """
+    Signal receiver that purges the cached pages showing a tag.
+
+    Parameters:
+        sender (Model): The model class that sent the signal.
+        instance (Tag): The saved or deleted tag.
+        **kwargs: Variable keyword arguments.
+    """
+    purge_surrogate_keys(
+        surrogate_key('tag', instance.pk), surrogate_key('top-tags')
+    )
+
+
+@receiver(m2m_changed, sender=QuoteTags)
+def purge_tagging_pages(sender, instance, action, reverse, pk_set,
+                        **kwargs):
+    """
+    Signal receiver that purges the cached pages affected by quotes being
+    tagged or untagged: the pages showing the quotes, the pages of the
+    tags, and the top tags.
+
+    Parameters:
+        sender (Model): The through model of `Quote.tags`.
+        instance (Quote | Tag): The instance whose relation changed.
+        action (str): The kind of change, e.g. 'post_add'.
+        reverse (bool): True if `instance` is a Tag.
+        pk_set (set | None): Primary keys of the related objects, None
+                             for clear actions.
+        **kwargs: Variable keyword arguments.
+    """
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # After a clear, the pages of the unlinked objects still carry the key
+    # of the instance, as they showed it.
+    kind, related = ('tag', 'quote') if reverse else ('quote', 'tag')
+    purge_surrogate_keys(
+        surrogate_key(kind, instance.pk), surrogate_key('top-tags'),
+        *(surrogate_key(related, pk) for pk in pk_set or ())
+    )
+
+
+@receiver(post_save, sender=Quote)
+def update_quote_search_vector(sender, instance, **kwargs):
+    """
+    Signal receiver that updates the search vector of a saved quote.
+
+    Parameters:
+        sender (Model): The model class that sent the signal.
+        instance (Quote): The saved quote.
+        **kwargs: Variable keyword arguments.
+    """
+    update_search_vectors(Quote.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Author)
+def update_author_search_vectors(sender, instance, created, **kwargs):
+    """
+    Signal receiver that updates the search vectors of the quotes of an
+    author, which contain the author name.
+
+    Parameters:
+        sender (Model): The model class that sent the signal.
+        instance (Author): The saved author.
+        created (bool): True if a new author was saved.
+        **kwargs: Variable keyword arguments.
+    """
+    if not created:
+        update_search_vectors(Quote.objects.filter(author_id=instance.pk))
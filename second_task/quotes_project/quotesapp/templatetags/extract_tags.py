@@ -1,4 +1,9 @@
 from django import template
+from django.db.models import QuerySet
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from quotesapp.search import HIGHLIGHT_START, HIGHLIGHT_STOP
 
 # Create a template library instance
 register = template.Library()
@@ -9,12 +14,37 @@ def tags(quote_tags):
     A custom template filter to display tags associated with a quote.
 
     Args:
-        quote_tags: A queryset of Tag objects associated with a quote.
+        quote_tags: The tags manager of a quote, or a queryset or list
+                    of Tag objects.
 
     Returns:
         A string containing comma-separated names of the tags.
     """
-    return ', '.join([str(name) for name in quote_tags.all()])
+    # The manager serves `.all()` from the prefetch cache, whereas `.all()`
+    # on a queryset would clone it and query the database again.
+    if not isinstance(quote_tags, (QuerySet, list, tuple)):
+        quote_tags = quote_tags.all()
+    return ', '.join([str(name) for name in quote_tags])
 
 
 register.filter('tags', tags)
+
+
+def highlight(headline):
+    """
+    A custom template filter rendering a search headline, with the matches
+    delimited by `quotesapp.search` wrapped in <mark> elements.
+
+    Args:
+        headline: The text of a search result with delimited matches.
+
+    Returns:
+        The escaped text with the matches marked up.
+    """
+    return mark_safe(
+        escape(headline).replace(HIGHLIGHT_START, '<mark>')
+                        .replace(HIGHLIGHT_STOP, '</mark>')
+    )
+
+
+register.filter('highlight', highlight)
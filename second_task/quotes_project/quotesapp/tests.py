@@ -1,3 +1,906 @@
-from django.test import TestCase
+import base64
+import json
+import os
+import tempfile
+import unittest
+from contextlib import contextmanager
+from importlib.util import find_spec
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import F, FloatField
+from django.db.models.functions import Cast
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from . import cache as page_cache
+from .importer import (
+    JSONSource, MongomockSource, ParallelImporter, QuoteImporter, Source,
+    import_quotes
+)
+from .importer import parallel
+from .importer.sources import iter_json_documents
+from .models import Author, Quote, SyncState, Tag
+from .pagination import InvalidCursor, KeysetPaginator
+
+
+class QueryBudgetMixin:
+    """
+    Test case mixin asserting that code stays within a query budget.
+
+    Unlike `assertNumQueries`, a budget is an upper bound, and a failure
+    lists every captured query so that an N+1 pattern is easy to spot.
+    """
+
+    @contextmanager
+    def assertQueryBudget(self, budget):
+        with CaptureQueriesContext(connection) as context:
+            yield context
+        executed = len(context.captured_queries)
+        if executed > budget:
+            queries = '\n'.join(
+                f'{number}. {query["sql"]}'
+                for number, query in enumerate(context.captured_queries, 1)
+            )
+            self.fail(
+                f'{executed} queries executed, over the budget of {budget}:'
+                f'\n{queries}'
+            )
+
+    def assertViewQueryBudget(self, url, budget):
+        """Request a URL and assert its query count and success."""
+        with self.assertQueryBudget(budget) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+
+def create_quotes(author, tags, count):
+    for number in range(count):
+        quote = Quote.objects.create(
+            quote=f'Quote {number} by {author}', author=author
+        )
+        quote.tags.set(tags)
+
+
+NO_CACHE = {
+    'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+}
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0, CACHES=NO_CACHE)
+class PublicViewQueryBudgetTests(QueryBudgetMixin, TestCase):
+    """
+    Query budgets of the views anonymous visitors can reach. The number of
+    queries must not grow with the number of quotes, authors or tags shown.
+    """
+
+    # Total (cached in production), quotes with authors, their tags,
+    # top ten tags.
+    MAIN_BUDGET = 4
+    # Tag, page of its links, quotes with authors, their tags.
+    QUOTES_BY_TAG_BUDGET = 4
+    # Author.
+    AUTHOR_DETAIL_BUDGET = 1
+    # Matching quotes with authors, their tags.
+    SEARCH_BUDGET = 2
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [Tag.objects.create(name=f'tag{i}') for i in range(3)]
+        cls.authors = [
+            Author.objects.create(
+                fullname=f'Author {i}', birth_date=date(1900, 1, 1),
+                birth_location='Somewhere'
+            )
+            for i in range(3)
+        ]
+        for author in cls.authors:
+            create_quotes(author, cls.tags, 2)
+
+    def add_quotes(self):
+        author = Author.objects.create(
+            fullname='Prolific Author', birth_date=date(1900, 1, 1),
+            birth_location='Elsewhere'
+        )
+        tags = self.tags + [Tag.objects.create(name='extra')]
+        create_quotes(author, tags, 10)
+
+    def test_main(self):
+        url = reverse('quotesapp:index')
+        small = self.assertViewQueryBudget(url, self.MAIN_BUDGET)
+        self.add_quotes()
+        large = self.assertViewQueryBudget(url, self.MAIN_BUDGET)
+        self.assertEqual(small, large)
+
+    def test_quotes_by_tag(self):
+        url = reverse('quotesapp:quotes_by_tag', args=[self.tags[0].id])
+        small = self.assertViewQueryBudget(url, self.QUOTES_BY_TAG_BUDGET)
+        self.add_quotes()
+        large = self.assertViewQueryBudget(url, self.QUOTES_BY_TAG_BUDGET)
+        self.assertEqual(small, large)
+
+    def test_author_detail(self):
+        url = reverse('quotesapp:author_detail', args=[self.authors[0].id])
+        self.assertViewQueryBudget(url, self.AUTHOR_DETAIL_BUDGET)
+
+    def test_search(self):
+        url = reverse('quotesapp:search') + '?q=author'
+        self.assertViewQueryBudget(url, self.SEARCH_BUDGET)
+
+    def test_deep_pages_cost_the_same(self):
+        self.add_quotes()
+        index = reverse('quotesapp:index')
+        first = self.assertViewQueryBudget(index, self.MAIN_BUDGET)
+        url = index
+        for _ in range(2):
+            response = self.client.get(url)
+            url = f"{index}?after={response.context['quotes'].next_cursor}"
+        with self.assertQueryBudget(first) as context:
+            self.client.get(url)
+        self.assertFalse(any(
+            'OFFSET' in query['sql'] for query in context.captured_queries
+        ))
+
+
+class TagsFilterTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(
+            fullname='Author', birth_date=date(1900, 1, 1),
+            birth_location='Somewhere'
+        )
+        tags = [Tag.objects.create(name=name) for name in ('love', 'life')]
+        create_quotes(author, tags, 3)
+
+    def test_prefetched_tags_are_not_queried_again(self):
+        template = Template(
+            '{% load extract_tags %}{% for quote in quotes %}'
+            '{{ quote.tags|tags }};{{ quote.tags.all|tags }};'
+            '{% endfor %}'
+        )
+        quotes = list(Quote.objects.prefetch_related('tags'))
+        with self.assertNumQueries(0):
+            rendered = template.render(Context({'quotes': quotes}))
+        self.assertEqual(rendered.count('love'), 6)
+        self.assertEqual(rendered.count('life'), 6)
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class TagQuoteCountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(
+            fullname='Author', birth_date=date(1900, 1, 1),
+            birth_location='Somewhere'
+        )
+        cls.love, cls.life, cls.books = [
+            Tag.objects.create(name=name) for name in ('love', 'life', 'books')
+        ]
+
+    def assertCounts(self, love, life, books):
+        counts = dict(Tag.objects.values_list('name', 'quote_count'))
+        self.assertEqual(
+            counts, {'love': love, 'life': life, 'books': books}
+        )
+
+    def test_add_remove_and_clear(self):
+        quote = Quote.objects.create(quote='Quote', author=self.author)
+        quote.tags.add(self.love, self.life)
+        quote.tags.add(self.love)
+        self.assertCounts(1, 1, 0)
+        quote.tags.remove(self.life, self.books)
+        self.assertCounts(1, 0, 0)
+        quote.tags.set([self.life, self.books])
+        self.assertCounts(0, 1, 1)
+        quote.tags.clear()
+        self.assertCounts(0, 0, 0)
+
+    def test_reverse_relation(self):
+        quotes = [
+            Quote.objects.create(quote=f'Quote {i}', author=self.author)
+            for i in range(3)
+        ]
+        self.books.quote_set.add(*quotes)
+        self.assertCounts(0, 0, 3)
+        self.books.quote_set.remove(quotes[0])
+        self.assertCounts(0, 0, 2)
+        self.books.quote_set.clear()
+        self.assertCounts(0, 0, 0)
+
+    def test_deleting_quotes_and_authors(self):
+        create_quotes(self.author, [self.love, self.life], 3)
+        Quote.objects.first().delete()
+        self.assertCounts(2, 2, 0)
+        self.author.delete()
+        self.assertCounts(0, 0, 0)
+
+    def test_top_tags_are_ordered_by_count(self):
+        create_quotes(self.author, [self.life], 2)
+        create_quotes(self.author, [self.love, self.life], 1)
+        response = self.client.get(reverse('quotesapp:index'))
+        self.assertEqual(
+            [tag.name for tag in response.context['top_tags']],
+            ['life', 'love', 'books']
+        )
+
+    def test_reconcile_command(self):
+        create_quotes(self.author, [self.love, self.life], 2)
+        Tag.objects.filter(pk=self.love.pk).update(quote_count=7)
+        out = StringIO()
+        call_command('reconcile_tag_counts', '--dry-run', stdout=out)
+        self.assertIn('love: 7 -> 2', out.getvalue())
+        self.assertCounts(7, 2, 0)
+        call_command('reconcile_tag_counts', stdout=StringIO())
+        self.assertCounts(2, 2, 0)
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=600)
+class PageCacheTests(QueryBudgetMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = Author.objects.create(
+            fullname='Author', birth_date=date(1900, 1, 1),
+            birth_location='Somewhere'
+        )
+        cls.other = Author.objects.create(
+            fullname='Other Author', birth_date=date(1900, 1, 1),
+            birth_location='Elsewhere'
+        )
+        cls.tag = Tag.objects.create(name='love')
+        create_quotes(cls.author, [cls.tag], 2)
+
+    def setUp(self):
+        cache.clear()
+        self.urls = {
+            'index': reverse('quotesapp:index'),
+            'tag': reverse('quotesapp:quotes_by_tag', args=[self.tag.id]),
+            'author': reverse(
+                'quotesapp:author_detail', args=[self.author.id]
+            ),
+            'other': reverse(
+                'quotesapp:author_detail', args=[self.other.id]
+            ),
+        }
+        for url in self.urls.values():
+            self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def assertCached(self, *names):
+        for name, url in self.urls.items():
+            expected = 'HIT' if name in names else 'MISS'
+            self.assertEqual(
+                self.client.get(url)['X-Cache'], expected, name
+            )
+
+    def test_hits_run_no_queries(self):
+        with self.assertNumQueries(0):
+            response = self.client.get(self.urls['index'])
+        self.assertEqual(response['X-Cache'], 'HIT')
+        self.assertContains(response, 'Quote 0 by Author')
+        self.assertIn('author:%d' % self.author.id,
+                      response['Surrogate-Key'].split())
+
+    def test_editing_an_author_purges_the_pages_showing_them(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.fullname = 'Renamed Author'
+            self.author.save()
+        self.assertCached('other')
+        self.assertContains(self.client.get(self.urls['tag']), 'Renamed')
+
+    def test_adding_a_quote_purges_listings(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            quote = Quote.objects.create(quote='New', author=self.other)
+        self.assertCached('tag', 'author', 'other')
+        with self.captureOnCommitCallbacks(execute=True):
+            quote.tags.add(self.tag)
+        self.assertCached('author', 'other')
+
+    def test_edits_purge_search_results(self):
+        url = reverse('quotesapp:search') + '?q=renamed'
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.author.fullname = 'Renamed Author'
+            self.author.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertContains(response, 'Quote 0')
+        with self.captureOnCommitCallbacks(execute=True):
+            Quote.objects.filter(author=self.author).first().save()
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_deleting_a_tag_purges_its_pages(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tag.delete()
+        self.assertEqual(self.client.get(self.urls.pop('tag')).status_code,
+                         404)
+        self.assertCached('author', 'other')
+
+    def test_pages_rendered_before_a_purge_are_not_stored(self):
+        current_versions = page_cache._current_versions
+
+        def purged_meanwhile(keys):
+            # A purge of the page completes after it was rendered.
+            page_cache._increment_versions(
+                [page_cache.VERSION_KEY_PREFIX + key for key in keys]
+            )
+            return current_versions(keys)
+
+        url = self.urls['author'] + '?page=1'
+        with mock.patch.object(page_cache, '_current_versions',
+                               purged_meanwhile):
+            self.assertNotIn('X-Cache', self.client.get(url))
+        self.assertEqual(self.client.get(url)['X-Cache'], 'MISS')
+
+    def test_purges_wait_for_the_commit(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            self.author.save()
+        self.assertCached('index', 'tag', 'author', 'other')
+
+    def test_logged_in_users_get_fresh_pages(self):
+        user = User.objects.create_user('reader', password='secret')
+        self.client.force_login(user)
+        response = self.client.get(self.urls['index'])
+        self.assertNotIn('X-Cache', response)
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = Author.objects.create(
+            fullname='Author', birth_date=date(1900, 1, 1),
+            birth_location='Somewhere'
+        )
+        create_quotes(author, [], 12)
+        # Quotes imported together share their creation time.
+        first = Quote.objects.order_by('id').first()
+        Quote.objects.filter(id__lte=first.id + 5)\
+                     .update(created_at=first.created_at)
+
+    def setUp(self):
+        self.paginator = KeysetPaginator(Quote.objects.all(), 5)
+        self.expected = list(Quote.objects.order_by('-created_at', '-id'))
+
+    def test_walk_older_and_back(self):
+        pages = [self.paginator.page()]
+        while pages[-1].has_next:
+            pages.append(self.paginator.page(after=pages[-1].next_cursor))
+        self.assertEqual([len(page) for page in pages], [5, 5, 2])
+        self.assertEqual(
+            [quote for page in pages for quote in page], self.expected
+        )
+        self.assertFalse(pages[0].has_previous)
+
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = self.paginator.page(before=page.previous_cursor)
+            self.assertEqual(list(page), list(expected))
+        self.assertFalse(page.has_previous)
+
+    def test_quotes_by_tag_pages(self):
+        tag = Tag.objects.create(name='paged')
+        tagged = self.expected[::2]
+        tag.quote_set.add(*tagged)
+        url = reverse('quotesapp:quotes_by_tag', args=[tag.id])
+        shown, params = [], {}
+        while True:
+            quotes = self.client.get(url, params).context['quotes']
+            shown.extend(quotes)
+            if not quotes.has_next:
+                break
+            params = {'after': quotes.next_cursor}
+        self.assertEqual(
+            shown, sorted(tagged, key=lambda quote: quote.id, reverse=True)
+        )
+        previous = self.client.get(
+            url, {'before': quotes.previous_cursor}
+        ).context['quotes']
+        self.assertEqual(list(previous), shown[:5])
+
+    def test_invalid_cursors_show_the_first_page(self):
+        url = reverse('quotesapp:index')
+        for cursor in ('garbage', 'WzFd', 'WyJ4IiwgMV0='):
+            response = self.client.get(url, {'after': cursor})
+            self.assertEqual(
+                list(response.context['quotes']), self.expected[:5]
+            )
+
+    def test_annotation_cursors_are_validated(self):
+        quotes = Quote.objects.annotate(
+            score=Cast(F('id') % 3, FloatField()) / 2
+        )
+        paginator = KeysetPaginator(quotes, 5, ordering=('-score', '-id'))
+        pages = [paginator.page()]
+        while pages[-1].has_next:
+            pages.append(paginator.page(after=pages[-1].next_cursor))
+        self.assertEqual(
+            [quote for page in pages for quote in page],
+            list(quotes.order_by('-score', '-id'))
+        )
+        for values in (['high', 1], [{}, 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode())
+            with self.assertRaises(InvalidCursor):
+                paginator.page(after=cursor.decode())
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class SearchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.einstein = Author.objects.create(
+            fullname='Albert Einstein', birth_date=date(1879, 3, 14),
+            birth_location='Ulm'
+        )
+        cls.austen = Author.objects.create(
+            fullname='Jane Austen', birth_date=date(1775, 12, 16),
+            birth_location='Steventon'
+        )
+        Quote.objects.create(
+            quote='Imagination is more important than knowledge.',
+            author=cls.einstein
+        )
+        Quote.objects.create(
+            quote='There is no charm equal to <b>tenderness</b> of heart.',
+            author=cls.austen
+        )
+
+    def search(self, text, **params):
+        return self.client.get(
+            reverse('quotesapp:search'), {'q': text, **params}
+        )
+
+    def test_matches_text_and_author_and_highlights_them(self):
+        response = self.search('einstein')
+        self.assertContains(response, '<mark>Einstein</mark>')
+        self.assertNotContains(response, 'Jane Austen')
+        response = self.search('TENDERNESS')
+        self.assertContains(
+            response, '&lt;b&gt;<mark>tenderness</mark>&lt;/b&gt;'
+        )
+
+    def test_results_are_paginated(self):
+        for number in range(7):
+            Quote.objects.create(
+                quote=f'Knowledge {number}', author=self.austen
+            )
+        first = self.search('knowledge').context['quotes']
+        self.assertTrue(first.has_next)
+        second = self.search(
+            'knowledge', after=first.next_cursor
+        ).context['quotes']
+        self.assertEqual(len(first) + len(second), 8)
+        self.assertFalse(second.has_next)
+
+    def test_empty_search(self):
+        response = self.search('  ')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['quotes'])
+
+
+class ListSource(Source):
+    """An import source serving documents from lists."""
+
+    def __init__(self, authors, quotes):
+        self._authors = authors
+        self._quotes = quotes
+
+    def authors(self, since=None):
+        return iter(self._authors)
+
+    def quotes(self, since=None, partition=None):
+        return iter(self._quotes)
+
+
+# An ObjectId, which extended JSON writes as {'$oid': ...}.
+EINSTEIN_ID = '5f1d7e1c2a3b4c5d6e7f8091'
+AUTHOR_DOCUMENTS = [
+    {'_id': {'$oid': EINSTEIN_ID}, 'fullname': 'Albert Einstein',
+     'born_date': 'March 14, 1879', 'born_location': 'in Ulm, Germany',
+     'description': 'Physicist.'},
+    {'_id': 'a2', 'fullname': 'Jane Austen',
+     'born_date': '1775-12-16', 'born_location': 'in Steventon, England',
+     'description': None},
+    {'_id': 'a3', 'fullname': 'Nobody', 'born_date': 'unknown'},
+]
+QUOTE_DOCUMENTS = [
+    {'_id': 'q1', 'quote': 'Imagination is more important.',
+     'author': {'$oid': EINSTEIN_ID}, 'tags': ['imagination', 'knowledge']},
+    {'_id': 'q2', 'quote': 'There is no charm equal to tenderness.',
+     'author': 'a2', 'tags': ['charm', 'knowledge', 'knowledge']},
+    {'_id': 'q3', 'quote': 'Try not to become a man of success.',
+     'author': EINSTEIN_ID, 'tags': []},
+    {'_id': 'q4', 'quote': 'Orphaned.', 'author': 'a3', 'tags': ['x']},
+    {'_id': 'q5', 'quote': 'Imagination is more important.',
+     'author': EINSTEIN_ID, 'tags': ['imagination']},
+]
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class ImportQuotesTests(TestCase):
+    def run_import(self, **options):
+        return import_quotes(
+            ListSource(AUTHOR_DOCUMENTS, QUOTE_DOCUMENTS),
+            batch_size=2, report=lambda message: None, **options
+        )
+
+    def test_import(self):
+        stats = self.run_import()
+        self.assertEqual(
+            (stats.authors_created, stats.authors_invalid,
+             stats.tags_created, stats.quotes_created,
+             stats.quotes_invalid, stats.links_created),
+            (2, 1, 3, 4, 1, 5)
+        )
+        einstein = Author.objects.get(fullname='Albert Einstein')
+        self.assertEqual(einstein.birth_date, date(1879, 3, 14))
+        self.assertEqual(einstein.mongo_id, EINSTEIN_ID)
+        # Documents are told apart by their _id, not their text.
+        self.assertEqual(einstein.quote_set.count(), 3)
+        self.assertEqual(
+            dict(Tag.objects.values_list('name', 'quote_count')),
+            {'imagination': 2, 'knowledge': 2, 'charm': 1}
+        )
+        self.assertFalse(Tag.objects.drifted_quote_counts().exists())
+
+    def test_import_again_skips_synced_documents(self):
+        self.run_import()
+        stats = self.run_import()
+        self.assertEqual((stats.quotes_read, stats.quotes_created), (0, 0))
+        stats = self.run_import(full=True)
+        self.assertEqual(
+            (stats.authors_created, stats.authors_existing,
+             stats.tags_created, stats.quotes_created,
+             stats.quotes_updated, stats.quotes_existing),
+            (0, 2, 0, 0, 0, 4)
+        )
+        self.assertEqual(Quote.objects.count(), 4)
+
+    def test_sync_imports_new_and_changed_documents(self):
+        self.run_import()
+        self.assertEqual(
+            SyncState.objects.get(collection='quotes').last_id, 'q5'
+        )
+        changed = dict(QUOTE_DOCUMENTS[1], quote='Tenderness charms.',
+                       tags=['wisdom'], updated_at='2024-05-01T10:00:00Z')
+        added = {'_id': 'q6', 'quote': 'Well done is better than well said.',
+                 'author': 'a2', 'tags': ['wisdom']}
+        documents = QUOTE_DOCUMENTS[:1] + [changed] + QUOTE_DOCUMENTS[2:]
+        stats = import_quotes(
+            ListSource(AUTHOR_DOCUMENTS, documents + [added]),
+            report=lambda message: None
+        )
+        self.assertEqual(
+            (stats.quotes_read, stats.quotes_created, stats.quotes_updated,
+             stats.links_created, stats.links_deleted),
+            (2, 1, 1, 2, 2)
+        )
+        quote = Quote.objects.get(mongo_id='q2')
+        self.assertEqual(quote.quote, 'Tenderness charms.')
+        self.assertEqual([tag.name for tag in quote.tags.all()], ['wisdom'])
+        self.assertEqual(
+            dict(Tag.objects.values_list('name', 'quote_count')),
+            {'imagination': 2, 'knowledge': 1, 'charm': 0, 'wisdom': 2}
+        )
+        self.assertFalse(Tag.objects.drifted_quote_counts().exists())
+        self.assertEqual(
+            SyncState.objects.get(collection='quotes').last_id, 'q6'
+        )
+
+    def test_invalid_documents_do_not_raise_the_marks(self):
+        invalid = {'_id': 'q9', 'quote': '', 'author': 'a2'}
+        import_quotes(
+            ListSource(AUTHOR_DOCUMENTS, QUOTE_DOCUMENTS + [invalid]),
+            report=lambda message: None
+        )
+        self.assertEqual(
+            dict(SyncState.objects.values_list('collection', 'last_id')),
+            {'authors': 'a2', 'quotes': 'q5'}
+        )
+        # Once corrected, the document is imported by the next sync.
+        corrected = dict(invalid, quote='Corrected.')
+        stats = import_quotes(
+            ListSource(AUTHOR_DOCUMENTS, QUOTE_DOCUMENTS + [corrected]),
+            report=lambda message: None
+        )
+        self.assertEqual(stats.quotes_created, 1)
+
+    def test_rows_without_mongo_id_are_matched(self):
+        jane = Author.objects.create(
+            fullname='Jane Austen', birth_date=date(1775, 12, 16),
+            birth_location='in Steventon, England'
+        )
+        quote = Quote.objects.create(
+            quote='There is no charm equal to tenderness.', author=jane
+        )
+        stats = self.run_import()
+        self.assertEqual((stats.authors_created, stats.quotes_created),
+                         (1, 3))
+        jane.refresh_from_db()
+        quote.refresh_from_db()
+        self.assertEqual((jane.mongo_id, quote.mongo_id), ('a2', 'q2'))
+        self.assertEqual(Tag.objects.get(name='charm').quote_count, 1)
+
+    def test_dry_run_writes_nothing(self):
+        # The sync states, authors, tags and quotes without a mongo_id,
+        # then the stored quotes of each of the three batches are read.
+        with self.assertNumQueries(7):
+            stats = self.run_import(dry_run=True)
+        self.assertEqual((stats.quotes_created, stats.tags_created), (4, 3))
+        self.assertFalse(Quote.objects.exists())
+        self.assertFalse(Author.objects.exists())
+        self.assertFalse(SyncState.objects.exists())
+
+    def test_command_requires_the_configuration(self):
+        with self.assertRaises(CommandError):
+            call_command(
+                'import_quotes', '--config', 'missing.ini', stdout=StringIO()
+            )
+
+    def test_command_reports_an_invalid_configuration(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.ini') as file:
+            file.write('[MONGO]\nuser = admin\n')
+            file.flush()
+            with self.assertRaisesMessage(CommandError, "No section: 'DB'"):
+                call_command(
+                    'import_quotes', '--config', file.name, stdout=StringIO()
+                )
+
+    @unittest.skipUnless(find_spec('pymongo'), "requires pymongo")
+    def test_command_reports_an_unreachable_cluster(self):
+        from pymongo.errors import ServerSelectionTimeoutError
+
+        error = ServerSelectionTimeoutError('no servers found')
+        with mock.patch('quotesapp.importer.sources.MongoSource.connect',
+                        side_effect=error), \
+                tempfile.NamedTemporaryFile('w', suffix='.ini') as file:
+            file.write('[DB]\nuser = u\npass = p\ndomain = d\ndb_name = n\n')
+            file.flush()
+            with self.assertRaisesMessage(CommandError, 'no servers found'):
+                call_command(
+                    'import_quotes', '--config', file.name, stdout=StringIO()
+                )
+
+
+def write_dumps(directory):
+    """Write the fixtures as mongoexport dumps: an array and NDJSON."""
+    with open(os.path.join(directory, 'authors.json'), 'w') as file:
+        json.dump(AUTHOR_DOCUMENTS, file, indent=2)
+    with open(os.path.join(directory, 'quotes.json'), 'w') as file:
+        for document in QUOTE_DOCUMENTS:
+            file.write(json.dumps(document) + '\n')
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class DumpSourceTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = directory.name
+        write_dumps(self.path)
+
+    def import_dumps(self, source):
+        out = StringIO()
+        call_command(
+            'import_quotes', '--source', source, '--path', self.path,
+            '--batch-size', '2', stdout=out
+        )
+        return out.getvalue()
+
+    def test_documents_are_parsed_across_chunks(self):
+        for text in (json.dumps(QUOTE_DOCUMENTS, indent=2),
+                     '\n'.join(map(json.dumps, QUOTE_DOCUMENTS))):
+            documents = iter_json_documents(StringIO(text), chunk_size=3)
+            self.assertEqual(list(documents), QUOTE_DOCUMENTS)
+
+    def test_invalid_json_is_rejected(self):
+        for text in ('[{"quote": "a"}', '{"quote": ', '[{}, x]'):
+            with self.assertRaises(ValueError):
+                list(iter_json_documents(StringIO(text), chunk_size=4))
+
+    def test_invalid_json_is_rejected_where_it_is_found(self):
+        text = '[{"quote": "a"}, {"quote": x' + ' ' * 10000 + '}]'
+        file = StringIO(text)
+        with self.assertRaises(ValueError):
+            list(iter_json_documents(file, chunk_size=16))
+        self.assertLess(file.tell(), 100)
+
+    def test_long_documents_are_rejected(self):
+        text = '[{"quote": "' + 'a' * 1000 + '"}]'
+        with mock.patch('quotesapp.importer.sources.MAX_DOCUMENT_SIZE', 100):
+            with self.assertRaises(ValueError):
+                list(iter_json_documents(StringIO(text), chunk_size=16))
+
+    def test_import_from_json_dumps(self):
+        self.assertIn('5 read, 4 created', self.import_dumps('json'))
+        einstein = Author.objects.get(fullname='Albert Einstein')
+        self.assertEqual(einstein.quote_set.count(), 3)
+        self.assertEqual(Tag.objects.get(name='knowledge').quote_count, 2)
+
+    @unittest.skipUnless(find_spec('mongomock'), "requires mongomock")
+    def test_import_from_mongomock(self):
+        self.import_dumps('mongomock')
+        self.assertEqual(
+            Author.objects.get(fullname='Albert Einstein').quote_set.count(),
+            3
+        )
+        self.assertEqual(Quote.objects.count(), 4)
+
+    def test_invalid_dump(self):
+        with open(os.path.join(self.path, 'quotes.json'), 'a') as file:
+            file.write('{"quote": \n')
+        with self.assertRaises(CommandError):
+            self.import_dumps('json')
+        # The batches before the invalid document are imported.
+        self.assertEqual(Quote.objects.count(), 3)
+
+    def test_missing_dump(self):
+        os.remove(os.path.join(self.path, 'authors.json'))
+        with self.assertRaises(CommandError):
+            self.import_dumps('json')
+
+
+@unittest.skipUnless(find_spec('mongomock'), "requires mongomock")
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class MongoSyncTests(TestCase):
+    def object_id(self, days_ago, number):
+        from bson import ObjectId
+
+        created = timezone.now() - timedelta(days=days_ago)
+        return ObjectId('%08x%016x' % (int(created.timestamp()), number))
+
+    def test_only_documents_above_the_marks_are_read(self):
+        author = {'_id': self.object_id(2, 0), 'fullname': 'Jane Austen',
+                  'born_date': '1775-12-16'}
+        source = MongomockSource([author], [
+            {'_id': self.object_id(2 + number, number),
+             'quote': f'Quote {number}',
+             'author': author['_id'], 'tags': ['old']}
+            for number in range(1, 4)
+        ])
+        import_quotes(source, report=lambda message: None)
+
+        # Quote 4 is new, above the _id mark. Quote 2 is read again because
+        # of its `updated_at`, and Quote 1, the last one imported, because
+        # it is within the overlap of the _id mark. Quote 3 is skipped.
+        source.db.quotes.insert_one(
+            {'_id': self.object_id(0, 4), 'quote': 'Quote 4',
+             'author': author['_id'], 'tags': ['new']}
+        )
+        source.db.quotes.update_one(
+            {'_id': self.object_id(4, 2)},
+            {'$set': {'tags': ['new'], 'updated_at': timezone.now()}}
+        )
+        stats = import_quotes(source, report=lambda message: None)
+        self.assertEqual(
+            (stats.quotes_read, stats.quotes_created, stats.quotes_updated,
+             stats.quotes_existing),
+            (3, 1, 1, 1)
+        )
+        self.assertEqual(
+            dict(Tag.objects.values_list('name', 'quote_count')),
+            {'old': 2, 'new': 2}
+        )
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class ParallelImportTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = directory.name
+        write_dumps(self.path)
+
+    def assertPartitionsCover(self, source, documents):
+        for count in (1, 2, 3, 10):
+            ids = [
+                document['_id']
+                for partition in source.partitions(count)
+                for document in source.quotes(partition=partition)
+            ]
+            self.assertCountEqual(ids, [doc['_id'] for doc in documents])
+
+    def test_ndjson_partitions_cover_every_line(self):
+        self.assertPartitionsCover(JSONSource(self.path), QUOTE_DOCUMENTS)
+
+    def test_arrays_are_not_split(self):
+        with open(os.path.join(self.path, 'quotes.json'), 'w') as file:
+            json.dump(QUOTE_DOCUMENTS, file)
+        source = JSONSource(self.path)
+        self.assertEqual(source.partitions(8), [None])
+        self.assertPartitionsCover(source, QUOTE_DOCUMENTS)
+
+    @unittest.skipUnless(find_spec('mongomock'), "requires mongomock")
+    def test_mongo_partitions_cover_every_id(self):
+        documents = [{'_id': number, 'quote': str(number)}
+                     for number in range(20)]
+        self.assertPartitionsCover(MongomockSource(quotes=documents),
+                                   documents)
+
+    def test_partitions_import_like_a_single_run(self):
+        stats = ParallelImporter(
+            JSONSource(self.path), workers=1, batch_size=2,
+            report=lambda message: None
+        ).run()
+        self.assertEqual(
+            (stats.tags_created, stats.quotes_created, stats.links_created),
+            (3, 4, 5)
+        )
+        # No tag is created for the invalid quote.
+        self.assertEqual(
+            dict(Tag.objects.values_list('name', 'quote_count')),
+            {'imagination': 2, 'knowledge': 2, 'charm': 1}
+        )
+        self.assertEqual(
+            SyncState.objects.get(collection='quotes').last_id, 'q5'
+        )
+
+    def test_worker_processes(self):
+        stats = ParallelImporter(
+            JSONSource(self.path), workers=2, batch_size=2, dry_run=True,
+            report=lambda message: None
+        ).run()
+        # Tags needed by the partitions of both workers are counted once.
+        self.assertEqual(
+            (stats.quotes_read, stats.quotes_created, stats.quotes_invalid,
+             stats.tags_created),
+            (5, 4, 1, 3)
+        )
+        self.assertFalse(Quote.objects.exists())
+
+    def test_workers_leave_tag_counts_to_the_parent(self):
+        importer = ParallelImporter(
+            JSONSource(self.path), batch_size=2, report=lambda message: None
+        )
+        importer.prepare()
+        importer.defer_tag_counts = True
+        with mock.patch.object(parallel, '_importer', importer):
+            result = parallel._import_partition(None)
+        deltas = result[3]
+        self.assertEqual(
+            dict(Tag.objects.values_list('name', 'quote_count')),
+            {'imagination': 0, 'knowledge': 0, 'charm': 0}
+        )
+        importer.adjust_tag_counts(deltas)
+        self.assertEqual(
+            dict(Tag.objects.values_list('name', 'quote_count')),
+            {'imagination': 2, 'knowledge': 2, 'charm': 1}
+        )
+
+    def test_failed_import_reconciles_tag_counts(self):
+        Tag.objects.create(name='charm', quote_count=3)
+        ParallelImporter(
+            JSONSource(self.path), report=lambda message: None
+        ).reconcile_tag_counts()
+        self.assertEqual(Tag.objects.get(name='charm').quote_count, 0)
+
+    def test_quotes_without_mongo_id_are_matched_once(self):
+        quote = Quote.objects.create(
+            quote='Imagination is more important.',
+            author=Author.objects.create(
+                fullname='Albert Einstein', birth_date=date(1879, 3, 14)
+            )
+        )
+        # Two imports matching the same quote, as concurrent workers.
+        importers = [
+            QuoteImporter(ListSource(AUTHOR_DOCUMENTS, [document]),
+                          report=lambda message: None)
+            for document in (QUOTE_DOCUMENTS[0], QUOTE_DOCUMENTS[4])
+        ]
+        for importer in importers:
+            importer.prepare()
+        for importer in importers:
+            importer.import_partition()
+        quote.refresh_from_db()
+        self.assertEqual(quote.mongo_id, 'q1')
+        self.assertEqual(
+            Quote.objects.filter(quote=quote.quote).count(), 2
+        )
@@ -7,6 +7,9 @@ urlpatterns = [
     # General path to home page
     path('', views.main, name='index'),
 
+    # Full-text search of quotes and authors
+    path('search/', views.search, name='search'),
+
     # Tag management paths
     path('tag/', views.add_tag, name='add_tag'),
     path('tag/<int:tag_id>/', views.quotes_by_tag, name='quotes_by_tag'),
@@ -1,33 +1,59 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.core.paginator import Paginator, PageNotAnInteger, EmptyPage
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count
+from .cache import (
+    QUOTE_COUNT_CACHE_KEY, add_surrogate_keys, cache_anonymous_page,
+    surrogate_key
+)
 from .models import Quote, Author, Tag
 from .forms import TagForm, AuthorForm, QuoteForm
+from .pagination import KeysetPaginator, get_page
+from .search import highlight_matches, search_quotes
 
+QUOTES_PER_PAGE = 5
+SEARCH_MAX_LENGTH = 200
 
+
+def quote_surrogate_keys(quotes):
+    """
+    Returns the surrogate keys of a list of quotes along with their authors
+    and tags, which must be joined and prefetched.
+    """
+    keys = set()
+    for quote in quotes:
+        keys.add(surrogate_key('quote', quote.id))
+        keys.add(surrogate_key('author', quote.author_id))
+        keys.update(surrogate_key('tag', tag.id) for tag in quote.tags.all())
+    return keys
+
+
+@cache_anonymous_page
 def main(request):
     """
     View function to display the homepage with a list of quotes and top tags.
-    Pagination is applied to the list of quotes.
+    Quotes are paginated by keyset, newest first, so that every page costs
+    the same. Authors are joined and tags prefetched, so a page costs the
+    same number of queries at any size.
     """
-    quotes_list = Quote.objects.all().order_by('-created_at')
-    elems_per_page = 5
-    paginator = Paginator(quotes_list, elems_per_page)
-    page = request.GET.get('page')
+    quotes_list = (
+        Quote.objects.select_related('author')
+        .prefetch_related('tags')
+    )
+    paginator = KeysetPaginator(
+        quotes_list, QUOTES_PER_PAGE, ordering=('-created_at', '-id'),
+        count_cache_key=QUOTE_COUNT_CACHE_KEY
+    )
+    quotes = get_page(paginator, request)
     top_tags = get_top_ten_tags()
 
-    try:
-        quotes = paginator.page(page)
-    except PageNotAnInteger:
-        quotes = paginator.page(1)
-    except EmptyPage:
-        quotes = paginator.page(paginator.num_pages)
-
+    add_surrogate_keys(
+        request, surrogate_key('quotes'), surrogate_key('top-tags'),
+        *quote_surrogate_keys(quotes)
+    )
     context = {
         'top_tags': top_tags,
-        'quotes': quotes
+        'quotes': quotes,
+        'total_quotes': paginator.count(),
     }
 
     return render(request, 'quotesapp/index.html', context=context)
@@ -60,11 +86,13 @@ def delete_tag(request, tag_id):
     return redirect(to='quotesapp:index')
 
 
+@cache_anonymous_page
 def author_detail(request, author_id):
     """
     View to display details of an author, retrieved by their ID.
     """
     author = get_object_or_404(Author, id=author_id)
+    add_surrogate_keys(request, surrogate_key('author', author.id))
     context = {"author": author}
     return render(request, 'quotesapp/author_detail.html', context)
 
@@ -175,21 +203,69 @@ def delete_quote(request, quote_id):
     return redirect(to='quotesapp:index')
 
 
+@cache_anonymous_page
 def quotes_by_tag(request, tag_id):
     """
-    View to display quotes filtered by a specific tag ID.
+    View to display quotes filtered by a specific tag ID, newest first,
+    paginated by keyset.
+
+    A page is selected from the links of the tag alone, by their quote ID,
+    which the (tag_id, quote_id) index of the through table serves as a
+    range scan however many quotes the tag has. The quotes of the page are
+    then loaded with their authors joined and their tags prefetched.
     """
     tag = get_object_or_404(Tag, id=tag_id)
-    quotes = tag.quote_set.all()
+    links = Quote.tags.through.objects.filter(tag_id=tag.id).only('quote_id')
+    paginator = KeysetPaginator(
+        links, QUOTES_PER_PAGE, ordering=('-quote_id',)
+    )
+    quotes = get_page(paginator, request)
+    page_quotes = (
+        Quote.objects.select_related('author')
+        .prefetch_related('tags')
+        .in_bulk([link.quote_id for link in quotes])
+    )
+    quotes.object_list = [
+        page_quotes[link.quote_id] for link in quotes
+        if link.quote_id in page_quotes
+    ]
+
+    add_surrogate_keys(
+        request, surrogate_key('tag', tag.id), *quote_surrogate_keys(quotes)
+    )
     return render(
         request, 'quotesapp/quotes_by_tag.html', {'tag': tag, 'quotes': quotes}
     )
 
 
+@cache_anonymous_page
+def search(request):
+    """
+    View to search quotes by their text and author name, with the best
+    matches first, highlighted and paginated by keyset.
+    """
+    text = request.GET.get('q', '').strip()[:SEARCH_MAX_LENGTH]
+    quotes = None
+    if text:
+        results, ordering = search_quotes(text)
+        paginator = KeysetPaginator(results, QUOTES_PER_PAGE, ordering)
+        quotes = get_page(paginator, request)
+        highlight_matches(quotes, text)
+        # Any edited quote or author may enter or leave the results.
+        add_surrogate_keys(
+            request, surrogate_key('quotes'), surrogate_key('search'),
+            *quote_surrogate_keys(quotes)
+        )
+    return render(
+        request, 'quotesapp/search.html', {'q': text, 'quotes': quotes}
+    )
+
+
 def get_top_ten_tags():
     """
-    Returns the top ten tags based on the number of associated quotes.
+    Returns the top ten tags based on the number of associated quotes,
+    read from the maintained `quote_count` through its index.
     """
-    top_tags = Tag.objects.annotate(num_quotes=Count('quote'))\
-                          .order_by('-num_quotes')[:10]
+    top_tags = Tag.objects.only('id', 'name', 'quote_count')\
+                          .order_by('-quote_count', 'name', 'id')[:10]
     return top_tags